@@ -9,10 +9,17 @@ from dotenv import load_dotenv
 import os
 from financial_analyzer import FinancialAnalyzer
 import warnings
-import yfinance as yf
 from financial_narrative_generator import FinancialNarrativeGenerator  # Import the new class
 from dataclasses import dataclass
 from news_fetcher import NewsFetcher
+from monte_carlo import DEFAULT_CHUNK_SIZE, ESTIMATORS, KERNELS, PROCESS_POOL_WORKERS
+from portfolio_analyzer import PortfolioAnalyzer
+from price_store import get_price_store
+from security_master import DEFAULT_SEARCH_LIMIT, MAX_SEARCH_LIMIT, company_metadata, get_security_master
+from prefetch import PREFETCH_MAX_RESULTS, PREFETCH_QUEUE, get_prefetcher
+from screener import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, ConfidenceScreener, load_watchlist, paginate
+from trading_rules import STRATEGIES, compile_strategy, resolve_strategy
+from backtesting import DEFAULT_TEST_DAYS, DEFAULT_TRAIN_DAYS, RANKABLE_METRICS, REBALANCE_SCHEDULES, validate_grid
 
 from flask import Flask, request, send_file, jsonify
  # You'll need to use a Python PDF library like reportlab or PyPDF2
@@ -84,15 +91,11 @@ class FinSaathiAI:
         except Exception as e:
             raise Exception(f"Error getting AI response: {str(e)}")
 
-# Initialize components
-try:
-    ai_assistant = FinSaathiAI()
-    # matcher = ImprovedSchemeMatcher()
-    # matcher.load_schemes("./Government_Schemes-English.pdf")
-except Exception as e:
-    print(f"Initialization error: {str(e)}")
-    ai_assistant = None
-    matcher = None
+# Components are created by init_services() when the server starts; process pool workers
+# re-import this script as __mp_main__ and must not build them again
+ai_assistant = None
+matcher = None
+news_fetcher = None
 
 def create_error_response(message, status_code=400):
     return jsonify({
@@ -100,6 +103,71 @@ def create_error_response(message, status_code=400):
         "message": message
     }), status_code
 
+# Upper bound on paths a single request may ask for; anything above
+# STREAMING_THRESHOLD is simulated in chunks so memory stays bounded.
+MAX_SIMULATIONS = 2_000_000
+# Smaller blocks spend their time on per-block overhead, larger ones defeat the bounded memory
+MIN_CHUNK_SIZE = 1_000
+MAX_CHUNK_SIZE = DEFAULT_CHUNK_SIZE * 4
+# Portfolio simulation holds every (step, path, asset) value in memory at once, so it has
+# its own budget on their product (float64: 8 bytes each) and a horizon of at most 5 years
+MAX_PORTFOLIO_VALUES = 25_000_000
+MAX_FORECAST_DAYS = 5 * 252
+
+# Backtest flavours served by /api/financial/backtest (?mode=...)
+BACKTEST_MODES = ('single', 'grid', 'walkforward', 'portfolio')
+
+def parse_simulation_options(data):
+    """Extract optional Monte Carlo settings from a request body"""
+    options = {}
+    if data.get('num_simulations') is not None:
+        num_simulations = int(data['num_simulations'])
+        if not 1 < num_simulations <= MAX_SIMULATIONS:
+            raise ValueError(f"num_simulations must be between 2 and {MAX_SIMULATIONS}")
+        options['num_simulations'] = num_simulations
+    if data.get('chunk_size') is not None:
+        chunk_size = int(data['chunk_size'])
+        if not MIN_CHUNK_SIZE <= chunk_size <= MAX_CHUNK_SIZE:
+            raise ValueError(f"chunk_size must be between {MIN_CHUNK_SIZE} and {MAX_CHUNK_SIZE}")
+        options['chunk_size'] = chunk_size
+    if data.get('seed') is not None:
+        seed = int(data['seed'])
+        if seed < 0:
+            raise ValueError("seed must be a non-negative integer")
+        options['seed'] = seed
+    if data.get('workers') is not None:
+        workers = int(data['workers'])
+        if not 1 <= workers <= PROCESS_POOL_WORKERS:
+            raise ValueError(f"workers must be between 1 and {PROCESS_POOL_WORKERS}")
+        options['workers'] = workers
+    if data.get('estimator') is not None:
+        if data['estimator'] not in ESTIMATORS:
+            raise ValueError(f"estimator must be one of {', '.join(ESTIMATORS)}")
+        options['estimator'] = data['estimator']
+    if data.get('tolerance') is not None:
+        tolerance = float(data['tolerance'])
+        if tolerance <= 0:
+            raise ValueError("tolerance must be positive")
+        options['tolerance'] = tolerance
+    if data.get('max_simulations') is not None:
+        max_simulations = int(data['max_simulations'])
+        if not 1 < max_simulations <= MAX_SIMULATIONS:
+            raise ValueError(f"max_simulations must be between 2 and {MAX_SIMULATIONS}")
+        options['max_simulations'] = max_simulations
+    if data.get('kernel') is not None:
+        if data['kernel'] not in KERNELS:
+            raise ValueError(f"kernel must be one of {', '.join(KERNELS)}")
+        options['kernel'] = data['kernel']
+    if data.get('kernel_options') is not None:
+        if not isinstance(data['kernel_options'], dict):
+            raise ValueError("kernel_options must be an object")
+        allowed = KERNELS[options.get('kernel', 'gbm')].options
+        unknown = set(data['kernel_options']) - set(allowed)
+        if unknown:
+            raise ValueError(f"Unsupported kernel_options: {', '.join(sorted(unknown))}")
+        options['kernel_options'] = {key: float(value) for key, value in data['kernel_options'].items()}
+    return options
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     return jsonify({
@@ -108,6 +176,19 @@ def health_check():
         "schemes_loaded": len(matcher.schemes) if matcher and hasattr(matcher, 'schemes') else 0
     })
 
+@app.route('/api/market-data/stats', methods=['GET'])
+def market_data_stats():
+    """Endpoint reporting price store hits, per-key single-flight wait times and prefetch hit rate"""
+    store = get_price_store()
+    return jsonify({
+        "status": "success",
+        "data": {
+            'store': store.stats,
+            'single_flight': store.flights.metrics(),
+            'prefetch': get_prefetcher().report()
+        }
+    })
+
 @app.route('/api/chat', methods=['POST'])
 def chat():
     if ai_assistant is None:
@@ -154,6 +235,7 @@ def analyze_stock():
         
         # Use the same Groq API key that's already initialized for FinSaathiAI
         analyzer = FinancialAnalyzer(symbol, os.environ.get('GROQ_API_KEY'))
+        get_prefetcher().record(symbol)
         
         # Fetch historical data
         historical_data = analyzer.fetch_historical_data()
@@ -161,19 +243,20 @@ def analyze_stock():
         # Generate AI analysis
         analysis = analyzer.get_analysis(historical_data)
         
-        # Get company info
-        company_info = yf.Ticker(symbol).info
+        # Company info comes from the local security master; only symbols missing
+        # from it go upstream, through the price store
+        company_info = company_metadata(symbol)
         
         response_data = {
             'symbol': symbol,
-            'company_name': company_info.get('longName', symbol),
+            'company_name': company_info['Name'] or symbol,
             'historical_data': historical_data,
             'narrative': analysis,
             'metadata': {
-                'sector': company_info.get('sector', 'N/A'),
-                'industry': company_info.get('industry', 'N/A'),
-                'market_cap': company_info.get('marketCap', 'N/A'),
-                'currency': company_info.get('currency', 'USD')
+                'sector': company_info['Sector'] or 'N/A',
+                'industry': company_info['Industry'] or 'N/A',
+                'market_cap': company_info['MarketCap'] or 'N/A',
+                'currency': company_info['Currency']
             }
         }
         
@@ -191,20 +274,24 @@ def search_symbols():
         query = request.args.get('q', '')
         if len(query) < 2:
             return jsonify([])
-            
-        matches = yf.Tickers(query).tickers
-        
-        results = []
-        for symbol, ticker in matches.items():
-            try:
-                info = ticker.info
-                results.append({
-                    'symbol': symbol,
-                    'name': info.get('longName', 'Unknown'),
-                    'exchange': info.get('exchange', 'Unknown')
-                })
-            except:
-                continue
+        try:
+            limit = int(request.args.get('limit', DEFAULT_SEARCH_LIMIT))
+            if not 1 <= limit <= MAX_SEARCH_LIMIT:
+                raise ValueError
+        except ValueError:
+            return create_error_response(f"limit must be between 1 and {MAX_SEARCH_LIMIT}")
+        
+        results = [
+            {
+                'symbol': match['Symbol'],
+                'name': match['Name'] or 'Unknown',
+                'exchange': match['Exchange'] or 'Unknown'
+            }
+            for match in get_security_master().search(query, limit)
+        ]
+        # A search this narrow is usually followed by analyzing one of its results
+        if 0 < len(results) <= PREFETCH_MAX_RESULTS:
+            get_prefetcher().prefetch([result['symbol'] for result in results], owner=request.remote_addr)
                 
         return jsonify({
             "status": "success",
@@ -215,6 +302,20 @@ def search_symbols():
         return create_error_response(str(e), 500)
 
 
+@app.route('/api/symbols/prefetch', methods=['POST'])
+def prefetch_symbols():
+    """Endpoint the frontend calls when a search result is hovered or selected, to warm its history"""
+    data = request.get_json()
+    symbols = data.get('symbols') if data else None
+    if not isinstance(symbols, list) or not symbols or not all(isinstance(symbol, str) for symbol in symbols):
+        return create_error_response("Provide a list of symbols")
+    if len(symbols) > PREFETCH_QUEUE:
+        return create_error_response(f"At most {PREFETCH_QUEUE} symbols can be prefetched at once")
+    return jsonify({
+        "status": "success",
+        "queued": get_prefetcher().prefetch(symbols, owner=request.remote_addr)
+    })
+
 @app.route('/api/financial/analyze', methods=['POST'])
 def analyze_stock_detailed():
     """Endpoint for detailed stock analysis using FinancialNarrativeGenerator"""
@@ -225,15 +326,20 @@ def analyze_stock_detailed():
         
         symbol = data['symbol']
         api_key = os.environ.get('GROQ_API_KEY')
+        try:
+            simulation_options = parse_simulation_options(data)
+        except (TypeError, ValueError) as e:
+            return create_error_response(str(e))
         
         # Initialize the generator
         generator = FinancialNarrativeGenerator(symbol, api_key)
+        get_prefetcher().record(symbol)
         
         # Fetch historical data
         historical_data = generator.fetch_historical_data()
         
         # Perform Monte Carlo simulation
-        sim_results, risk_metrics = generator.monte_carlo_simulation(historical_data)
+        sim_results, risk_metrics = generator.monte_carlo_simulation(historical_data, **simulation_options)
         
         # Perform backtesting
         backtest_metrics, historical_data = generator.backtest_strategy(historical_data)
@@ -263,6 +369,7 @@ def analyze_stock_detailed():
                                    for k, v in backtest_metrics.items()}
             },
             'monte_carlo': {
+                'num_simulations': int(risk_metrics['Num_Simulations']),
                 'expected_price': float(sim_results['mean_path'].iloc[-1]),
                 'confidence_interval': {
                     'lower': float(sim_results['lower_95'].iloc[-1]),
@@ -290,6 +397,10 @@ def get_confidence_score():
         
         symbol = data['symbol']
         api_key = os.environ.get('GROQ_API_KEY')
+        try:
+            simulation_options = parse_simulation_options(data)
+        except (TypeError, ValueError) as e:
+            return create_error_response(str(e))
         
         # Initialize the generator
         generator = FinancialNarrativeGenerator(symbol, api_key)
@@ -298,10 +409,10 @@ def get_confidence_score():
         historical_data = generator.fetch_historical_data()
         
         # Perform Monte Carlo simulation
-        sim_results, risk_metrics = generator.monte_carlo_simulation(historical_data)
+        sim_results, risk_metrics = generator.monte_carlo_simulation(historical_data, **simulation_options)
         
-        # Perform backtesting
-        backtest_metrics, historical_data = generator.backtest_strategy(historical_data)
+        # Only the backtest metrics feed the score, so skip the portfolio history
+        backtest_metrics = generator.backtest_metrics(historical_data)
         
         # Calculate confidence scores
         confidence_report = generator.confidence_scorer.calculate_overall_confidence(
@@ -315,6 +426,7 @@ def get_confidence_score():
         confidence_report['interpretation'] = generator.confidence_scorer.get_confidence_interpretation(
             confidence_report['overall_confidence']
         )
+        confidence_report['num_simulations'] = int(risk_metrics['Num_Simulations'])
         
         return jsonify({
             "status": "success",
@@ -324,32 +436,100 @@ def get_confidence_score():
     except Exception as e:
         return create_error_response(str(e), 500)
 
+@app.route('/api/financial/screener', methods=['POST'])
+def confidence_screener():
+    """Endpoint ranking a watchlist by confidence score, one page at a time"""
+    try:
+        data = request.get_json()
+        if not data or not (data.get('symbols') or data.get('watchlist')):
+            return create_error_response("Provide symbols or a watchlist")
+        
+        sort_by = data.get('sort_by', 'overall_confidence')
+        try:
+            symbols = data.get('symbols') or load_watchlist(str(data['watchlist']))
+            screener = ConfidenceScreener(symbols)
+            page = int(data.get('page', 1))
+            page_size = int(data.get('page_size', DEFAULT_PAGE_SIZE))
+            if page < 1 or not 1 <= page_size <= MAX_PAGE_SIZE:
+                raise ValueError(f"page must be at least 1 and page_size between 1 and {MAX_PAGE_SIZE}")
+        except (TypeError, ValueError) as e:
+            return create_error_response(str(e))
+        
+        frames, failed = screener.fetch_ohlcv(data.get('period', '1y'))
+        if not frames:
+            return create_error_response("No data found for any of the symbols", 404)
+        try:
+            table = screener.score(frames, sort_by)
+        except ValueError as e:
+            return create_error_response(str(e))
+        rows, pages = paginate(table, page, page_size)
+        
+        return jsonify({
+            "status": "success",
+            "data": {
+                'total': len(table),
+                'page': page,
+                'page_size': page_size,
+                'pages': pages,
+                'sort_by': sort_by,
+                'results': json.loads(rows.to_json(orient='records')),
+                'failed': [{'symbol': symbol, 'error': error} for symbol, error in failed.items()]
+            }
+        })
+        
+    except Exception as e:
+        return create_error_response(str(e), 500)
+
 @app.route('/api/financial/backtest', methods=['POST'])
 def backtest_strategy():
     """Endpoint to backtest trading strategy for a stock"""
     try:
         data = request.get_json()
-        if not data or 'symbol' not in data:
+        if not data:
+            return create_error_response("No symbol provided")
+        initial_capital = float(data.get('initial_capital', 100000))
+        mode = request.args.get('mode', data.get('mode', 'single'))
+        if mode not in BACKTEST_MODES:
+            return create_error_response(f"Unknown backtest mode '{mode}'. Choose from: {', '.join(BACKTEST_MODES)}")
+        if mode == 'portfolio':
+            return portfolio_backtest_response(data, initial_capital)
+        if 'symbol' not in data:
             return create_error_response("No symbol provided")
         
         symbol = data['symbol']
-        initial_capital = float(data.get('initial_capital', 100000))
         api_key = os.environ.get('GROQ_API_KEY')
         
+        if mode == 'grid':
+            return grid_backtest_response(symbol, data, initial_capital, api_key)
+        if mode == 'walkforward':
+            return walk_forward_response(symbol, data, initial_capital, api_key)
+        strategy = data.get('strategy')
+        try:
+            # Compile up front so a bad rule fails before any data is fetched
+            strategy_name, _ = resolve_strategy(strategy)
+            compile_strategy(strategy)
+        except ValueError as e:
+            return create_error_response(str(e))
+        
         # Initialize the generator
         generator = FinancialNarrativeGenerator(symbol, api_key)
         
         # Fetch historical data
         historical_data = generator.fetch_historical_data()
         
-        # Perform backtesting
-        backtest_metrics, historical_data = generator.backtest_strategy(historical_data, initial_capital)
+        # Perform backtesting; metrics_only skips building the portfolio history
+        if data.get('metrics_only'):
+            backtest_metrics = generator.backtest_metrics(historical_data, initial_capital, strategy=strategy)
+        else:
+            backtest_metrics, historical_data = generator.backtest_strategy(historical_data, initial_capital, strategy=strategy)
         
         response_data = {
+            'strategy': strategy_name,
             'metrics': {k: float(v) if isinstance(v, (int, float)) else v 
-                       for k, v in backtest_metrics.items()},
-            'portfolio_history': historical_data[['Portfolio_Value', 'Strategy_Returns', 'Cum_Strategy_Returns', 'Cum_Market_Returns']].to_dict(orient='records')
+                       for k, v in backtest_metrics.items()}
         }
+        if not data.get('metrics_only'):
+            response_data['portfolio_history'] = historical_data[['Portfolio_Value', 'Strategy_Returns', 'Cum_Strategy_Returns', 'Cum_Market_Returns']].to_dict(orient='records')
         
         return jsonify({
             "status": "success",
@@ -359,6 +539,200 @@ def backtest_strategy():
     except Exception as e:
         return create_error_response(str(e), 500)
 
+def grid_backtest_response(symbol, data, initial_capital, api_key):
+    """Parameter sweep for /api/financial/backtest?mode=grid"""
+    grid = data.get('grid')
+    rank_by = data.get('rank_by', 'Sharpe_Ratio')
+    try:
+        top = int(data.get('top', 20))
+        if top < 1:
+            raise ValueError("top must be at least 1")
+        if rank_by not in RANKABLE_METRICS:
+            raise ValueError(f"rank_by must be one of: {', '.join(RANKABLE_METRICS)}")
+        if grid is not None and not isinstance(grid, dict):
+            raise ValueError("grid must be an object of parameter -> list of values")
+        # Validate the grid before fetching any data
+        validate_grid(grid)
+    except (TypeError, ValueError) as e:
+        return create_error_response(str(e))
+    
+    generator = FinancialNarrativeGenerator(symbol, api_key)
+    historical_data = generator.fetch_historical_data()
+    try:
+        table = generator.grid_backtest(historical_data, grid, initial_capital, rank_by, top=None)
+    except ValueError as e:
+        return create_error_response(str(e))
+    
+    return jsonify({
+        "status": "success",
+        "data": {
+            'mode': 'grid',
+            'combinations': len(table),
+            'results': json.loads(table.head(top).to_json(orient='records'))
+        }
+    })
+
+def walk_forward_response(symbol, data, initial_capital, api_key):
+    """Rolling train/test evaluation for /api/financial/backtest?mode=walkforward"""
+    grid = data.get('grid')
+    strategy = data.get('strategy')
+    rank_by = data.get('rank_by', 'Sharpe_Ratio')
+    try:
+        train_days = int(data.get('train_days', DEFAULT_TRAIN_DAYS))
+        test_days = int(data.get('test_days', DEFAULT_TEST_DAYS))
+        if train_days < 20 or test_days < 5:
+            raise ValueError("train_days must be at least 20 and test_days at least 5")
+        workers = int(data.get('workers', PROCESS_POOL_WORKERS))
+        if not 1 <= workers <= PROCESS_POOL_WORKERS:
+            raise ValueError(f"workers must be between 1 and {PROCESS_POOL_WORKERS}")
+        if rank_by not in RANKABLE_METRICS:
+            raise ValueError(f"rank_by must be one of: {', '.join(RANKABLE_METRICS)}")
+        if grid is not None and strategy is not None:
+            raise ValueError("Pass either a grid to optimise or a strategy, not both")
+        if grid is not None and not isinstance(grid, dict):
+            raise ValueError("grid must be an object of parameter -> list of values")
+        if strategy is not None:
+            compile_strategy(strategy)
+        else:
+            validate_grid(grid)
+    except (TypeError, ValueError) as e:
+        return create_error_response(str(e))
+    
+    generator = FinancialNarrativeGenerator(symbol, api_key)
+    historical_data = generator.fetch_historical_data(data.get('period', '10y'))
+    try:
+        result = generator.walk_forward_backtest(
+            historical_data, grid=grid, strategy=strategy, train_days=train_days, test_days=test_days,
+            anchored=bool(data.get('anchored', False)), rank_by=rank_by,
+            initial_capital=initial_capital, workers=workers
+        )
+    except ValueError as e:
+        return create_error_response(str(e))
+    
+    return jsonify({
+        "status": "success",
+        "data": {
+            'mode': 'walkforward',
+            'strategy': resolve_strategy(strategy)[0] if strategy is not None else 'grid',
+            **result
+        }
+    })
+
+def portfolio_backtest_response(data, initial_capital):
+    """Multi-symbol backtest for /api/financial/backtest?mode=portfolio"""
+    if not data.get('symbols'):
+        return create_error_response("No symbols provided")
+    strategy = data.get('strategy')
+    rebalance = data.get('rebalance', 'monthly')
+    try:
+        analyzer = PortfolioAnalyzer(data['symbols'], data.get('weights'))
+        if rebalance not in REBALANCE_SCHEDULES:
+            raise ValueError(f"rebalance must be one of: {', '.join(REBALANCE_SCHEDULES)}")
+        transaction_cost = float(data.get('transaction_cost', 0.0))
+        if not 0 <= transaction_cost < 1:
+            raise ValueError("transaction_cost must be a fraction between 0 and 1")
+        strategy_name, _ = resolve_strategy(strategy)
+        compile_strategy(strategy)
+    except (TypeError, ValueError) as e:
+        return create_error_response(str(e))
+    
+    frames = analyzer.fetch_ohlcv(data.get('period', '1y'))
+    result = analyzer.backtest(
+        frames, strategy=strategy, rebalance=rebalance, initial_capital=initial_capital,
+        transaction_cost=transaction_cost, long_only=bool(data.get('long_only', False))
+    )
+    
+    return jsonify({
+        "status": "success",
+        "data": {
+            'mode': 'portfolio',
+            'strategy': strategy_name,
+            'symbols': analyzer.symbols,
+            'metrics': result['metrics'],
+            'portfolio_history': [
+                {'date': date.strftime('%Y-%m-%d'), 'Portfolio_Value': float(value)}
+                for date, value in result['equity'].items()
+            ],
+            'trades': result['ledger'].to_dict(orient='records')
+        }
+    })
+
+@app.route('/api/financial/strategies', methods=['GET'])
+def list_strategies():
+    """Endpoint listing the named trading-rule strategies usable for backtesting"""
+    return jsonify({
+        "status": "success",
+        "strategies": STRATEGIES
+    })
+
+@app.route('/api/portfolio/simulate', methods=['POST'])
+def simulate_portfolio():
+    """Endpoint for correlated Monte Carlo simulation of a multi-stock portfolio"""
+    try:
+        data = request.get_json()
+        if not data or not data.get('symbols'):
+            return create_error_response("No symbols provided")
+
+        try:
+            analyzer = PortfolioAnalyzer(data['symbols'], data.get('weights'))
+            simulation_options = {
+                key: int(data[key]) for key in ('num_simulations', 'forecast_days', 'step_days', 'seed')
+                if data.get(key) is not None
+            }
+            if not 1 < simulation_options.get('num_simulations', 1000) <= MAX_SIMULATIONS:
+                raise ValueError(f"num_simulations must be between 2 and {MAX_SIMULATIONS}")
+            forecast_days = simulation_options.get('forecast_days', 252)
+            step_days = simulation_options.get('step_days', 1)
+            if not 1 <= forecast_days <= MAX_FORECAST_DAYS:
+                raise ValueError(f"forecast_days must be between 1 and {MAX_FORECAST_DAYS}")
+            if not 1 <= step_days <= forecast_days:
+                raise ValueError("step_days must be between 1 and forecast_days")
+            values = simulation_options.get('num_simulations', 1000) * len(analyzer.symbols) * (-(-forecast_days // step_days) + 1)
+            if values > MAX_PORTFOLIO_VALUES:
+                raise ValueError(
+                    f"num_simulations x symbols x steps is {values:,}, above the limit of {MAX_PORTFOLIO_VALUES:,}; "
+                    "use fewer simulations, fewer symbols or a larger step_days"
+                )
+        except (TypeError, ValueError) as e:
+            return create_error_response(str(e))
+
+        # Fetch aligned price history for all symbols
+        price_matrix = analyzer.fetch_price_matrix(data.get('period', '1y'))
+
+        # Simulate the portfolio
+        sim_results, risk_metrics, risk_contributions = analyzer.monte_carlo_simulation(
+            price_matrix, **simulation_options
+        )
+
+        response_data = {
+            'symbols': analyzer.symbols,
+            'observations': len(price_matrix),
+            'risk_metrics': {k: float(v) for k, v in risk_metrics.items()},
+            'risk_contributions': risk_contributions,
+            'monte_carlo': {
+                'num_simulations': int(risk_metrics['Num_Simulations']),
+                'expected_value': float(sim_results['mean_path'].iloc[-1]),
+                'confidence_interval': {
+                    'lower': float(sim_results['lower_95'].iloc[-1]),
+                    'upper': float(sim_results['upper_95'].iloc[-1])
+                },
+                'path': {
+                    'day': sim_results['mean_path'].index.tolist(),
+                    'mean': sim_results['mean_path'].tolist(),
+                    'lower_95': sim_results['lower_95'].tolist(),
+                    'upper_95': sim_results['upper_95'].tolist()
+                }
+            }
+        }
+
+        return jsonify({
+            "status": "success",
+            "data": response_data
+        })
+
+    except Exception as e:
+        return create_error_response(str(e), 500)
+
 RSS_FEEDS = [
     {"url": "https://www.livemint.com/rss/companies", "name": "Livemint Companies"},
     {
@@ -372,13 +746,6 @@ RSS_FEEDS = [
     # Add more RSS feeds as needed
 ]
 
-# Initialize NewsFetcher
-try:
-    news_fetcher = NewsFetcher(RSS_FEEDS)
-except Exception as e:
-    print(f"Error initializing NewsFetcher: {str(e)}")
-    news_fetcher = None
-
 
 # Add this new endpoint
 @app.route("/api/news", methods=["GET"])
@@ -523,6 +890,31 @@ def generate_pdf():
     except Exception as e:
         return create_error_response(str(e), 500)
 
+def init_services():
+    """Create the chatbot and news fetcher and load the security master."""
+    global ai_assistant, matcher, news_fetcher
+    try:
+        ai_assistant = FinSaathiAI()
+        # matcher = ImprovedSchemeMatcher()
+        # matcher.load_schemes("./Government_Schemes-English.pdf")
+    except Exception as e:
+        print(f"Initialization error: {str(e)}")
+        ai_assistant = None
+        matcher = None
+
+    try:
+        news_fetcher = NewsFetcher(RSS_FEEDS)
+    except Exception as e:
+        print(f"Error initializing NewsFetcher: {str(e)}")
+        news_fetcher = None
+
+    # Load the security master up front so metadata lookups and symbol search never wait on it
+    try:
+        get_security_master()
+    except Exception as e:
+        print(f"Security master not loaded: {str(e)}")
+
 if __name__ == '__main__':
+    init_services()
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port, debug=True)
\ No newline at end of file
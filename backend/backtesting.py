@@ -0,0 +1,605 @@
+# backtesting.py
+
+import sys
+import time
+from multiprocessing import resource_tracker, shared_memory
+import numpy as np
+import pandas as pd
+from indicators import (TRADING_DAYS, rolling_mean, rolling_std, synthetic_ohlcv, compute_indicators,
+                        compute_indicator_matrix, align_ohlcv, _synthetic_universe)
+from monte_carlo import get_process_pool
+
+RISK_FREE_RATE = 0.02
+
+# RSI thresholds, moving-average crossover windows and Bollinger band widths
+DEFAULT_GRID = {
+    'rsi_buy': [20, 25, 30, 35, 40],
+    'rsi_sell': [60, 65, 70, 75, 80],
+    'fast_ma': [10, 20, 50],
+    'slow_ma': [100, 150, 200],
+    'bollinger_width': [1.5, 2.0, 2.5, 3.0]
+}
+GRID_PARAMETERS = tuple(DEFAULT_GRID)
+MAX_GRID_COMBINATIONS = 20_000
+RANKABLE_METRICS = ('Total_Return', 'Excess_Return', 'Sharpe_Ratio', 'Max_Drawdown', 'Win_Rate')
+
+# Walk-forward: parameters are picked on TRAIN_DAYS of history and traded on
+# the following TEST_DAYS, then both windows roll forward by TEST_DAYS.
+DEFAULT_TRAIN_DAYS = 3 * TRADING_DAYS
+DEFAULT_TEST_DAYS = TRADING_DAYS // 2
+
+# Portfolio rebalancing schedules, in trading days between rebalances
+REBALANCE_SCHEDULES = {'daily': 1, 'weekly': 5, 'monthly': 21, 'quarterly': 63}
+TRADE_LEDGER_DTYPE = np.dtype([
+    ('day', np.int32), ('symbol', np.int32), ('shares', np.float64),
+    ('price', np.float64), ('value', np.float64), ('cost', np.float64)
+])
+
+
+def backtest_metrics(positions, daily_returns, initial_capital=100000, risk_free_rate=RISK_FREE_RATE):
+    """
+    Metrics of backtest_strategy for one or many position series at once.
+
+    Args:
+        positions: (..., days) array of -1/0/1 positions taken at each close
+        daily_returns: (days,) or broadcastable array of close-to-close returns
+
+    Returns:
+        dict of metric name -> array over the leading axes
+    """
+    positions = np.asarray(positions, dtype=np.float64)
+    daily_returns = np.nan_to_num(np.asarray(daily_returns, dtype=np.float64))
+
+    # Yesterday's position earns today's return
+    strategy_returns = np.zeros(np.broadcast_shapes(positions.shape, daily_returns.shape))
+    np.multiply(positions[..., :-1], daily_returns[..., 1:], out=strategy_returns[..., 1:])
+
+    market_return = np.prod(1 + daily_returns, axis=-1) - 1
+    return _return_metrics(strategy_returns, market_return, initial_capital, risk_free_rate)
+
+
+def _return_metrics(strategy_returns, market_return, initial_capital, risk_free_rate):
+    """backtest_strategy's metrics from (..., days) strategy returns and the market's total return"""
+    growth = np.cumprod(1 + strategy_returns, axis=-1)
+    total_return = growth[..., -1] - 1
+    drawdowns = growth / np.maximum.accumulate(growth, axis=-1) - 1
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        sharpe_ratio = (total_return - risk_free_rate) / (strategy_returns.std(axis=-1, ddof=1) * np.sqrt(TRADING_DAYS))
+        win_rate = (strategy_returns > 0).sum(axis=-1) / (strategy_returns != 0).sum(axis=-1)
+
+    return {
+        'Total_Return': total_return,
+        'Market_Return': np.broadcast_to(market_return, total_return.shape),
+        'Excess_Return': total_return - market_return,
+        'Sharpe_Ratio': sharpe_ratio,
+        'Max_Drawdown': drawdowns.min(axis=-1),
+        'Win_Rate': win_rate,
+        'Final_Portfolio_Value': initial_capital * growth[..., -1]
+    }
+
+
+def validate_grid(grid):
+    """Merge a partial grid over DEFAULT_GRID and check its values; returns sorted unique arrays"""
+    grid = {**DEFAULT_GRID, **(grid or {})}
+    unknown = set(grid) - set(GRID_PARAMETERS)
+    if unknown:
+        raise ValueError(f"Unknown grid parameters: {', '.join(sorted(unknown))}. Use: {', '.join(GRID_PARAMETERS)}")
+    values = {}
+    for name in GRID_PARAMETERS:
+        options = grid[name] if isinstance(grid[name], (list, tuple)) else [grid[name]]
+        if not options:
+            raise ValueError(f"Grid parameter '{name}' needs at least one value")
+        values[name] = np.unique(np.asarray(options, dtype=np.float64))
+    for name in ('fast_ma', 'slow_ma'):
+        if (values[name] < 1).any() or (values[name] != np.round(values[name])).any():
+            raise ValueError(f"'{name}' windows must be positive integers")
+    return values
+
+
+def grid_positions(close, grid=None, indicators=None):
+    """
+    Positions for every combination of the rule parameters as one
+    (combinations x days) int8 matrix.
+
+    The rules are those of generate_trading_signals, with the RSI thresholds,
+    moving-average windows and Bollinger width swept; each parameter's rule
+    component is computed once per value and the combinations are assembled by
+    indexing. Combinations whose fast MA is not shorter than the slow MA are dropped.
+
+    Returns:
+        (positions, parameters) where parameters maps each grid parameter to a
+        (combinations,) array of its value
+    """
+    values = validate_grid(grid)
+    close = np.asarray(close, dtype=np.float64)
+    # Only close-based indicators (RSI, MACD) are read, so a close-only frame will do
+    indicators = indicators if indicators is not None else compute_indicators(pd.DataFrame({
+        'High': close, 'Low': close, 'Close': close, 'Volume': np.zeros_like(close)
+    }))
+
+    rsi = indicators['RSI']
+    with np.errstate(invalid='ignore'):
+        macd_vote = (indicators['MACD'] > indicators['MACD_Signal']).astype(np.int8) - (indicators['MACD'] < indicators['MACD_Signal'])
+        rsi_buy = (rsi < values['rsi_buy'][:, None]).astype(np.int8)
+        rsi_sell = (rsi > values['rsi_sell'][:, None]).astype(np.int8)
+
+        windows = np.union1d(values['fast_ma'], values['slow_ma']).astype(int)
+        averages = np.stack([rolling_mean(close, window, min_periods=1) for window in windows])
+        fast = np.searchsorted(windows, values['fast_ma'])
+        slow = np.searchsorted(windows, values['slow_ma'])
+
+        mid = rolling_mean(close, 20)
+        deviation = rolling_std(close, 20, ddof=0)
+        width = values['bollinger_width'][:, None]
+        bollinger_vote = (close < mid - width * deviation).astype(np.int8) - (close > mid + width * deviation)
+
+    shape = tuple(len(values[name]) for name in GRID_PARAMETERS)
+    index = {name: i.ravel() for name, i in zip(GRID_PARAMETERS, np.indices(shape))}
+    keep = values['fast_ma'][index['fast_ma']] < values['slow_ma'][index['slow_ma']]
+    index = {name: i[keep] for name, i in index.items()}
+    if not keep.any():
+        raise ValueError("The grid has no combination with fast_ma shorter than slow_ma")
+    if len(index['rsi_buy']) > MAX_GRID_COMBINATIONS:
+        raise ValueError(f"The grid has {len(index['rsi_buy'])} combinations; the limit is {MAX_GRID_COMBINATIONS}")
+
+    # Moving-average votes only depend on the (fast, slow) pair
+    pairs, pair_index = np.unique(np.stack([fast[index['fast_ma']], slow[index['slow_ma']]]), axis=1, return_inverse=True)
+    with np.errstate(invalid='ignore'):
+        ma_vote = (averages[pairs[0]] > averages[pairs[1]]).astype(np.int8) - (averages[pairs[0]] < averages[pairs[1]])
+
+    votes = rsi_buy[index['rsi_buy']] - rsi_sell[index['rsi_sell']]
+    votes += macd_vote
+    votes += ma_vote[pair_index.ravel()]
+    votes += bollinger_vote[index['bollinger_width']]
+    parameters = {name: values[name][index[name]] for name in GRID_PARAMETERS}
+    return np.sign(votes), parameters
+
+
+def grid_backtest(close, daily_returns, grid=None, indicators=None, initial_capital=100000,
+                  rank_by='Sharpe_Ratio', top=None):
+    """
+    Backtest every parameter combination at once and rank them.
+
+    Returns:
+        DataFrame with one row per combination (parameters + metrics), best first
+    """
+    if rank_by not in RANKABLE_METRICS:
+        raise ValueError(f"rank_by must be one of: {', '.join(RANKABLE_METRICS)}")
+    positions, parameters = grid_positions(close, grid, indicators)
+    metrics = backtest_metrics(positions, daily_returns, initial_capital)
+    table = pd.DataFrame({**parameters, **metrics})
+    for name in ('fast_ma', 'slow_ma'):
+        table[name] = table[name].astype(int)
+    # Drawdowns are negative, so "best" is the largest value for every metric
+    table = table.sort_values(rank_by, ascending=False, na_position='last', kind='stable').reset_index(drop=True)
+    table.insert(0, 'Rank', np.arange(1, len(table) + 1))
+    return table if top is None else table.head(top)
+
+
+def walk_forward_folds(days, train_days=DEFAULT_TRAIN_DAYS, test_days=DEFAULT_TEST_DAYS, anchored=False):
+    """
+    (train_start, test_start, test_end) index triples of consecutive folds.
+
+    Test windows follow each other without overlap and the last one may be
+    shorter; anchored folds keep every train window starting at day 0.
+    """
+    if train_days < 2 or test_days < 2:
+        raise ValueError("train_days and test_days must be at least 2")
+    if days < train_days + test_days:
+        raise ValueError(f"Walk-forward needs at least {train_days + test_days} days of history, got {days}")
+    return [
+        (0 if anchored else test_start - train_days, test_start, min(test_start + test_days, days))
+        for test_start in range(train_days, days - 1, test_days)
+    ]
+
+
+def _evaluate_fold(positions, daily_returns, fold, rank_by, initial_capital):
+    """Pick the best candidate on the train window and score it on the test window"""
+    train_start, test_start, test_end = fold
+    train = backtest_metrics(positions[:, train_start:test_start], daily_returns[train_start:test_start], initial_capital)
+    score = np.nan_to_num(train[rank_by], nan=-np.inf)
+    best = int(score.argmax())
+    test = backtest_metrics(positions[best, test_start:test_end], daily_returns[test_start:test_end], initial_capital)
+    return best, {name: float(values[best]) for name, values in train.items()}, {name: float(value) for name, value in test.items()}
+
+
+def _share_arrays(arrays):
+    """Copy arrays into one shared-memory block; returns the block and the layout workers need to view them"""
+    layout, offset = [], 0
+    for array in arrays:
+        offset = -(-offset // 8) * 8
+        layout.append((offset, array.dtype.str, array.shape))
+        offset += array.nbytes
+    block = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+    for array, (start, dtype, shape) in zip(arrays, layout):
+        np.ndarray(shape, dtype=dtype, buffer=block.buf, offset=start)[...] = array
+    return block, layout
+
+
+def _attach_shared(name):
+    """
+    Open a shared block created by the parent without registering it with the resource
+    tracker. The parent owns and unlinks the block; a registration here would make the
+    tracker unlink it (or warn about a leak) too, and unregistering it afterwards would
+    also drop the parent's entry from the tracker the workers share with it.
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    # Pool workers run one task at a time, so swapping the hook is safe here
+    register = resource_tracker.register
+    resource_tracker.register = lambda name, rtype: None
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+def _evaluate_shared_folds(name, layout, folds, rank_by, initial_capital):
+    """Worker side of walk_forward_backtest: evaluate folds on views of the shared block"""
+    block = _attach_shared(name)
+    try:
+        positions, daily_returns = (np.ndarray(shape, dtype=dtype, buffer=block.buf, offset=start)
+                                    for start, dtype, shape in layout)
+        results = [_evaluate_fold(positions, daily_returns, fold, rank_by, initial_capital) for fold in folds]
+        # The views must be gone before the block can be closed
+        del positions, daily_returns
+        return results
+    finally:
+        block.close()
+
+
+def walk_forward_backtest(positions, daily_returns, parameters=None, train_days=DEFAULT_TRAIN_DAYS,
+                          test_days=DEFAULT_TEST_DAYS, anchored=False, rank_by='Sharpe_Ratio',
+                          initial_capital=100000, workers=None, dates=None):
+    """
+    Walk-forward backtest over candidate position series.
+
+    In every fold the candidate ranking best by rank_by on the train window is
+    traded on the following test window. With workers > 1, folds are spread over
+    the shared process pool; the arrays are placed in shared memory once and
+    each worker only receives fold bounds.
+
+    Args:
+        positions: (candidates, days) positions, e.g. from grid_positions, or a single (days,) series
+        parameters: optional {name: (candidates,) values} describing each candidate
+        dates: optional labels for the day index, used in the fold report
+
+    Returns:
+        dict with per-fold picks and metrics, 'out_of_sample' metrics of the stitched
+        test windows and 'in_sample' metrics averaged over the train windows
+    """
+    if rank_by not in RANKABLE_METRICS:
+        raise ValueError(f"rank_by must be one of: {', '.join(RANKABLE_METRICS)}")
+    positions = np.atleast_2d(np.asarray(positions, dtype=np.int8))
+    daily_returns = np.nan_to_num(np.asarray(daily_returns, dtype=np.float64))
+    folds = walk_forward_folds(positions.shape[-1], train_days, test_days, anchored)
+
+    if not workers or workers <= 1 or len(folds) == 1:
+        results = [_evaluate_fold(positions, daily_returns, fold, rank_by, initial_capital) for fold in folds]
+    else:
+        block, layout = _share_arrays([positions, daily_returns])
+        try:
+            pool = get_process_pool()
+            futures = [
+                pool.submit(_evaluate_shared_folds, block.name, layout, [folds[i] for i in group], rank_by, initial_capital)
+                for group in np.array_split(np.arange(len(folds)), min(workers, len(folds)))
+            ]
+            results = [result for future in futures for result in future.result()]
+        finally:
+            block.close()
+            block.unlink()
+
+    parameters = parameters or {}
+    label = (lambda i: i) if dates is None else (lambda i: dates[i])
+    report = []
+    for (train_start, test_start, test_end), (best, train, test) in zip(folds, results):
+        report.append({
+            'train_start': label(train_start),
+            'test_start': label(test_start),
+            'test_end': label(test_end - 1),
+            'parameters': {name: values[best].item() for name, values in parameters.items()},
+            'in_sample': train,
+            'out_of_sample': test
+        })
+
+    # One continuous out-of-sample track: each test window traded with its fold's pick
+    first, last = folds[0][1], folds[-1][2]
+    stitched = np.concatenate([positions[best, start:end] for (_, start, end), (best, _, _) in zip(folds, results)])
+    out_of_sample = backtest_metrics(stitched, daily_returns[first:last], initial_capital)
+    return {
+        'folds': report,
+        'out_of_sample': {name: float(value) for name, value in out_of_sample.items()},
+        'in_sample': {name: float(np.mean([train[name] for _, train, _ in results])) for name in results[0][1]}
+    }
+
+
+def _rebalanced_growth(prices, target, transaction_cost):
+    """
+    Post-trade equity multiple at each rebalance and the turnover traded there.
+
+    Between rebalances the holdings drift with prices, so the equity multiple
+    over a period is 1 + sum(w * (price ratio - 1)); trading back to the new
+    targets costs transaction_cost times the traded fraction of equity.
+    """
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ratio = np.nan_to_num(prices[1:] / prices[:-1], nan=1.0)
+    held = target[:-1] * ratio
+    gross = 1 - target[:-1].sum(axis=1) + held.sum(axis=1)
+    drifted = np.vstack([np.zeros_like(target[:1]), held / gross[:, None]])
+    turnover = np.abs(target - drifted).sum(axis=1)
+    growth = np.concatenate([[1.0], gross]) * (1 - transaction_cost * turnover)
+    return np.cumprod(growth), drifted, turnover
+
+
+def _daily_equity(close, rebalance, target, equity):
+    """Daily equity from the post-trade equity and weights of the latest rebalance"""
+    segment = np.searchsorted(rebalance, np.arange(len(close)), side='right') - 1
+    weights = target[segment]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ratio = np.nan_to_num(close / close[rebalance][segment], nan=1.0)
+    return equity[segment] * (1 - weights.sum(axis=1) + (weights * ratio).sum(axis=1))
+
+
+def portfolio_backtest(close, signals, weights=None, rebalance_days=REBALANCE_SCHEDULES['monthly'],
+                       initial_capital=100000, transaction_cost=0.0, long_only=False,
+                       risk_free_rate=RISK_FREE_RATE):
+    """
+    Backtest a multi-symbol portfolio over an aligned (days x symbols) close matrix.
+
+    Every rebalance_days the book is traded at the close back to
+    weight x signal for each symbol (short on -1, flat on 0; idle weight is
+    cash). Unlisted (NaN) symbols get no weight. The market benchmark is the same
+    schedule always long.
+
+    Args:
+        close: (days, symbols) prices, NaN before a symbol lists
+        signals: (days, symbols) -1/0/1 signals
+        weights: (symbols,) base weights, equal by default
+        transaction_cost: cost as a fraction of traded value
+
+    Returns:
+        dict with 'metrics', daily 'equity', the 'rebalance_days' indexes, the
+        target 'weights' there and the trade 'ledger' (TRADE_LEDGER_DTYPE array)
+    """
+    close = np.asarray(close, dtype=np.float64)
+    days, symbols = close.shape
+    if np.shape(signals) != close.shape:
+        raise ValueError("signals must have the same (days x symbols) shape as close")
+    if rebalance_days < 1:
+        raise ValueError("rebalance_days must be at least 1")
+    base = np.full(symbols, 1.0 / symbols) if weights is None else np.asarray(weights, dtype=np.float64)
+    if base.shape != (symbols,) or (base < 0).any() or base.sum() <= 0:
+        raise ValueError("Provide one non-negative weight per symbol")
+    base = base / base.sum()
+
+    rebalance = np.arange(0, days, rebalance_days)
+    prices = close[rebalance]
+    listed = np.isfinite(prices)
+    direction = np.clip(np.asarray(signals)[rebalance], 0 if long_only else -1, 1)
+    target = np.where(listed, base * direction, 0.0)
+    multiple, drifted, turnover = _rebalanced_growth(prices, target, transaction_cost)
+    equity = initial_capital * _daily_equity(close, rebalance, target, multiple)
+
+    market_target = np.where(listed, base, 0.0)
+    market_multiple = _rebalanced_growth(prices, market_target, transaction_cost)[0]
+    market = _daily_equity(close, rebalance, market_target, market_multiple)
+
+    # Ledger: shares held after each rebalance, differenced
+    pre_trade = initial_capital * multiple / (1 - transaction_cost * turnover)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        shares = np.nan_to_num(target * (initial_capital * multiple)[:, None] / prices)
+    traded = np.diff(shares, axis=0, prepend=0.0)
+    row, column = np.nonzero(traded)
+    ledger = np.empty(len(row), dtype=TRADE_LEDGER_DTYPE)
+    ledger['day'] = rebalance[row]
+    ledger['symbol'] = column
+    ledger['shares'] = traded[row, column]
+    ledger['price'] = prices[row, column]
+    ledger['value'] = ledger['shares'] * ledger['price']
+    ledger['cost'] = transaction_cost * np.abs(target - drifted)[row, column] * pre_trade[row]
+
+    strategy_returns = np.concatenate([[0.0], equity[1:] / equity[:-1] - 1])
+    metrics = {
+        name: float(value)
+        for name, value in _return_metrics(strategy_returns, market[-1] - 1, initial_capital, risk_free_rate).items()
+    }
+    metrics['Turnover'] = float(turnover.sum())
+    metrics['Trades'] = len(ledger)
+    return {
+        'metrics': metrics,
+        'equity': equity,
+        'rebalance_days': rebalance,
+        'weights': target,
+        'ledger': ledger
+    }
+
+
+def _reference_portfolio(close, signals, weights, rebalance_days, initial_capital, transaction_cost, long_only=False):
+    """Day-by-day cash and share bookkeeping, kept as the parity and benchmark baseline"""
+    days, symbols = close.shape
+    cash, shares = initial_capital, np.zeros(symbols)
+    equity, trades = np.empty(days), []
+    low = 0 if long_only else -1
+    for day in range(days):
+        prices = close[day]
+        value = cash + sum(shares[i] * prices[i] for i in range(symbols) if shares[i])
+        if day % rebalance_days == 0:
+            targets = [
+                weights[i] * min(max(signals[day, i], low), 1) * value if np.isfinite(prices[i]) else 0.0
+                for i in range(symbols)
+            ]
+            cost = transaction_cost * sum(abs(targets[i] - shares[i] * (prices[i] if shares[i] else 0)) for i in range(symbols))
+            value -= cost
+            cash = value
+            for i in range(symbols):
+                new = targets[i] * (value / (value + cost)) / prices[i] if targets[i] else 0.0
+                if new != shares[i]:
+                    trades.append((day, i, new - shares[i]))
+                shares[i] = new
+                cash -= new * prices[i] if new else 0.0
+        equity[day] = value
+    return equity, trades
+
+
+def _reference_backtest(df, signals, initial_capital=100000):
+    """The DataFrame-based backtest_strategy, kept as the benchmark and parity baseline"""
+    df = df.copy()
+    positions = pd.Series(index=df.index, data=0)
+    positions[signals == 1] = 1
+    positions[signals == -1] = -1
+    df['Strategy_Returns'] = (positions.shift(1) * df['Daily_Return']).fillna(0)
+    df['Cum_Market_Returns'] = (1 + df['Daily_Return']).cumprod()
+    df['Cum_Strategy_Returns'] = (1 + df['Strategy_Returns']).cumprod()
+    df['Portfolio_Value'] = initial_capital * df['Cum_Strategy_Returns']
+    total_return = df['Cum_Strategy_Returns'].iloc[-1] - 1
+    market_return = df['Cum_Market_Returns'].iloc[-1] - 1
+    sharpe_ratio = (total_return - RISK_FREE_RATE) / (df['Strategy_Returns'].std() * np.sqrt(252))
+    drawdowns = df['Portfolio_Value'] / df['Portfolio_Value'].expanding().max() - 1
+    win_rate = len(df[df['Strategy_Returns'] > 0]) / len(df[df['Strategy_Returns'] != 0])
+    return {
+        'Total_Return': total_return,
+        'Market_Return': market_return,
+        'Excess_Return': total_return - market_return,
+        'Sharpe_Ratio': sharpe_ratio,
+        'Max_Drawdown': drawdowns.min(),
+        'Win_Rate': win_rate,
+        'Final_Portfolio_Value': df['Portfolio_Value'].iloc[-1]
+    }
+
+
+def _prepared_history(days, seed=0):
+    """Synthetic history with indicators, filled the way fetch_historical_data fills it"""
+    df = synthetic_ohlcv(days, seed=seed)
+    indicators = compute_indicators(df)
+    filled = pd.concat([df, pd.DataFrame(indicators, index=df.index)], axis=1).ffill().bfill().fillna(0)
+    return df, indicators, filled
+
+
+def check_parity(days=TRADING_DAYS, rtol=1e-9):
+    """Grid rows must reproduce backtest_strategy for the same rule parameters"""
+    df, indicators, filled = _prepared_history(days)
+    table = grid_backtest(df['Close'], filled['Daily_Return'], indicators=indicators)
+    mismatched = []
+    for row in table.sample(10, random_state=0).itertuples(index=False):
+        params = {name: [getattr(row, name)] for name in GRID_PARAMETERS}
+        positions, _ = grid_positions(df['Close'], params, indicators)
+        expected = _reference_backtest(filled, positions[0])
+        if not all(np.isclose(getattr(row, name), value, rtol=rtol, equal_nan=True) for name, value in expected.items()):
+            mismatched.append(params)
+    default = grid_positions(df['Close'], {'rsi_buy': 30, 'rsi_sell': 70, 'fast_ma': 50, 'slow_ma': 200,
+                                           'bollinger_width': 2}, indicators)[0][0]
+    if not np.array_equal(default, indicators['Signal']):
+        mismatched.append('default signal')
+    return mismatched
+
+
+def check_walk_forward_parity(days=5 * TRADING_DAYS, rtol=1e-9):
+    """Each fold must match a DataFrame backtest of its pick, for serial and pooled runs alike"""
+    df, indicators, filled = _prepared_history(days)
+    positions, parameters = grid_positions(df['Close'], indicators=indicators)
+    serial = walk_forward_backtest(positions, filled['Daily_Return'], parameters)
+    pooled = walk_forward_backtest(positions, filled['Daily_Return'], parameters, workers=2)
+    mismatched = [] if serial == pooled else ['pooled run']
+    for fold in serial['folds']:
+        window = slice(fold['test_start'], fold['test_end'] + 1)
+        params = {name: [value] for name, value in fold['parameters'].items()}
+        expected = _reference_backtest(filled.iloc[window], grid_positions(df['Close'], params, indicators)[0][0][window])
+        if not all(np.isclose(fold['out_of_sample'][name], value, rtol=rtol, equal_nan=True) for name, value in expected.items()):
+            mismatched.append(fold['test_start'])
+    return mismatched
+
+
+def benchmark_walk_forward(days=10 * TRADING_DAYS, workers=4):
+    """Time a walk-forward grid search serially and over the process pool"""
+    df, indicators, filled = _prepared_history(days)
+    positions, parameters = grid_positions(df['Close'], indicators=indicators)
+    timings = {}
+    for label, count in (('serial', None), (f'{workers} workers', workers)):
+        walk_forward_backtest(positions, filled['Daily_Return'], parameters, workers=count)
+        start = time.perf_counter()
+        result = walk_forward_backtest(positions, filled['Daily_Return'], parameters, workers=count)
+        timings[label] = time.perf_counter() - start
+
+    print(f"Walk-forward over {len(result['folds'])} folds x {len(positions)} combinations ({days} days):")
+    for label, elapsed in timings.items():
+        print(f"  {label:<10} {elapsed * 1000:9.1f} ms")
+    print(f"  in-sample Sharpe {result['in_sample']['Sharpe_Ratio']:.2f}, "
+          f"out-of-sample Sharpe {result['out_of_sample']['Sharpe_Ratio']:.2f}")
+    print(f"  parity: {'ok' if not check_walk_forward_parity() else 'FAIL'}")
+
+
+def _portfolio_inputs(symbols, days):
+    """Aligned (days x symbols) closes and default-strategy signals of a synthetic universe"""
+    _, _, high, low, close, volume = align_ohlcv(_synthetic_universe(symbols, days))
+    signals = compute_indicator_matrix(high, low, close, volume)['Signal']
+    return close.T, signals.T
+
+
+def check_portfolio_parity(symbols=8, days=2 * TRADING_DAYS, rtol=1e-9):
+    """The vectorized portfolio must match day-by-day bookkeeping and, for one symbol, backtest_strategy"""
+    close, signals = _portfolio_inputs(symbols, days)
+    mismatched = []
+    for rebalance_days, transaction_cost in ((1, 0.0), (5, 0.001), (21, 0.0025)):
+        result = portfolio_backtest(close, signals, rebalance_days=rebalance_days, transaction_cost=transaction_cost)
+        equity, trades = _reference_portfolio(close, signals, np.full(symbols, 1 / symbols), rebalance_days,
+                                              100000, transaction_cost)
+        ledger = result['ledger']
+        if not np.allclose(result['equity'], equity, rtol=rtol) or len(ledger) != len(trades) or not np.allclose(
+                ledger['shares'], [shares for _, _, shares in trades], rtol=1e-6):
+            mismatched.append((rebalance_days, transaction_cost))
+
+    df, indicators, filled = _prepared_history(days)
+    single = portfolio_backtest(df[['Close']].to_numpy(), indicators['Signal'][:, None], rebalance_days=1)
+    expected = _reference_backtest(filled, indicators['Signal'])
+    # The filled Daily_Return back-fills day 0, so only the strategy side is comparable
+    if not all(np.isclose(single['metrics'][name], expected[name], rtol=1e-7)
+               for name in expected if name not in ('Market_Return', 'Excess_Return')):
+        mismatched.append('single symbol')
+    return mismatched
+
+
+def benchmark_portfolio(symbols=100, days=10 * TRADING_DAYS):
+    """Time a monthly-rebalanced portfolio backtest against day-by-day bookkeeping"""
+    _, _, high, low, close, volume = align_ohlcv(_synthetic_universe(symbols, days))
+    start = time.perf_counter()
+    signals = compute_indicator_matrix(high, low, close, volume)['Signal'].T
+    indicators = time.perf_counter() - start
+    start = time.perf_counter()
+    result = portfolio_backtest(close.T, signals, transaction_cost=0.001)
+    vectorized = time.perf_counter() - start
+    start = time.perf_counter()
+    _reference_portfolio(close.T, signals, np.full(symbols, 1 / symbols), REBALANCE_SCHEDULES['monthly'], 100000, 0.001)
+    looped = time.perf_counter() - start
+
+    print(f"Portfolio backtest of {symbols} symbols x {days} days, monthly rebalancing ({result['metrics']['Trades']} trades):")
+    print(f"  indicator matrix + signals: {indicators * 1000:9.1f} ms")
+    print(f"  day-by-day bookkeeping:     {looped * 1000:9.1f} ms")
+    print(f"  vectorized accounting:      {vectorized * 1000:9.1f} ms ({looped / vectorized:.0f}x)")
+    print(f"  parity: {'ok' if not check_portfolio_parity() else 'FAIL'}")
+
+
+def benchmark(days=TRADING_DAYS):
+    """Time a full grid sweep against one DataFrame backtest per combination"""
+    df, indicators, filled = _prepared_history(days)
+    start = time.perf_counter()
+    table = grid_backtest(df['Close'], filled['Daily_Return'], indicators=indicators)
+    vectorized = time.perf_counter() - start
+
+    positions, _ = grid_positions(df['Close'], indicators=indicators)
+    sample = positions[:50]
+    start = time.perf_counter()
+    for row in sample:
+        _reference_backtest(filled, row)
+    looped = (time.perf_counter() - start) * len(positions) / len(sample)
+
+    print(f"Grid backtest over {len(table)} combinations x {days} days:")
+    print(f"  DataFrame backtest per combination (extrapolated): {looped * 1000:9.1f} ms")
+    print(f"  vectorized sweep:                                  {vectorized * 1000:9.1f} ms ({looped / vectorized:.0f}x)")
+    print(f"  parity: {'ok' if not check_parity() else 'FAIL'}")
+
+
+if __name__ == "__main__":
+    benchmark()
+    benchmark_walk_forward()
+    benchmark_portfolio()
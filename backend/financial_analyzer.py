@@ -1,62 +1,41 @@
 # financial_analyzer.py
 
-import yfinance as yf
 import pandas as pd
 import numpy as np
-from ta.trend import MACD, EMAIndicator
-from ta.momentum import RSIIndicator, StochasticOscillator
-from ta.volatility import BollingerBands
-from ta.volume import OnBalanceVolumeIndicator, AccDistIndexIndicator
 from groq import Groq
 import re
+from indicators import compute_indicators
+from price_store import get_price_store
+
+ANALYZER_COLUMNS = [
+    '50_MA', '200_MA', '20_EMA', 'MACD', 'MACD_Signal', 'MACD_Histogram',
+    'RSI', 'Stoch_K', 'Stoch_D', 'Bollinger_Upper', 'Bollinger_Lower', 'BB_Width',
+    'OBV', 'ADI', 'Daily_Return', 'Volatility'
+]
 
 class FinancialAnalyzer:
     def __init__(self, symbol, api_key):
         self.symbol = symbol
-        self.stock = yf.Ticker(symbol)
         self.client = Groq(api_key=api_key)
     
     def fetch_historical_data(self, period="1y"):
         """Fetch and process historical data with technical indicators"""
         try:
-            df = self.stock.history(period=period)
+            df = get_price_store().history(self.symbol, period)
             
             if df.empty:
                 raise ValueError(f"No data found for symbol {self.symbol}")
             
             # Fill NaN values
-            df = df.fillna(method='ffill').fillna(method='bfill')
-            
-            # Calculate technical indicators
-            df['50_MA'] = df['Close'].rolling(window=50, min_periods=1).mean()
-            df['200_MA'] = df['Close'].rolling(window=200, min_periods=1).mean()
-            df['20_EMA'] = EMAIndicator(close=df['Close'], window=20).ema_indicator()
-            
-            # MACD
-            macd = MACD(df['Close'])
-            df['MACD'] = macd.macd()
-            df['MACD_Signal'] = macd.macd_signal()
-            df['MACD_Histogram'] = macd.macd_diff()
+            df = df.ffill().bfill()
             
-            # RSI and Stochastic
-            df['RSI'] = RSIIndicator(df['Close']).rsi()
-            stoch = StochasticOscillator(df['High'], df['Low'], df['Close'])
-            df['Stoch_K'] = stoch.stoch()
-            df['Stoch_D'] = stoch.stoch_signal()
-            
-            # Bollinger Bands
-            bollinger = BollingerBands(df['Close'])
-            df['Bollinger_Upper'] = bollinger.bollinger_hband()
-            df['Bollinger_Lower'] = bollinger.bollinger_lband()
+            # Calculate technical indicators in one pass and keep the columns this view exposes
+            indicators = compute_indicators(df)
+            for column in ANALYZER_COLUMNS:
+                df[column] = indicators[column]
+            # This view scales band width by price and needs a full 20-day volatility window
             df['BB_Width'] = (df['Bollinger_Upper'] - df['Bollinger_Lower']) / df['Close']
-            
-            # Volume Indicators
-            df['OBV'] = OnBalanceVolumeIndicator(df['Close'], df['Volume']).on_balance_volume()
-            df['ADI'] = AccDistIndexIndicator(df['High'], df['Low'], df['Close'], df['Volume']).acc_dist_index()
-            
-            # Volatility
-            df['Daily_Return'] = df['Close'].pct_change()
-            df['Volatility'] = df['Daily_Return'].rolling(window=20).std() * np.sqrt(252)
+            df.iloc[:20, df.columns.get_loc('Volatility')] = np.nan
             
             # Clean up any remaining NaN values
             df = df.fillna(0)
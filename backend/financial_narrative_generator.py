@@ -1,17 +1,19 @@
-import yfinance as yf
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-from ta.trend import MACD, EMAIndicator
-from ta.momentum import RSIIndicator, StochasticOscillator
-from ta.volatility import BollingerBands
-from ta.volume import OnBalanceVolumeIndicator, AccDistIndexIndicator
 from groq import Groq
 import warnings
+from collections import ChainMap
 from scipy.stats import norm, skew
 from scipy import stats
+from monte_carlo import run_monte_carlo
+from trading_rules import strategy_signals
+from backtesting import (DEFAULT_TEST_DAYS, DEFAULT_TRAIN_DAYS, backtest_metrics, grid_backtest, grid_positions,
+                         walk_forward_backtest)
+from indicators import indicator_frame, trading_signals, adx, directional_movement
+from price_store import get_price_store
 
 warnings.filterwarnings('ignore')
 pd.options.mode.chained_assignment = None
@@ -20,6 +22,27 @@ pd.options.mode.chained_assignment = None
 warnings.filterwarnings('ignore', category=RuntimeWarning)
 
 class ConfidenceScorer:
+    # Weights of the sub-scores within each component
+    TECHNICAL_WEIGHTS = {
+        'trend_agreement': 0.25,
+        'rsi_confidence': 0.15,
+        'macd_strength': 0.20,
+        'trend_strength': 0.25,
+        'volume_confidence': 0.15
+    }
+    STATISTICAL_WEIGHTS = {
+        'skewness': 0.25,
+        'volatility': 0.25,
+        'var_confidence': 0.25,
+        'interval_confidence': 0.25
+    }
+    MARKET_WEIGHTS = {
+        'sharpe_ratio': 0.3,
+        'win_rate': 0.3,
+        'market_stability': 0.2,
+        'excess_return': 0.2
+    }
+    
     def __init__(self):
         self.weight_technical = 0.3
         self.weight_statistical = 0.4
@@ -44,8 +67,12 @@ class ConfidenceScorer:
         macd_signal_ratio = abs(data['MACD_Histogram'].iloc[-1] / data['MACD'].iloc[-1])
         scores['macd_strength'] = min(macd_signal_ratio, 1) if not np.isnan(macd_signal_ratio) else 0.5
         
-        # ADX Trend Strength
-        adx = data['ADX'].iloc[-1]
+        # ADX Trend Strength, reusing the indicator frame's ADX when it has one
+        if 'ADX' in data:
+            adx = data['ADX'].iloc[-1]
+        else:
+            high, low, close = (data[column].to_numpy(dtype=np.float64) for column in ('High', 'Low', 'Close'))
+            adx = directional_movement(high, low, close)[2][-1]
         scores['trend_strength'] = min(adx / 50, 1)  # Normalized ADX
         
         # Volume Confirmation
@@ -54,13 +81,7 @@ class ConfidenceScorer:
         scores['volume_confidence'] = min(vol_current / vol_avg, 1.5) / 1.5
         
         # Weight and combine technical scores
-        weights = {
-            'trend_agreement': 0.25,
-            'rsi_confidence': 0.15,
-            'macd_strength': 0.20,
-            'trend_strength': 0.25,
-            'volume_confidence': 0.15
-        }
+        weights = self.TECHNICAL_WEIGHTS
         
         technical_score = sum(score * weights[key] for key, score in scores.items())
         return technical_score, scores
@@ -92,12 +113,7 @@ class ConfidenceScorer:
         scores['interval_confidence'] = max(1 - interval_width, 0)
         
         # Weight and combine statistical scores
-        weights = {
-            'skewness': 0.25,
-            'volatility': 0.25,
-            'var_confidence': 0.25,
-            'interval_confidence': 0.25
-        }
+        weights = self.STATISTICAL_WEIGHTS
         
         statistical_score = sum(score * weights[key] for key, score in scores.items())
         return statistical_score, scores
@@ -122,12 +138,7 @@ class ConfidenceScorer:
         scores['excess_return'] = max(excess_return_score, 0)
         
         # Weight and combine market scores
-        weights = {
-            'sharpe_ratio': 0.3,
-            'win_rate': 0.3,
-            'market_stability': 0.2,
-            'excess_return': 0.2
-        }
+        weights = self.MARKET_WEIGHTS
         
         market_score = sum(score * weights[key] for key, score in scores.items())
         return market_score, scores
@@ -181,155 +192,59 @@ class ConfidenceScorer:
 class FinancialNarrativeGenerator:
     def __init__(self, symbol, api_key):
         self.symbol = symbol
-        self.stock = yf.Ticker(symbol)
         self.client = Groq(api_key=api_key)
         self.confidence_scorer = ConfidenceScorer()
         
     def fetch_historical_data(self, period="1y"):
         """Fetch historical data and calculate comprehensive technical indicators"""
-        # Get base data
-        df = self.stock.history(period=period)
+        # Get base data, from the local price store when it is fresh
+        df = get_price_store().history(self.symbol, period)
         
         # Handle empty dataframes
         if df.empty:
             raise ValueError(f"No data found for symbol {self.symbol}")
             
-        # Create a dictionary to store all indicators
-        indicators = {}
-        
-        # Basic Moving Averages
-        indicators['50_MA'] = df['Close'].rolling(window=50, min_periods=1).mean()
-        indicators['200_MA'] = df['Close'].rolling(window=200, min_periods=1).mean()
-        indicators['20_EMA'] = EMAIndicator(close=df['Close'], window=20).ema_indicator()
-        
-        # MACD
-        macd = MACD(df['Close'])
-        indicators['MACD'] = macd.macd()
-        indicators['MACD_Signal'] = macd.macd_signal()
-        indicators['MACD_Histogram'] = macd.macd_diff()
-        
-        # RSI and Stochastic
-        indicators['RSI'] = RSIIndicator(df['Close']).rsi()
-        stoch = StochasticOscillator(df['High'], df['Low'], df['Close'])
-        indicators['Stoch_K'] = stoch.stoch()
-        indicators['Stoch_D'] = stoch.stoch_signal()
-        
-        # Bollinger Bands
-        bollinger = BollingerBands(df['Close'])
-        indicators['Bollinger_Upper'] = bollinger.bollinger_hband()
-        indicators['Bollinger_Lower'] = bollinger.bollinger_lband()
-        indicators['Bollinger_Mid'] = bollinger.bollinger_mavg()
-        indicators['BB_Width'] = (bollinger.bollinger_hband() - bollinger.bollinger_lband()) / bollinger.bollinger_mavg()
-        
-        # Volume Indicators
-        indicators['OBV'] = OnBalanceVolumeIndicator(df['Close'], df['Volume']).on_balance_volume()
-        indicators['ADI'] = AccDistIndexIndicator(df['High'], df['Low'], df['Close'], df['Volume']).acc_dist_index()
-        
-        # Price Channels
-        indicators['Upper_Channel'] = df['High'].rolling(window=20, min_periods=1).max()
-        indicators['Lower_Channel'] = df['Low'].rolling(window=20, min_periods=1).min()
-        
-        # Support and Resistance Levels
-        indicators['Support'] = df['Low'].rolling(window=20, min_periods=1).min()
-        indicators['Resistance'] = df['High'].rolling(window=20, min_periods=1).max()
-        
-        # Volatility Indicators
-        indicators['Daily_Return'] = df['Close'].pct_change()
-        indicators['Volatility'] = indicators['Daily_Return'].rolling(window=20, min_periods=1).std() * np.sqrt(252)
-        
-        # Calculate ADX
-        adx_data = self.calculate_adx(df)
-        indicators['ADX'] = adx_data
-        
-        # Trend Strength
-        indicators['Trend_Strength'] = np.abs(indicators['50_MA'] - indicators['200_MA']) / indicators['200_MA']
-        
-        # Generate trading signals
-        indicators['Signal'] = self.generate_trading_signals(df, indicators)
-        
-        # Combine all indicators with original data efficiently
-        result_df = pd.concat([df, pd.DataFrame(indicators)], axis=1)
+        # All indicators in one pass over the OHLCV arrays
+        indicators = indicator_frame(df)
+        result_df = pd.concat([df, indicators], axis=1)
         
         # Final NaN cleanup
-        result_df = result_df.fillna(method='ffill').fillna(method='bfill').fillna(0)
+        result_df = result_df.ffill().bfill().fillna(0)
         
         return result_df
     
-    def generate_trading_signals(self, df, indicators):
-        """Generate trading signals based on technical indicators"""
-        signals = pd.Series(index=df.index, data=0)
-        
-        # RSI signals
-        signals += np.where(indicators['RSI'] < 30, 1, 0)  # Oversold
-        signals += np.where(indicators['RSI'] > 70, -1, 0)  # Overbought
-        
-        # MACD signals
-        signals += np.where(indicators['MACD'] > indicators['MACD_Signal'], 1, 0)
-        signals += np.where(indicators['MACD'] < indicators['MACD_Signal'], -1, 0)
-        
-        # Moving Average signals
-        signals += np.where(indicators['50_MA'] > indicators['200_MA'], 1, 0)
-        signals += np.where(indicators['50_MA'] < indicators['200_MA'], -1, 0)
-        
-        # Bollinger Bands signals
-        signals += np.where(df['Close'] < indicators['Bollinger_Lower'], 1, 0)
-        signals += np.where(df['Close'] > indicators['Bollinger_Upper'], -1, 0)
-        
-        return signals.apply(lambda x: 1 if x > 0 else (-1 if x < 0 else 0))
-    
-    def monte_carlo_simulation(self, df, num_simulations=1000, forecast_days=252):
-        """Perform Monte Carlo simulation for price forecasting with optimized DataFrame creation"""
-        returns = np.log(df['Close'] / df['Close'].shift(1))
-        mu = returns.mean()
-        sigma = returns.std()
-    
-        last_price = df['Close'].iloc[-1]
+    def generate_trading_signals(self, df, indicators, strategy=None):
+        """Generate trading signals from the built-in rules, or a named/inline rule set"""
+        if strategy is not None:
+            return pd.Series(strategy_signals(strategy, ChainMap(indicators, df)), index=df.index).astype(int)
+        indicators = {name: np.asarray(values, dtype=np.float64) for name, values in indicators.items()}
+        return pd.Series(trading_signals(df['Close'].to_numpy(dtype=np.float64), indicators), index=df.index).astype(int)
     
-        # Pre-allocate a numpy array for all simulations
-        all_simulations = np.zeros((forecast_days + 1, num_simulations))
-        all_simulations[0] = last_price
-    
-        # Perform all simulations using numpy operations
-        for day in range(1, forecast_days + 1):
-            random_returns = np.random.normal(mu, sigma, num_simulations)
-            all_simulations[day] = all_simulations[day-1] * np.exp(random_returns)
-    
-        # Convert to DataFrame efficiently
-        simulation_df = pd.DataFrame(
-            all_simulations,
-            columns=[f'Sim_{i}' for i in range(num_simulations)]
+    def monte_carlo_simulation(self, df, num_simulations=1000, forecast_days=252, dtype=np.float64, seed=None,
+                               chunk_size=None, workers=None, estimator='plain', tolerance=None,
+                               max_simulations=100000, kernel='gbm', kernel_options=None):
+        """Perform Monte Carlo simulation for price forecasting using the shared vectorized engine"""
+        return run_monte_carlo(
+            df['Close'],
+            num_simulations=num_simulations,
+            forecast_days=forecast_days,
+            dtype=dtype,
+            seed=seed,
+            chunk_size=chunk_size,
+            workers=workers,
+            estimator=estimator,
+            tolerance=tolerance,
+            max_simulations=max_simulations,
+            kernel=kernel,
+            kernel_options=kernel_options
         )
-    
-        # Calculate confidence intervals
-        sim_results = {
-            'mean_path': simulation_df.mean(axis=1),
-            'upper_95': simulation_df.apply(lambda x: np.percentile(x, 95), axis=1),
-            'lower_95': simulation_df.apply(lambda x: np.percentile(x, 5), axis=1),
-            'max_path': simulation_df.max(axis=1),
-            'min_path': simulation_df.min(axis=1)
-        }
-    
-        # Calculate risk metrics
-        returns_distribution = ((simulation_df.iloc[-1] - last_price) / last_price)
-        var_95 = np.percentile(returns_distribution, 5)
-        var_99 = np.percentile(returns_distribution, 1)
-        expected_shortfall = returns_distribution[returns_distribution <= var_95].mean()
-    
-        risk_metrics = {
-            'VaR_95': var_95,
-            'VaR_99': var_99,
-            'Expected_Shortfall': expected_shortfall,
-            'Expected_Return': returns_distribution.mean(),
-            'Return_Volatility': returns_distribution.std()
-        }
-        
-        return sim_results, risk_metrics
 
-    def backtest_strategy(self, df, initial_capital=100000):
-        """Backtest the trading strategy"""
+    def backtest_strategy(self, df, initial_capital=100000, strategy=None):
+        """Backtest the trading strategy (df['Signal'], or a named/inline rule set)"""
+        signals = df['Signal'] if strategy is None else strategy_signals(strategy, df)
         positions = pd.Series(index=df.index, data=0)
-        positions[df['Signal'] == 1] = 1  # Long position
-        positions[df['Signal'] == -1] = -1  # Short position
+        positions[signals == 1] = 1  # Long position
+        positions[signals == -1] = -1  # Short position
         
         # Calculate strategy returns
         df['Strategy_Returns'] = positions.shift(1) * df['Daily_Return']
@@ -371,39 +286,48 @@ class FinancialNarrativeGenerator:
         
         return metrics, df
     
-    def calculate_adx(self, df, period=14):
-        """Calculate Average Directional Index (ADX)"""
-        df = df.copy()
-        df['TR'] = np.maximum(
-            df['High'] - df['Low'],
-            np.maximum(
-                abs(df['High'] - df['Close'].shift(1)),
-                abs(df['Low'] - df['Close'].shift(1))
-            )
-        )
-        df['+DM'] = np.where(
-            (df['High'] - df['High'].shift(1)) > (df['Low'].shift(1) - df['Low']),
-            np.maximum(df['High'] - df['High'].shift(1), 0),
-            0
+    def backtest_metrics(self, df, initial_capital=100000, strategy=None):
+        """The metrics of backtest_strategy alone, computed on arrays without adding columns to df"""
+        signals = df['Signal'].to_numpy() if strategy is None else strategy_signals(strategy, df)
+        metrics = backtest_metrics(signals, df['Daily_Return'].to_numpy(), initial_capital)
+        return {name: float(value) for name, value in metrics.items()}
+    
+    def grid_backtest(self, df, grid=None, initial_capital=100000, rank_by='Sharpe_Ratio', top=20):
+        """Backtest every combination of RSI thresholds, MA windows and Bollinger widths, best first"""
+        return grid_backtest(
+            df['Close'],
+            df['Daily_Return'],
+            grid=grid,
+            initial_capital=initial_capital,
+            rank_by=rank_by,
+            top=top
         )
-        df['-DM'] = np.where(
-            (df['Low'].shift(1) - df['Low']) > (df['High'] - df['High'].shift(1)),
-            np.maximum(df['Low'].shift(1) - df['Low'], 0),
-            0
+    
+    def walk_forward_backtest(self, df, grid=None, strategy=None, train_days=DEFAULT_TRAIN_DAYS,
+                              test_days=DEFAULT_TEST_DAYS, anchored=False, rank_by='Sharpe_Ratio',
+                              initial_capital=100000, workers=None):
+        """Out-of-sample backtest: grid parameters (or a fixed strategy) re-chosen on rolling train windows"""
+        if strategy is not None:
+            positions, parameters = strategy_signals(strategy, df), None
+        else:
+            positions, parameters = grid_positions(df['Close'], grid)
+        return walk_forward_backtest(
+            positions,
+            df['Daily_Return'],
+            parameters,
+            train_days=train_days,
+            test_days=test_days,
+            anchored=anchored,
+            rank_by=rank_by,
+            initial_capital=initial_capital,
+            workers=workers,
+            dates=df.index.strftime('%Y-%m-%d')
         )
-        
-        df['TR' + str(period)] = df['TR'].rolling(window=period, min_periods=1).mean()
-        df['+DM' + str(period)] = df['+DM'].rolling(window=period, min_periods=1).mean()
-        df['-DM' + str(period)] = df['-DM'].rolling(window=period, min_periods=1).mean()
-        
-        df['+DI' + str(period)] = 100 * df['+DM' + str(period)] / df['TR' + str(period)].replace(0, np.nan)
-        df['-DI' + str(period)] = 100 * df['-DM' + str(period)] / df['TR' + str(period)].replace(0, np.nan)
-        
-        denominator = (df['+DI' + str(period)] + df['-DI' + str(period)])
-        df['DX'] = 100 * abs(df['+DI' + str(period)] - df['-DI' + str(period)]) / denominator.replace(0, np.nan)
-        
-        df['DX'] = df['DX'].fillna(method='ffill').fillna(method='bfill').fillna(0)
-        return df['DX'].rolling(window=period, min_periods=1).mean()
+    
+    def calculate_adx(self, df, period=14, smoothing='sma'):
+        """Calculate Average Directional Index (ADX) with 'sma' or 'wilder' smoothing"""
+        high, low, close = (df[column].to_numpy(dtype=np.float64) for column in ('High', 'Low', 'Close'))
+        return pd.Series(adx(high, low, close, period, smoothing), index=df.index)
     
     def get_stock_insights(self, data, sim_results=None, risk_metrics=None, backtest_metrics=None):
         """Generate comprehensive stock insights using Groq LLM with confidence scoring"""
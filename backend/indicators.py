@@ -0,0 +1,628 @@
+# indicators.py
+
+import time
+import numpy as np
+import pandas as pd
+from scipy.signal import lfilter
+
+TRADING_DAYS = 252
+
+INDICATOR_COLUMNS = [
+    '50_MA', '200_MA', '20_EMA',
+    'MACD', 'MACD_Signal', 'MACD_Histogram',
+    'RSI', 'Stoch_K', 'Stoch_D',
+    'Bollinger_Upper', 'Bollinger_Lower', 'Bollinger_Mid', 'BB_Width',
+    'OBV', 'ADI',
+    'Upper_Channel', 'Lower_Channel', 'Support', 'Resistance',
+    'Daily_Return', 'Volatility',
+    'Plus_DI', 'Minus_DI', 'ADX', 'Trend_Strength', 'Signal'
+]
+
+
+def _as_array(values):
+    """Contiguous float64 view (or copy) of a Series/array column"""
+    if isinstance(values, pd.Series):
+        values = values.to_numpy(dtype=np.float64)
+    return np.ascontiguousarray(values, dtype=np.float64)
+
+
+def _shift(values):
+    """Previous value along the last (time) axis, NaN for the first bar"""
+    shifted = np.empty_like(values)
+    shifted[..., 0] = np.nan
+    shifted[..., 1:] = values[..., :-1]
+    return shifted
+
+
+def _first_valid(values):
+    """Index of the first non-NaN value along the last axis (0 for all-NaN rows)"""
+    return np.argmax(~np.isnan(values), axis=-1)
+
+
+def _window_sums(values, window):
+    """Rolling sum over the trailing window, via a single cumulative sum"""
+    cumulative = np.cumsum(values, axis=-1)
+    sums = cumulative.copy()
+    sums[..., window:] -= cumulative[..., :-window]
+    return sums
+
+
+def _window_counts(values, window):
+    """Number of non-NaN observations in each trailing window"""
+    return _window_sums((~np.isnan(values)).astype(np.float64), window)
+
+
+def rolling_mean(values, window, min_periods=None):
+    """Trailing rolling mean that skips NaNs, matching pandas rolling().mean()"""
+    min_periods = window if min_periods is None else min_periods
+    valid = ~np.isnan(values)
+    counts = _window_counts(values, window)
+    sums = _window_sums(np.where(valid, values, 0.0), window)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = sums / counts
+    means[counts < max(min_periods, 1)] = np.nan
+    return means
+
+
+def rolling_std(values, window, min_periods=None, ddof=1):
+    """Trailing rolling standard deviation that skips NaNs, matching pandas rolling().std()"""
+    min_periods = window if min_periods is None else min_periods
+    valid = ~np.isnan(values)
+    # Shift by a reference value before squaring to limit cancellation on price levels
+    reference = np.take_along_axis(values, _first_valid(values)[..., None], axis=-1)
+    centered = np.where(valid, values - np.nan_to_num(reference), 0.0)
+    counts = _window_counts(values, window)
+    sums = _window_sums(centered, window)
+    squares = _window_sums(centered * centered, window)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        variance = (squares - sums * sums / counts) / (counts - ddof)
+    std = np.sqrt(np.clip(variance, 0, None))
+    # Like pandas, report exactly zero when every observation in the window is identical
+    std[_equal_run_lengths(values) >= counts] = 0.0
+    std[(counts < max(min_periods, 1)) | (counts <= ddof)] = np.nan
+    return std
+
+
+def _equal_run_lengths(values):
+    """Length of the run of identical (non-NaN) values ending at each position"""
+    starts = np.ones(values.shape, dtype=bool)
+    starts[..., 1:] = values[..., 1:] != values[..., :-1]
+    index = np.broadcast_to(np.arange(values.shape[-1]), values.shape)
+    run_start = np.maximum.accumulate(np.where(starts, index, 0), axis=-1)
+    return np.where(np.isnan(values), 0, index - run_start + 1)
+
+
+def rolling_max(values, window, min_periods=None):
+    """Trailing rolling maximum that skips NaNs"""
+    return _rolling_extreme(values, window, min_periods, np.fmax)
+
+
+def rolling_min(values, window, min_periods=None):
+    """Trailing rolling minimum that skips NaNs"""
+    return _rolling_extreme(values, window, min_periods, np.fmin)
+
+
+def _rolling_extreme(values, window, min_periods, reducer):
+    min_periods = window if min_periods is None else min_periods
+    padding = np.full(values.shape[:-1] + (window - 1,), np.nan)
+    padded = np.concatenate([padding, values], axis=-1)
+    result = reducer.reduce(np.lib.stride_tricks.sliding_window_view(padded, window, axis=-1), axis=-1)
+    result[_window_counts(values, window) < max(min_periods, 1)] = np.nan
+    return result
+
+
+def ema(values, span=None, alpha=None, min_periods=0):
+    """
+    Recursive exponential moving average (pandas ewm(adjust=False)) as a single IIR
+    filter pass along the last axis. Leading NaNs are skipped; min_periods counts
+    valid observations. Rows of a matrix that start on the same bar are filtered
+    together.
+    """
+    alpha = 2 / (span + 1) if alpha is None else alpha
+    rows = values.reshape(-1, values.shape[-1])
+    result = np.full(rows.shape, np.nan)
+    has_data = ~np.isnan(rows).all(axis=-1)
+    starts = _first_valid(rows)
+    for start in np.unique(starts[has_data]):
+        group = np.flatnonzero(has_data & (starts == start))
+        tail = rows[group, start:]
+        result[group, start:], _ = lfilter([alpha], [1, alpha - 1], tail, axis=-1, zi=(1 - alpha) * tail[:, :1])
+        result[group, :start + max(min_periods, 1) - 1] = np.nan
+    return result.reshape(values.shape)
+
+
+def _fill_forward_backward(values, starts):
+    """
+    ffill then bfill along the last axis, from each row's start index on; rows with
+    nothing to fill from are zeros, as with fillna(0)
+    """
+    index = np.broadcast_to(np.arange(values.shape[-1]), values.shape)
+    valid = ~np.isnan(values)
+    last_valid = np.maximum.accumulate(np.where(valid, index, -1), axis=-1)
+    first_valid = np.where(valid.any(axis=-1), _first_valid(values), 0)[..., None]
+    source = np.where(last_valid >= 0, last_valid, first_valid)
+    filled = np.take_along_axis(values, source, axis=-1)
+    filled = np.where(valid.any(axis=-1)[..., None], filled, 0.0)
+    filled[index < starts[..., None]] = np.nan
+    return filled
+
+
+ADX_SMOOTHING = ('sma', 'wilder')
+
+
+def directional_movement(high, low, close, period=14, smoothing='sma', out=None):
+    """
+    +DI, -DI and ADX in one kernel over raw arrays (time on the last axis).
+
+    Intermediates live in three scratch buffers and the results are written into
+    `out`, so repeated calls (e.g. per request or per screen) can reuse memory.
+
+    Args:
+        smoothing: 'sma' keeps the historical rolling-mean ADX used by the analyzers;
+            'wilder' uses Wilder's recursive smoothing (alpha = 1/period), the
+            textbook definition
+        out: optional float64 array of shape (3,) + close.shape
+
+    Returns:
+        out, holding (+DI, -DI, ADX)
+    """
+    if smoothing not in ADX_SMOOTHING:
+        raise ValueError(f"Unknown ADX smoothing '{smoothing}'. Choose from: {', '.join(ADX_SMOOTHING)}")
+    shape = np.shape(close)
+    out = np.empty((3,) + shape) if out is None else out
+    plus_di, minus_di, adx_out = out
+    true_range, plus_dm, minus_dm = np.empty((3,) + shape)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # True range: max(H - L, |H - prev C|, |L - prev C|), undefined on the first bar
+        np.subtract(high, low, out=true_range)
+        for extreme in (high, low):
+            np.subtract(extreme[..., 1:], close[..., :-1], out=plus_dm[..., 1:])
+            np.abs(plus_dm[..., 1:], out=plus_dm[..., 1:])
+            np.maximum(true_range[..., 1:], plus_dm[..., 1:], out=true_range[..., 1:])
+        true_range[..., 0] = np.nan
+
+        # Directional movement: the larger of the up/down moves, if positive
+        np.subtract(high[..., 1:], high[..., :-1], out=plus_dm[..., 1:])
+        np.subtract(low[..., :-1], low[..., 1:], out=minus_dm[..., 1:])
+        up_wins = plus_dm > minus_dm
+        down_wins = minus_dm > plus_dm
+        np.multiply(np.maximum(plus_dm, 0, out=plus_dm), up_wins, out=plus_dm)
+        np.multiply(np.maximum(minus_dm, 0, out=minus_dm), down_wins, out=minus_dm)
+        # Each series' first bar has no previous bar to move from
+        listed = ~np.isnan(close)
+        first_bar = listed & np.isnan(_shift(close))
+        plus_dm[first_bar] = minus_dm[first_bar] = 0.0 if smoothing == 'sma' else np.nan
+        plus_dm[~listed] = minus_dm[~listed] = np.nan
+
+        if smoothing == 'sma':
+            _sma_directional_index(true_range, plus_dm, minus_dm, period, out)
+            dx = _directional_index(plus_di, minus_di, undefined=np.nan, out=true_range)
+            adx_out[...] = rolling_mean(_fill_forward_backward(dx, _first_valid(close)), period, min_periods=1)
+        else:
+            alpha = 1 / period
+            smoothed_tr = ema(true_range, alpha=alpha, min_periods=period)
+            for dm, di in ((plus_dm, plus_di), (minus_dm, minus_di)):
+                np.divide(100 * ema(dm, alpha=alpha, min_periods=period), smoothed_tr, out=di)
+                # No true range at all (flat prices) means no directional movement
+                di[smoothed_tr == 0] = 0.0
+            dx = _directional_index(plus_di, minus_di, undefined=0.0, out=true_range)
+            adx_out[...] = ema(dx, alpha=alpha, min_periods=period)
+    return out
+
+
+def _sma_directional_index(true_range, plus_dm, minus_dm, period, out):
+    """+DI/-DI from rolling means, with a zero average true range treated as undefined"""
+    tr_mean = rolling_mean(true_range, period, min_periods=1)
+    tr_mean[tr_mean == 0] = np.nan
+    np.divide(100 * rolling_mean(plus_dm, period, min_periods=1), tr_mean, out=out[0])
+    np.divide(100 * rolling_mean(minus_dm, period, min_periods=1), tr_mean, out=out[1])
+
+
+def _directional_index(plus_di, minus_di, undefined, out):
+    """DX = 100 * |+DI - -DI| / (+DI + -DI), `undefined` where both are zero"""
+    np.subtract(plus_di, minus_di, out=out)
+    np.abs(out, out=out)
+    np.multiply(out, 100, out=out)
+    denominator = plus_di + minus_di
+    np.divide(out, denominator, out=out)
+    out[denominator == 0] = undefined
+    return out
+
+
+def adx(high, low, close, period=14, smoothing='sma'):
+    """Average Directional Index alone; see directional_movement"""
+    return directional_movement(high, low, close, period, smoothing)[2]
+
+
+def trading_signals(close, ind):
+    """Combine RSI, MACD, moving-average and Bollinger rules into a -1/0/1 signal"""
+    with np.errstate(invalid='ignore'):
+        score = (
+            (ind['RSI'] < 30).astype(np.int64) - (ind['RSI'] > 70)
+            + (ind['MACD'] > ind['MACD_Signal']) - (ind['MACD'] < ind['MACD_Signal'])
+            + (ind['50_MA'] > ind['200_MA']) - (ind['50_MA'] < ind['200_MA'])
+            + (close < ind['Bollinger_Lower']) - (close > ind['Bollinger_Upper'])
+        )
+    return np.sign(score)
+
+
+def compute_indicators(df):
+    """
+    Compute the full technical indicator set in one pass over contiguous float64
+    arrays, reusing intermediates (rolling windows, EMAs, Bollinger bands) instead of
+    recomputing them per indicator.
+
+    Args:
+        df: OHLCV DataFrame with High, Low, Close and Volume columns
+
+    Returns:
+        dict mapping INDICATOR_COLUMNS names to np.ndarray columns (NaN where the
+        indicator is not yet defined, as with the ta library)
+    """
+    return _compute(*(_as_array(df[column]) for column in ('High', 'Low', 'Close', 'Volume')))
+
+
+def _compute(high, low, close, volume):
+    """Indicator kernel over arrays whose last axis is time (one row per symbol)"""
+    ind = {}
+    prev_close = _shift(close)
+    listed = ~np.isnan(close)
+
+    # Moving averages
+    ind['50_MA'] = rolling_mean(close, 50, min_periods=1)
+    ind['200_MA'] = rolling_mean(close, 200, min_periods=1)
+    ind['20_EMA'] = ema(close, span=20, min_periods=20)
+
+    # MACD (12, 26, 9)
+    macd = ema(close, span=12, min_periods=12) - ema(close, span=26, min_periods=26)
+    ind['MACD'] = macd
+    ind['MACD_Signal'] = ema(macd, span=9, min_periods=9)
+    ind['MACD_Histogram'] = macd - ind['MACD_Signal']
+
+    # RSI (Wilder, 14); the first bar of each series counts as an unchanged close
+    change = np.where(np.isnan(prev_close) & listed, 0.0, close - prev_close)
+    gain = ema(np.maximum(change, 0), alpha=1 / 14, min_periods=14)
+    loss = ema(np.maximum(-change, 0), alpha=1 / 14, min_periods=14)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ind['RSI'] = np.where(loss == 0, 100, 100 - 100 / (1 + gain / loss))
+    ind['RSI'][np.isnan(loss)] = np.nan
+
+    # Stochastic oscillator (14, 3)
+    low_14 = rolling_min(low, 14)
+    high_14 = rolling_max(high, 14)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ind['Stoch_K'] = 100 * (close - low_14) / (high_14 - low_14)
+    ind['Stoch_D'] = rolling_mean(ind['Stoch_K'], 3)
+
+    # Bollinger bands (20, 2), computed once
+    mid = rolling_mean(close, 20)
+    band = 2 * rolling_std(close, 20, ddof=0)
+    ind['Bollinger_Upper'] = mid + band
+    ind['Bollinger_Lower'] = mid - band
+    ind['Bollinger_Mid'] = mid
+    ind['BB_Width'] = 2 * band / mid
+
+    # Volume indicators; bars before a symbol's first close contribute nothing
+    signed_volume = np.where(close < prev_close, -volume, volume)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        money_flow = ((close - low) - (high - close)) / (high - low)
+    money_flow = np.nan_to_num(money_flow, nan=0.0, posinf=np.inf, neginf=-np.inf) * volume
+    ind['OBV'] = np.cumsum(np.where(listed, signed_volume, 0.0), axis=-1)
+    ind['ADI'] = np.cumsum(np.where(listed, money_flow, 0.0), axis=-1)
+    ind['OBV'][~listed] = np.nan
+    ind['ADI'][~listed] = np.nan
+
+    # Price channels double as support/resistance
+    ind['Upper_Channel'] = rolling_max(high, 20, min_periods=1)
+    ind['Lower_Channel'] = rolling_min(low, 20, min_periods=1)
+    ind['Support'] = ind['Lower_Channel']
+    ind['Resistance'] = ind['Upper_Channel']
+
+    # Returns and volatility
+    ind['Daily_Return'] = close / prev_close - 1
+    ind['Volatility'] = rolling_std(ind['Daily_Return'], 20, min_periods=1) * np.sqrt(TRADING_DAYS)
+
+    ind['Plus_DI'], ind['Minus_DI'], ind['ADX'] = directional_movement(high, low, close)
+    ind['Trend_Strength'] = np.abs(ind['50_MA'] - ind['200_MA']) / ind['200_MA']
+    ind['Signal'] = trading_signals(close, ind)
+
+    return {column: ind[column] for column in INDICATOR_COLUMNS}
+
+
+def indicator_frame(df):
+    """compute_indicators wrapped as a DataFrame on the input's index"""
+    return pd.DataFrame(compute_indicators(df), index=df.index)
+
+
+OHLCV_COLUMNS = ('High', 'Low', 'Close', 'Volume')
+
+
+class IndicatorMatrix:
+    """
+    Indicators for many symbols held in one (indicators x symbols x days) float64
+    array; each indicator is a (symbols x days) view.
+    """
+
+    def __init__(self, values, symbols, dates):
+        self.values = values
+        self.symbols = list(symbols)
+        self.dates = dates
+        self._positions = {symbol: i for i, symbol in enumerate(self.symbols)}
+
+    def __getitem__(self, column):
+        return self.values[INDICATOR_COLUMNS.index(column)]
+
+    def frame(self, symbol):
+        """One symbol's indicators as a DataFrame, from its first listed day"""
+        frame = pd.DataFrame(self.values[:, self._positions[symbol]].T, index=self.dates, columns=INDICATOR_COLUMNS)
+        return frame.loc[frame['50_MA'].first_valid_index():] if frame['50_MA'].notna().any() else frame.iloc[:0]
+
+    def latest(self):
+        """Last day's indicators per symbol (symbols x indicators)"""
+        return pd.DataFrame(self.values[:, :, -1].T, index=self.symbols, columns=INDICATOR_COLUMNS)
+
+
+def compute_indicator_matrix(high, low, close, volume, symbols=None, dates=None):
+    """
+    Compute every indicator for many symbols at once on aligned (symbols x days)
+    arrays. Rows may start later (NaN before a listing date) but must be gap-free
+    afterwards; results match compute_indicators run on each symbol's own history.
+    """
+    arrays = [np.ascontiguousarray(np.atleast_2d(values), dtype=np.float64) for values in (high, low, close, volume)]
+    ind = _compute(*arrays)
+    values = np.empty((len(INDICATOR_COLUMNS),) + arrays[2].shape)
+    for i, column in enumerate(INDICATOR_COLUMNS):
+        values[i] = ind[column]
+    symbols = range(values.shape[1]) if symbols is None else symbols
+    return IndicatorMatrix(values, symbols, dates)
+
+
+def align_ohlcv(frames, columns=OHLCV_COLUMNS):
+    """
+    Align per-symbol OHLCV DataFrames on the union of their trading dates.
+
+    Prices are forward-filled over a symbol's missing days (with zero volume);
+    days before its first bar stay NaN. columns must include 'Close'; pass e.g.
+    ('Open',) + OHLCV_COLUMNS to align opens as well.
+
+    Returns:
+        (symbols, dates, *matrices): one (symbols x days) array per column, by
+        default (symbols, dates, high, low, close, volume)
+    """
+    symbols = list(frames)
+    days = []
+    for df in frames.values():
+        # Exchanges report in their own time zones; align on calendar dates
+        index = df.index.array
+        index = index.tz_localize(None) if index.tz is not None else index
+        days.append(np.asarray(index, dtype='datetime64[D]'))
+    dates = np.unique(np.concatenate(days)) if days else np.array([], dtype='datetime64[D]')
+
+    matrices = np.full((len(columns), len(symbols), len(dates)), np.nan)
+    for row, (df, day) in enumerate(zip(frames.values(), days)):
+        # Scatter each symbol's bars into its row; on duplicate dates the last bar wins
+        unique_days, last = np.unique(day[::-1], return_index=True)
+        values = np.stack([np.asarray(df[column], dtype=np.float64) for column in columns])
+        matrices[:, row, np.searchsorted(dates, unique_days)] = values[:, len(day) - 1 - last]
+
+    index = np.arange(len(dates))
+    for column, values in zip(columns, matrices):
+        if column == 'Volume':
+            values[np.isnan(values)] = 0
+        else:
+            filled = np.maximum.accumulate(np.where(np.isnan(values), 0, index), axis=-1)
+            values[...] = np.take_along_axis(values, filled, axis=-1)
+    listed = ~np.isnan(matrices[list(columns).index('Close')])
+    for matrix in matrices:
+        matrix[~listed] = np.nan
+    return (symbols, pd.DatetimeIndex(dates.astype('datetime64[ns]')), *matrices)
+
+
+def indicator_matrix(frames):
+    """compute_indicator_matrix over a {symbol: OHLCV DataFrame} mapping"""
+    symbols, dates, high, low, close, volume = align_ohlcv(frames)
+    return compute_indicator_matrix(high, low, close, volume, symbols=symbols, dates=dates)
+
+
+def _reference_indicators(df):
+    """The previous per-indicator ta/pandas implementation, kept for parity checks and benchmarks"""
+    from ta.trend import MACD, EMAIndicator
+    from ta.momentum import RSIIndicator, StochasticOscillator
+    from ta.volatility import BollingerBands
+    from ta.volume import OnBalanceVolumeIndicator, AccDistIndexIndicator
+
+    indicators = {}
+    indicators['50_MA'] = df['Close'].rolling(window=50, min_periods=1).mean()
+    indicators['200_MA'] = df['Close'].rolling(window=200, min_periods=1).mean()
+    indicators['20_EMA'] = EMAIndicator(close=df['Close'], window=20).ema_indicator()
+    macd = MACD(df['Close'])
+    indicators['MACD'] = macd.macd()
+    indicators['MACD_Signal'] = macd.macd_signal()
+    indicators['MACD_Histogram'] = macd.macd_diff()
+    indicators['RSI'] = RSIIndicator(df['Close']).rsi()
+    stoch = StochasticOscillator(df['High'], df['Low'], df['Close'])
+    indicators['Stoch_K'] = stoch.stoch()
+    indicators['Stoch_D'] = stoch.stoch_signal()
+    bollinger = BollingerBands(df['Close'])
+    indicators['Bollinger_Upper'] = bollinger.bollinger_hband()
+    indicators['Bollinger_Lower'] = bollinger.bollinger_lband()
+    indicators['Bollinger_Mid'] = bollinger.bollinger_mavg()
+    indicators['BB_Width'] = (bollinger.bollinger_hband() - bollinger.bollinger_lband()) / bollinger.bollinger_mavg()
+    indicators['OBV'] = OnBalanceVolumeIndicator(df['Close'], df['Volume']).on_balance_volume()
+    indicators['ADI'] = AccDistIndexIndicator(df['High'], df['Low'], df['Close'], df['Volume']).acc_dist_index()
+    indicators['Upper_Channel'] = df['High'].rolling(window=20, min_periods=1).max()
+    indicators['Lower_Channel'] = df['Low'].rolling(window=20, min_periods=1).min()
+    indicators['Support'] = df['Low'].rolling(window=20, min_periods=1).min()
+    indicators['Resistance'] = df['High'].rolling(window=20, min_periods=1).max()
+    indicators['Daily_Return'] = df['Close'].pct_change()
+    indicators['Volatility'] = indicators['Daily_Return'].rolling(window=20, min_periods=1).std() * np.sqrt(252)
+
+    indicators['Plus_DI'], indicators['Minus_DI'], indicators['ADX'] = _reference_adx(df)
+
+    indicators['Trend_Strength'] = np.abs(indicators['50_MA'] - indicators['200_MA']) / indicators['200_MA']
+    signals = pd.Series(index=df.index, data=0)
+    signals += np.where(indicators['RSI'] < 30, 1, 0)
+    signals += np.where(indicators['RSI'] > 70, -1, 0)
+    signals += np.where(indicators['MACD'] > indicators['MACD_Signal'], 1, 0)
+    signals += np.where(indicators['MACD'] < indicators['MACD_Signal'], -1, 0)
+    signals += np.where(indicators['50_MA'] > indicators['200_MA'], 1, 0)
+    signals += np.where(indicators['50_MA'] < indicators['200_MA'], -1, 0)
+    signals += np.where(df['Close'] < indicators['Bollinger_Lower'], 1, 0)
+    signals += np.where(df['Close'] > indicators['Bollinger_Upper'], -1, 0)
+    indicators['Signal'] = signals.apply(lambda x: 1 if x > 0 else (-1 if x < 0 else 0))
+    return pd.DataFrame(indicators, index=df.index)
+
+
+def _reference_adx(df, period=14):
+    """The previous DataFrame-based calculate_adx, returning (+DI, -DI, ADX)"""
+    adx_df = df.copy()
+    adx_df['TR'] = np.maximum(
+        adx_df['High'] - adx_df['Low'],
+        np.maximum(abs(adx_df['High'] - adx_df['Close'].shift(1)), abs(adx_df['Low'] - adx_df['Close'].shift(1)))
+    )
+    adx_df['+DM'] = np.where(
+        (adx_df['High'] - adx_df['High'].shift(1)) > (adx_df['Low'].shift(1) - adx_df['Low']),
+        np.maximum(adx_df['High'] - adx_df['High'].shift(1), 0), 0
+    )
+    adx_df['-DM'] = np.where(
+        (adx_df['Low'].shift(1) - adx_df['Low']) > (adx_df['High'] - adx_df['High'].shift(1)),
+        np.maximum(adx_df['Low'].shift(1) - adx_df['Low'], 0), 0
+    )
+    tr = adx_df['TR'].rolling(window=period, min_periods=1).mean().replace(0, np.nan)
+    plus_di = 100 * adx_df['+DM'].rolling(window=period, min_periods=1).mean() / tr
+    minus_di = 100 * adx_df['-DM'].rolling(window=period, min_periods=1).mean() / tr
+    dx = 100 * abs(plus_di - minus_di) / (plus_di + minus_di).replace(0, np.nan)
+    return plus_di, minus_di, dx.ffill().bfill().fillna(0).rolling(window=period, min_periods=1).mean()
+
+
+def synthetic_ohlcv(days, seed=0):
+    """Random-walk OHLCV frame for parity checks and benchmarks"""
+    rng = np.random.default_rng(seed)
+    close = 1000 * np.exp(np.cumsum(rng.normal(0.0003, 0.015, days)))
+    spread = np.abs(rng.normal(0, 0.01, (2, days))) * close
+    return pd.DataFrame({
+        'Open': close * (1 + rng.normal(0, 0.003, days)),
+        'High': close + spread[0],
+        'Low': close - spread[1],
+        'Close': close,
+        'Volume': rng.integers(100_000, 5_000_000, days).astype(np.float64)
+    }, index=pd.bdate_range('2000-01-03', periods=days))
+
+
+def check_parity(df=None, rtol=1e-7, atol=1e-7):
+    """
+    Compare compute_indicators against the previous ta/pandas implementation.
+
+    Returns the names of columns that differ; an empty list means parity.
+    """
+    df = synthetic_ohlcv(5 * TRADING_DAYS) if df is None else df
+    expected = _reference_indicators(df)
+    actual = indicator_frame(df)
+    mismatched = []
+    for column in INDICATOR_COLUMNS:
+        if not np.allclose(actual[column], expected[column].astype(np.float64), rtol=rtol, atol=atol, equal_nan=True):
+            mismatched.append(column)
+    return mismatched
+
+
+def benchmark_adx(days=TRADING_DAYS, repeats=50):
+    """Time the previous DataFrame-based ADX against the array kernel (both smoothings)"""
+    df = synthetic_ohlcv(days)
+    high, low, close = (df[column].to_numpy() for column in ('High', 'Low', 'Close'))
+    out = np.empty((3, days))
+
+    def best_of(fn):
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    reference = best_of(lambda: _reference_adx(df))
+    print(f"\nADX over {days} bars:")
+    print(f"  DataFrame version: {reference * 1000:7.3f} ms")
+    for smoothing in ADX_SMOOTHING:
+        kernel = best_of(lambda: directional_movement(high, low, close, smoothing=smoothing, out=out))
+        print(f"  kernel ({smoothing}):{' ' * (9 - len(smoothing))}{kernel * 1000:7.3f} ms ({reference / kernel:.0f}x)")
+
+
+def _synthetic_universe(symbols, days):
+    """Synthetic OHLCV histories, some listed part-way through the period"""
+    rng = np.random.default_rng(symbols)
+    frames = {}
+    for i in range(symbols):
+        df = synthetic_ohlcv(days, seed=i)
+        frames[f'SYM{i}'] = df.iloc[rng.integers(0, days // 2):] if i % 5 == 0 else df
+    return frames
+
+
+def check_matrix_parity(symbols=25, days=2 * TRADING_DAYS, rtol=1e-7, atol=1e-7):
+    """
+    Compare the batched (symbols x days) engine against compute_indicators run per
+    symbol. Returns the (symbol, column) pairs that differ.
+    """
+    frames = _synthetic_universe(symbols, days)
+    matrix = indicator_matrix(frames)
+    mismatched = []
+    for symbol, df in frames.items():
+        expected = compute_indicators(df)
+        actual = matrix.frame(symbol)
+        for column in INDICATOR_COLUMNS:
+            if not np.allclose(actual[column], expected[column], rtol=rtol, atol=atol, equal_nan=True):
+                mismatched.append((symbol, column))
+    return mismatched
+
+
+def benchmark_matrix(symbols=500, days=TRADING_DAYS):
+    """Time a universe screen: ta per symbol, the NumPy engine per symbol, and one batched pass"""
+    frames = _synthetic_universe(symbols, days)
+    _, _, high, low, close, volume = align_ohlcv(frames)
+
+    start = time.perf_counter()
+    for df in frames.values():
+        _reference_indicators(df)
+    reference = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for df in frames.values():
+        compute_indicators(df)
+    per_symbol = time.perf_counter() - start
+
+    start = time.perf_counter()
+    compute_indicator_matrix(high, low, close, volume)
+    batched = time.perf_counter() - start
+
+    print(f"\nIndicators for {symbols} symbols x {days} days:")
+    print(f"  ta/pandas per symbol: {reference * 1000:9.1f} ms")
+    print(f"  numpy per symbol:     {per_symbol * 1000:9.1f} ms")
+    print(f"  batched matrix:       {batched * 1000:9.1f} ms ({reference / batched:.0f}x vs ta)")
+    print(f"  parity: {'ok' if not check_matrix_parity() else 'FAIL'}")
+
+
+def benchmark(years=(1, 5, 20), repeats=5):
+    """Time the ta/pandas pipeline against compute_indicators on 1y, 5y and 20y histories"""
+    print(f"{'history':>8} {'bars':>6} {'ta/pandas (ms)':>15} {'numpy (ms)':>11} {'speedup':>8} {'parity':>7}")
+    for year_count in years:
+        df = synthetic_ohlcv(year_count * TRADING_DAYS, seed=year_count)
+
+        def best_of(fn):
+            timings = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                fn(df)
+                timings.append(time.perf_counter() - start)
+            return min(timings)
+
+        reference = best_of(_reference_indicators)
+        engine = best_of(compute_indicators)
+        parity = 'ok' if not check_parity(df) else 'FAIL'
+        print(f"{str(year_count) + 'y':>8} {len(df):>6} {reference * 1000:>15.2f} {engine * 1000:>11.2f} "
+              f"{reference / engine:>7.1f}x {parity:>7}")
+
+
+if __name__ == "__main__":
+    benchmark()
+    benchmark_adx()
+    benchmark_matrix()
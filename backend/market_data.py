@@ -0,0 +1,266 @@
+# market_data.py
+
+import os
+import json
+import time
+import zlib
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+import numpy as np
+import pandas as pd
+
+# 'yfinance' (default) or 'replay' (recorded fixtures / synthetic series, no network)
+MARKET_DATA_PROVIDER = os.environ.get('MARKET_DATA_PROVIDER', 'yfinance')
+# Replay settings: fixture directory, and injected delay per upstream call in milliseconds
+REPLAY_DIR = os.environ.get('REPLAY_DIR')
+REPLAY_LATENCY_MS = float(os.environ.get('REPLAY_LATENCY_MS', 0))
+
+REPLAY_TIMEZONE = 'Asia/Kolkata'
+REPLAY_COLUMNS = ('Open', 'High', 'Low', 'Close', 'Volume', 'Dividends', 'Stock Splits')
+
+_default_provider = None
+_default_provider_lock = threading.Lock()
+
+
+class MarketDataProvider(ABC):
+    """
+    Where OHLCV bars and company info come from. history() and info() are required;
+    histories() fetches many symbols at once and defaults to one history() per symbol.
+    """
+
+    @abstractmethod
+    def history(self, symbol, period=None, start=None):
+        """Daily bars of a symbol for a yfinance period string, or from a start date to today"""
+
+    def histories(self, symbols, period=None, start=None):
+        """
+        Daily bars of many symbols as {symbol: DataFrame}, leaving out symbols without
+        data. Dates are tz-naive, since the symbols may trade in different time zones.
+        """
+        frames = {}
+        for symbol in symbols:
+            df = self.history(symbol, period=period, start=start)
+            if not df.empty:
+                frames[symbol] = df.tz_localize(None) if df.index.tz is not None else df
+        return frames
+
+    @abstractmethod
+    def info(self, symbol):
+        """Company metadata as a yfinance-style .info dict (longName, sector, marketCap, ...)"""
+
+
+class YFinanceProvider(MarketDataProvider):
+    """Live data from Yahoo Finance through yfinance"""
+
+    def __init__(self):
+        import yfinance
+        self.yf = yfinance
+
+    def history(self, symbol, period=None, start=None):
+        stock = self.yf.Ticker(symbol)
+        return stock.history(start=start) if start is not None else stock.history(period=period)
+
+    def histories(self, symbols, period=None, start=None):
+        data = self.yf.download(list(symbols), period=None if start is not None else period, start=start,
+                                group_by='ticker', auto_adjust=True, actions=True, ignore_tz=True,
+                                threads=False, progress=False)
+        if not isinstance(data.columns, pd.MultiIndex):
+            data = pd.concat({symbols[0]: data}, axis=1)
+        frames = {}
+        for symbol in data.columns.get_level_values(0).unique():
+            df = data[symbol].dropna(subset=['Close'])
+            if not df.empty:
+                df.columns.name = None
+                df.index.name = 'Date'
+                frames[symbol] = df
+        return frames
+
+    def info(self, symbol):
+        return self.yf.Ticker(symbol).info
+
+
+class ReplayProvider(MarketDataProvider):
+    """
+    Offline data for benchmarks and load tests.
+
+    Bars come from <symbol>.parquet or <symbol>.csv in fixtures_dir and company info
+    from <symbol>.info.json, as written by record_fixtures(). Symbols without a
+    fixture get a synthetic random-walk history of `days` business days ending
+    today, seeded by the symbol, unless synthetic is False. Every call sleeps
+    `latency` seconds plus up to `jitter` more, drawn from a seeded generator,
+    so throughput tests see network-like delays reproducibly.
+    """
+
+    def __init__(self, fixtures_dir=None, days=2520, latency=0.0, jitter=0.0, seed=0, synthetic=True):
+        self.fixtures_dir = fixtures_dir
+        self.days = days
+        self.latency = latency
+        self.jitter = jitter
+        self.seed = seed
+        self.synthetic = synthetic
+        # Loaded (or generated) bars per symbol; tests may edit these to simulate upstream changes
+        self.frames = {}
+        self.stats = {'calls': 0, 'bars': 0}
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+        self._dates = None
+
+    def _fixture(self, symbol, suffix):
+        if self.fixtures_dir is None:
+            return None
+        path = os.path.join(self.fixtures_dir, symbol + suffix)
+        return path if os.path.exists(path) else None
+
+    def _wait(self):
+        with self._lock:
+            self.stats['calls'] += 1
+            delay = self.latency + (self._rng.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay:
+            time.sleep(delay)
+
+    def _bars(self, symbol):
+        with self._lock:
+            if symbol not in self.frames:
+                self.frames[symbol] = self._load(symbol)
+            return self.frames[symbol]
+
+    def _load(self, symbol):
+        parquet, csv = self._fixture(symbol, '.parquet'), self._fixture(symbol, '.csv')
+        if parquet:
+            return pd.read_parquet(parquet)
+        if csv:
+            df = pd.read_csv(csv, index_col=0)
+            df.index = pd.to_datetime(df.index, utc=True).tz_convert(REPLAY_TIMEZONE).rename('Date')
+            return df
+        if not self.synthetic:
+            return pd.DataFrame(columns=list(REPLAY_COLUMNS), index=pd.DatetimeIndex([], tz=REPLAY_TIMEZONE, name='Date'))
+        from indicators import synthetic_ohlcv
+        if self._dates is None:
+            end = pd.Timestamp.now(tz=REPLAY_TIMEZONE).normalize()
+            self._dates = pd.bdate_range(end=end, periods=self.days, tz=REPLAY_TIMEZONE, name='Date')
+        df = synthetic_ohlcv(self.days, seed=zlib.crc32(symbol.encode()) ^ self.seed)
+        df.index = self._dates
+        df['Dividends'] = 0.0
+        df['Stock Splits'] = 0.0
+        return df
+
+    def _slice(self, symbol, period, start):
+        from price_store import period_start
+        df = self._bars(symbol)
+        if start is not None:
+            first = pd.Timestamp(start)
+            first = first.tz_localize(df.index.tz) if df.index.tz is not None else first
+        else:
+            first = period_start(period or '1mo', pd.Timestamp.now(tz=df.index.tz))
+        result = df if first is None else df[df.index >= first]
+        with self._lock:
+            self.stats['bars'] += len(result)
+        return result.copy()
+
+    def history(self, symbol, period=None, start=None):
+        self._wait()
+        return self._slice(symbol, period, start)
+
+    def histories(self, symbols, period=None, start=None):
+        self._wait()
+        frames = {}
+        for symbol in symbols:
+            df = self._slice(symbol, period, start)
+            if not df.empty:
+                frames[symbol] = df.tz_localize(None) if df.index.tz is not None else df
+        return frames
+
+    def info(self, symbol):
+        self._wait()
+        path = self._fixture(symbol, '.info.json')
+        if path:
+            with open(path) as file:
+                return json.load(file)
+        if not self.synthetic:
+            return {}
+        return {'symbol': symbol, 'longName': symbol, 'exchange': 'NSI', 'currency': 'INR'}
+
+
+def record_fixtures(symbols, fixtures_dir, provider=None, period='max'):
+    """
+    Save each symbol's bars and company info from provider (live yfinance by default)
+    as ReplayProvider fixtures.
+
+    Returns:
+        {symbol: error message} for symbols that could not be recorded
+    """
+    provider = provider or YFinanceProvider()
+    os.makedirs(fixtures_dir, exist_ok=True)
+    failed = {}
+    for symbol in symbols:
+        try:
+            df = provider.history(symbol, period=period)
+            if df.empty:
+                raise ValueError(f"No data found for symbol {symbol}")
+            df.to_parquet(os.path.join(fixtures_dir, f"{symbol}.parquet"))
+            with open(os.path.join(fixtures_dir, f"{symbol}.info.json"), 'w') as file:
+                json.dump(provider.info(symbol), file, default=str)
+        except Exception as e:
+            failed[symbol] = str(e)
+    return failed
+
+
+def get_provider():
+    """Return the shared provider chosen by MARKET_DATA_PROVIDER, creating it on first use"""
+    global _default_provider
+    with _default_provider_lock:
+        if _default_provider is None:
+            if MARKET_DATA_PROVIDER == 'replay':
+                _default_provider = ReplayProvider(REPLAY_DIR, latency=REPLAY_LATENCY_MS / 1000)
+            elif MARKET_DATA_PROVIDER == 'yfinance':
+                _default_provider = YFinanceProvider()
+            else:
+                raise ValueError(f"Unknown MARKET_DATA_PROVIDER '{MARKET_DATA_PROVIDER}'. Use 'yfinance' or 'replay'")
+        return _default_provider
+
+
+def check_replay():
+    """Synthetic series must be reproducible, and recorded fixtures must replay unchanged"""
+    problems = []
+    first, second = ReplayProvider(days=600), ReplayProvider(days=600)
+    if not first.history('TEST.NS', period='2y').equals(second.history('TEST.NS', period='2y')):
+        problems.append('synthetic history differs between providers with the same seed')
+    if first.history('TEST.NS', period='2y').equals(ReplayProvider(days=600, seed=1).history('TEST.NS', period='2y')):
+        problems.append('seed does not change the synthetic history')
+    with tempfile.TemporaryDirectory() as fixtures_dir:
+        record_fixtures(['TEST.NS'], fixtures_dir, provider=first)
+        replay = ReplayProvider(fixtures_dir, synthetic=False)
+        if not replay.history('TEST.NS', period='max').equals(first.history('TEST.NS', period='max')):
+            problems.append('recorded fixture replays differently')
+        if replay.info('TEST.NS') != first.info('TEST.NS') or not replay.history('NONE.NS', period='1y').empty:
+            problems.append('fixture-only replay serves unknown symbols')
+    return problems
+
+
+def benchmark(requests=200, symbols=20, workers=16, latency=0.05):
+    """Offline throughput of the analysis fetch path (store + indicators) under injected latency"""
+    from concurrent.futures import ThreadPoolExecutor
+    from price_store import PriceStore
+    from indicators import indicator_frame
+    names = [f'SYM{i}.NS' for i in range(symbols)]
+    with tempfile.TemporaryDirectory() as data_dir:
+        provider = ReplayProvider(latency=latency, jitter=latency / 2)
+        store = PriceStore(data_dir, provider=provider)
+
+        def analyze(i):
+            indicator_frame(store.history(names[i % symbols], '1y'))
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(workers) as pool:
+            list(pool.map(analyze, range(requests)))
+        elapsed = time.perf_counter() - start
+
+    print(f"{requests} analysis fetches over {symbols} replayed symbols ({latency * 1000:.0f} ms latency, {workers} threads):")
+    print(f"  throughput: {requests / elapsed:8.1f} requests/s")
+    print(f"  upstream calls: {provider.stats['calls']}, store: {store.stats}")
+    print(f"  replay check: {'ok' if not check_replay() else 'FAIL'}")
+
+
+if __name__ == "__main__":
+    benchmark()
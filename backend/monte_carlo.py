@@ -0,0 +1,971 @@
+# monte_carlo.py
+
+import os
+import time
+import threading
+import multiprocessing
+import warnings
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+from scipy.stats import norm, qmc
+
+TRADING_DAYS = 252
+
+# Above this many paths the full path matrix no longer fits comfortably on a
+# 2 GB worker, so run_monte_carlo switches to the chunked streaming summary.
+STREAMING_THRESHOLD = 200_000
+DEFAULT_CHUNK_SIZE = 10_000
+
+# Adaptive mode simulates batches of ADAPTIVE_BATCH_SIZE paths until the risk
+# metrics converge, never stopping before ADAPTIVE_MIN_BATCHES batches. Standard
+# errors come from batch means (one replicate per batch): smaller groups put too
+# few paths in the tail and understate the Expected Shortfall SE.
+ADAPTIVE_BATCH_SIZE = 250
+ADAPTIVE_MIN_BATCHES = 10
+ADAPTIVE_MAX_SIMULATIONS = 100_000
+
+# Variance-reduction estimators. Standard errors are taken from the spread of
+# REPLICATES independent groups (independent scrambles for Sobol).
+ESTIMATORS = ('plain', 'antithetic', 'sobol', 'control_variate')
+REPLICATES = 10
+
+# Worker processes shared by parallel simulation and walk-forward backtests, sized once
+# per server process. Workers start from a fork server (spawn where unavailable), never
+# by forking the threaded web server, which can deadlock on locks held by other threads.
+PROCESS_POOL_WORKERS = int(os.environ.get('PROCESS_POOL_WORKERS', os.cpu_count() or 1))
+POOL_START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+
+def historical_log_returns(close):
+    """Finite daily log returns of a close price series, oldest first"""
+    close = np.asarray(close, dtype=np.float64)
+    log_returns = np.diff(np.log(close))
+    log_returns = log_returns[np.isfinite(log_returns)]
+    if len(log_returns) < 2:
+        raise ValueError("At least three closing prices are needed to estimate returns")
+    return log_returns
+
+
+def estimate_log_return_params(close):
+    """Estimate daily log-return drift and volatility from a close price series"""
+    log_returns = historical_log_returns(close)
+    return log_returns.mean(), log_returns.std(ddof=1)
+
+
+def _replicate_slices(num_simulations, replicates):
+    """Split path columns into contiguous, near-equal replicate groups"""
+    replicates = max(1, min(replicates, num_simulations // 2))
+    bounds = np.linspace(0, num_simulations, replicates + 1).astype(int)
+    return [slice(start, stop) for start, stop in zip(bounds[:-1], bounds[1:])]
+
+
+@lru_cache(maxsize=8)
+def _bridge_schedule(steps):
+    """Breadth-first (mid, left, right) construction order for a Brownian bridge"""
+    schedule = []
+    queue = deque([(0, steps)])
+    while queue:
+        left, right = queue.popleft()
+        if right - left < 2:
+            continue
+        mid = (left + right) // 2
+        schedule.append((mid, left, right))
+        queue.append((left, mid))
+        queue.append((mid, right))
+    return tuple(schedule)
+
+
+def _brownian_bridge(z):
+    """
+    Turn a (steps, n) matrix of normals into Brownian increments where z[0] fixes the
+    terminal value, z[1] the midpoint and so on. This puts the low-discrepancy
+    coordinates of a Sobol sequence where the terminal distribution is decided.
+    """
+    steps, n = z.shape
+    w = np.empty((steps + 1, n))
+    w[0] = 0
+    w[steps] = np.sqrt(steps) * z[0]
+    for k, (mid, left, right) in enumerate(_bridge_schedule(steps), start=1):
+        span = right - left
+        w[mid] = ((right - mid) * w[left] + (mid - left) * w[right]) / span
+        w[mid] += np.sqrt((mid - left) * (right - mid) / span) * z[k]
+    return np.diff(w, axis=0)
+
+
+@lru_cache(maxsize=8)
+def _sobol_base(forecast_days, num_points):
+    """Unscrambled Sobol points, cached because building the generator dominates small draws"""
+    with warnings.catch_warnings():
+        # Sobol balance is best at powers of two; other sizes are still valid RQMC points
+        warnings.simplefilter('ignore', UserWarning)
+        points = qmc.Sobol(d=forecast_days, scramble=False).random(num_points)
+    points.flags.writeable = False
+    return points
+
+
+def _draw_shocks(estimator, forecast_days, num_simulations, replicates, rng):
+    """
+    Draw a (forecast_days, num_simulations) matrix of standard normal shocks, one
+    self-contained replicate group at a time for the variance-reduction estimators.
+    """
+    groups = _replicate_slices(num_simulations, replicates)
+
+    if estimator == 'antithetic':
+        shocks = np.empty((forecast_days, num_simulations))
+        for group in groups:
+            size = group.stop - group.start
+            half = (size + 1) // 2
+            z = rng.standard_normal((forecast_days, half))
+            shocks[:, group.start:group.start + half] = z
+            shocks[:, group.start + half:group.stop] = -z[:, :size - half]
+        return shocks
+
+    if estimator == 'sobol':
+        # Each replicate is the Sobol point set under an independent random shift
+        # modulo 1 (Cranley-Patterson rotation), so replicates give an honest SE.
+        u = np.empty((num_simulations, forecast_days))
+        base = _sobol_base(forecast_days, max(group.stop - group.start for group in groups))
+        for group in groups:
+            np.add(base[:group.stop - group.start], rng.random(forecast_days), out=u[group])
+        np.mod(u, 1, out=u)
+        z = norm.ppf(np.clip(u, 1e-12, 1 - 1e-12)).T
+        return _brownian_bridge(z)
+
+    return rng.standard_normal((forecast_days, num_simulations))
+
+
+class GBMKernel:
+    """Normal daily log returns with the historical drift and volatility"""
+    name = 'gbm'
+    estimators = ESTIMATORS
+    options = ()
+
+    def __init__(self, log_returns):
+        self.mu = log_returns.mean()
+        self.sigma = log_returns.std(ddof=1)
+
+    def fill(self, steps, rng, estimator='plain', replicates=REPLICATES):
+        """Fill a (forecast_days, num_simulations) buffer with daily log returns"""
+        dtype = steps.dtype
+        if estimator in ('antithetic', 'sobol'):
+            steps[:] = _draw_shocks(estimator, steps.shape[0], steps.shape[1], replicates, rng)
+        else:
+            rng.standard_normal(out=steps, dtype=dtype)
+        steps *= dtype.type(self.sigma)
+        steps += dtype.type(self.mu)
+
+    def control(self, terminal_log_returns, forecast_days):
+        """Standardized terminal shock sum, exactly N(0, 1) under this kernel"""
+        if self.sigma <= 0:
+            return None
+        return (terminal_log_returns - self.mu * forecast_days) / (self.sigma * np.sqrt(forecast_days))
+
+
+class StudentTKernel(GBMKernel):
+    """
+    Fat-tailed daily log returns: Student-t innovations rescaled to the historical
+    volatility. Degrees of freedom default to a method-of-moments fit of the
+    historical excess kurtosis (6 / (df - 4)), clipped to [3, 30].
+    """
+    name = 'student_t'
+    estimators = ('plain', 'antithetic')
+    options = ('df',)
+
+    def __init__(self, log_returns, df=None):
+        super().__init__(log_returns)
+        if df is None:
+            centered = log_returns - self.mu
+            excess_kurtosis = (centered ** 4).mean() / (centered ** 2).mean() ** 2 - 3
+            df = 4 + 6 / excess_kurtosis if excess_kurtosis > 0 else 30
+        self.df = float(np.clip(df, 3, 30))
+
+    def fill(self, steps, rng, estimator='plain', replicates=REPLICATES):
+        forecast_days, num_simulations = steps.shape
+        if estimator == 'antithetic':
+            for group in _replicate_slices(num_simulations, replicates):
+                size = group.stop - group.start
+                half = (size + 1) // 2
+                t = rng.standard_t(self.df, (forecast_days, half))
+                steps[:, group.start:group.start + half] = t
+                steps[:, group.start + half:group.stop] = -t[:, :size - half]
+        else:
+            steps[:] = rng.standard_t(self.df, (forecast_days, num_simulations))
+        # Unit-variance t innovations: Var(t_df) = df / (df - 2)
+        steps *= steps.dtype.type(self.sigma * np.sqrt((self.df - 2) / self.df))
+        steps += steps.dtype.type(self.mu)
+
+
+class BootstrapKernel:
+    """
+    Stationary block bootstrap (Politis & Romano) of the historical log returns.
+
+    Block starts and geometric block lengths (mean mean_block_length days) are drawn
+    for the whole matrix at once and turned into one index array into the
+    precomputed returns, so a draw is a single fancy-indexing gather.
+    """
+    name = 'bootstrap'
+    estimators = ('plain',)
+    options = ('mean_block_length',)
+
+    def __init__(self, log_returns, mean_block_length=5):
+        if mean_block_length < 1:
+            raise ValueError("mean_block_length must be at least 1")
+        self.returns = np.ascontiguousarray(log_returns)
+        self.mean_block_length = mean_block_length
+        self.mu = log_returns.mean()
+        self.sigma = log_returns.std(ddof=1)
+
+    def fill(self, steps, rng, estimator='plain', replicates=REPLICATES):
+        forecast_days, num_simulations = steps.shape
+        history = len(self.returns)
+
+        new_block = rng.random((forecast_days, num_simulations)) < 1 / self.mean_block_length
+        new_block[0] = True
+        day = np.arange(forecast_days)[:, None]
+        block_start_day = np.maximum.accumulate(np.where(new_block, day, 0), axis=0)
+        start_index = rng.integers(0, history, (forecast_days, num_simulations))
+        index = np.take_along_axis(start_index, block_start_day, axis=0)
+        index += day - block_start_day
+        np.take(self.returns.astype(steps.dtype, copy=False), index, out=steps, mode='wrap')
+
+
+KERNELS = {kernel.name: kernel for kernel in (GBMKernel, BootstrapKernel, StudentTKernel)}
+
+
+def make_kernel(name, close, **options):
+    """Build a return-generator kernel from a close price history"""
+    if name not in KERNELS:
+        raise ValueError(f"Unknown kernel '{name}', expected one of {', '.join(KERNELS)}")
+    return KERNELS[name](historical_log_returns(close), **options)
+
+
+def simulate_log_paths(kernel, num_simulations=1000, forecast_days=TRADING_DAYS, dtype=np.float64, rng=None,
+                       estimator='plain', replicates=REPLICATES):
+    """
+    Simulate cumulative log returns in a single vectorized pass.
+
+    The kernel fills the whole (forecast_days, num_simulations) matrix of daily log
+    returns in the output buffer, which is then cumulatively summed in place, so the
+    only allocation beyond the kernel's own draws is the returned matrix itself.
+
+    Returns:
+        np.ndarray of shape (forecast_days + 1, num_simulations); row 0 is zero.
+    """
+    rng = np.random.default_rng() if rng is None else rng
+
+    log_paths = np.empty((forecast_days + 1, num_simulations), dtype=np.dtype(dtype))
+    log_paths[0] = 0
+    steps = log_paths[1:]
+    kernel.fill(steps, rng, estimator, replicates)
+    np.cumsum(steps, axis=0, out=steps)
+    return log_paths
+
+
+def simulate_price_paths(last_price, kernel, num_simulations=1000, forecast_days=TRADING_DAYS,
+                         dtype=np.float64, rng=None, estimator='plain'):
+    """
+    Simulate price paths from a return-generator kernel.
+
+    Returns:
+        np.ndarray of shape (forecast_days + 1, num_simulations); row 0 is last_price.
+    """
+    paths = simulate_log_paths(kernel, num_simulations, forecast_days, dtype=dtype, rng=rng, estimator=estimator)
+    np.exp(paths, out=paths)
+    paths *= paths.dtype.type(last_price)
+    return paths
+
+
+def summarize_paths(paths, last_price, control=None, replicates=REPLICATES):
+    """
+    Reduce a simulated path matrix to the sim_results / risk_metrics dicts
+    consumed by ConfidenceScorer and the insight prompts.
+    """
+    index = pd.RangeIndex(paths.shape[0])
+    lower_95, upper_95 = np.percentile(paths, [5, 95], axis=1)
+
+    sim_results = {
+        'mean_path': pd.Series(paths.mean(axis=1, dtype=np.float64), index=index),
+        'upper_95': pd.Series(upper_95.astype(np.float64), index=index),
+        'lower_95': pd.Series(lower_95.astype(np.float64), index=index),
+        'max_path': pd.Series(paths.max(axis=1).astype(np.float64), index=index),
+        'min_path': pd.Series(paths.min(axis=1).astype(np.float64), index=index)
+    }
+
+    returns_distribution = paths[-1].astype(np.float64) / last_price - 1
+    return sim_results, calculate_risk_metrics(returns_distribution, control, replicates)
+
+
+def _tail_metrics(returns_distribution, control=None):
+    """
+    VaR_95, VaR_99, Expected Shortfall and the 95th percentile return of one sample.
+
+    With a control (a standard normal per path, e.g. the standardized terminal shock
+    sum), each estimate is corrected by the control's sampling error against its known
+    N(0, 1) value, scaled by the local slope of returns against the control.
+    """
+    var_95, var_99, upper_95 = np.percentile(returns_distribution, [5, 1, 95])
+    tail = returns_distribution <= var_95
+    expected_shortfall = returns_distribution[tail].mean()
+    if control is None:
+        return np.array([var_95, var_99, expected_shortfall, upper_95])
+
+    adjusted = {}
+    for percentile, estimate in ((5, var_95), (1, var_99), (95, upper_95)):
+        half_band = min(percentile, 100 - percentile) / 2
+        band = [percentile - half_band, percentile + half_band]
+        return_spread = np.diff(np.percentile(returns_distribution, band))[0]
+        control_spread = np.diff(np.percentile(control, band))[0]
+        slope = return_spread / control_spread if control_spread > 0 else 0.0
+        control_error = np.percentile(control, percentile) - norm.ppf(percentile / 100)
+        adjusted[percentile] = estimate - slope * control_error
+
+    tail_control = control[tail]
+    if len(tail_control) > 1 and tail_control.var() > 0:
+        beta = np.cov(returns_distribution[tail], tail_control)[0, 1] / tail_control.var(ddof=1)
+        true_tail_mean = -norm.pdf(norm.ppf(0.05)) / 0.05
+        expected_shortfall -= beta * (tail_control.mean() - true_tail_mean)
+    return np.array([adjusted[5], adjusted[1], expected_shortfall, adjusted[95]])
+
+
+def calculate_risk_metrics(returns_distribution, control=None, replicates=REPLICATES):
+    """
+    Compute VaR, Expected Shortfall and return moments from terminal returns.
+
+    Point estimates use the pooled sample; *_SE keys are the standard errors of
+    VaR_95, VaR_99 and Expected_Shortfall from the spread across replicate groups.
+    """
+    var_95, var_99, expected_shortfall, _ = _tail_metrics(returns_distribution, control)
+    expected_return = returns_distribution.mean()
+    if control is not None and control.var() > 0:
+        beta = np.cov(returns_distribution, control)[0, 1] / control.var(ddof=1)
+        expected_return -= beta * control.mean()
+
+    groups = _replicate_slices(len(returns_distribution), replicates)
+    replicate_metrics = np.array([
+        _tail_metrics(returns_distribution[group], None if control is None else control[group])
+        for group in groups
+    ])
+    standard_errors = replicate_standard_errors(replicate_metrics)
+
+    return {
+        'VaR_95': var_95,
+        'VaR_99': var_99,
+        'Expected_Shortfall': expected_shortfall,
+        'Expected_Return': expected_return,
+        'Return_Volatility': returns_distribution.std(ddof=1),
+        'VaR_95_SE': standard_errors[0],
+        'VaR_99_SE': standard_errors[1],
+        'Expected_Shortfall_SE': standard_errors[2],
+        'Num_Simulations': len(returns_distribution)
+    }
+
+
+def replicate_standard_errors(replicate_metrics):
+    """Standard error of the pooled estimate from a (replicates, metrics) array"""
+    replicate_metrics = np.asarray(replicate_metrics)
+    if len(replicate_metrics) < 2:
+        return np.zeros(replicate_metrics.shape[-1])
+    return replicate_metrics.std(axis=0, ddof=1) / np.sqrt(len(replicate_metrics))
+
+
+class StreamingPathSummary:
+    """
+    Fold blocks of simulated paths into bounded-memory running statistics.
+
+    Each horizon step keeps a running sum, min and max plus a fixed-bin histogram of
+    log returns, from which the 5th/95th percentile bands are read back. Bin edges are
+    derived from mu/sigma (+/- width_sd standard deviations at each step) rather than
+    from the data, so summaries built from different blocks can be merged exactly.
+    The terminal step also keeps per-bin sums of returns for Expected Shortfall and
+    running moments for Expected_Return / Return_Volatility.
+
+    Standard errors come from the spread of tail metrics over `replicates` groups per
+    block, or over whole blocks (batch means) with replicates=1.
+
+    Memory is O((forecast_days + 1) * bins) regardless of how many paths are folded in.
+    """
+
+    def __init__(self, last_price, mu, sigma, forecast_days=TRADING_DAYS, bins=4096, width_sd=8.0,
+                 replicates=REPLICATES):
+        self.last_price = last_price
+        self.bins = bins
+        self.replicates = replicates
+        steps = forecast_days + 1
+
+        horizon = np.arange(steps)
+        half_width = np.maximum(width_sd * sigma * np.sqrt(horizon), 1e-9)
+        self.bin_lo = mu * horizon - half_width
+        self.bin_width = 2 * half_width / bins
+        self._bin_offsets = (horizon * bins)[:, None]
+
+        self.count = 0
+        self.counts = np.zeros((steps, bins), dtype=np.int64)
+        self.path_sum = np.zeros(steps)
+        self.path_min = np.full(steps, np.inf)
+        self.path_max = np.full(steps, -np.inf)
+        self.log_min = np.full(steps, np.inf)
+        self.log_max = np.full(steps, -np.inf)
+        self.tail_sums = np.zeros(bins)
+        self.return_mean = 0.0
+        self.return_m2 = 0.0
+        self.replicate_metrics = []
+
+    def update(self, log_paths):
+        """Fold a (forecast_days + 1, block_size) matrix of cumulative log returns"""
+        counts, partials = self.block_partials(log_paths)
+        self.counts += counts
+        self.fold(partials)
+
+    def block_partials(self, log_paths):
+        """Summarize one block into integer histogram counts and floating-point partials"""
+        steps, block_size = log_paths.shape
+        log_paths = log_paths.astype(np.float64, copy=False)
+
+        bin_idx = ((log_paths - self.bin_lo[:, None]) / self.bin_width[:, None]).astype(np.int64)
+        np.clip(bin_idx, 0, self.bins - 1, out=bin_idx)
+        counts = np.bincount(
+            (bin_idx + self._bin_offsets).ravel(), minlength=steps * self.bins
+        ).reshape(steps, self.bins)
+
+        prices = np.exp(log_paths) * self.last_price
+        terminal_returns = prices[-1] / self.last_price - 1
+
+        partials = {
+            'count': block_size,
+            'path_sum': prices.sum(axis=1),
+            'path_min': prices.min(axis=1),
+            'path_max': prices.max(axis=1),
+            'log_min': log_paths.min(axis=1),
+            'log_max': log_paths.max(axis=1),
+            'tail_sums': np.bincount(bin_idx[-1], weights=terminal_returns, minlength=self.bins),
+            'return_mean': terminal_returns.mean(),
+            'return_m2': ((terminal_returns - terminal_returns.mean()) ** 2).sum(),
+            'replicate_metrics': [
+                _tail_metrics(terminal_returns[group]) for group in _replicate_slices(block_size, self.replicates)
+            ]
+        }
+        return counts, partials
+
+    def fold(self, partials):
+        """Fold block partials into the running statistics (Chan et al. for the moments)"""
+        n_a, n_b = self.count, partials['count']
+        total = n_a + n_b
+        delta = partials['return_mean'] - self.return_mean
+        self.return_mean += delta * n_b / total
+        self.return_m2 += partials['return_m2'] + delta ** 2 * n_a * n_b / total
+        self.count = total
+
+        self.path_sum += partials['path_sum']
+        np.minimum(self.path_min, partials['path_min'], out=self.path_min)
+        np.maximum(self.path_max, partials['path_max'], out=self.path_max)
+        np.minimum(self.log_min, partials['log_min'], out=self.log_min)
+        np.maximum(self.log_max, partials['log_max'], out=self.log_max)
+        self.tail_sums += partials['tail_sums']
+        self.replicate_metrics.extend(partials['replicate_metrics'])
+
+    def _locate(self, counts, percentile):
+        """Find the bin holding a percentile (np.percentile linear rank) and its in-bin fraction"""
+        rank = percentile / 100 * (self.count - 1)
+        cumulative = np.cumsum(counts, axis=-1)
+        bin_idx = np.minimum((cumulative <= rank).sum(axis=-1), self.bins - 1)
+        before = np.take_along_axis(cumulative, bin_idx[..., None], axis=-1)[..., 0] - \
+            np.take_along_axis(counts, bin_idx[..., None], axis=-1)[..., 0]
+        in_bin = np.take_along_axis(counts, bin_idx[..., None], axis=-1)[..., 0]
+        fraction = np.clip((rank - before + 0.5) / np.maximum(in_bin, 1), 0, 1)
+        return bin_idx, before, in_bin, fraction
+
+    def log_quantile(self, percentile):
+        """Estimate a percentile of the cumulative log return at every horizon step"""
+        bin_idx, _, _, fraction = self._locate(self.counts, percentile)
+        estimate = self.bin_lo + (bin_idx + fraction) * self.bin_width
+        return np.clip(estimate, self.log_min, self.log_max)
+
+    def has_converged(self, tolerance, z=1.96):
+        """
+        True once the confidence interval half-width of VaR_95 (the terminal lower_95
+        band), Expected Shortfall and the terminal upper_95 band, all in return units,
+        is at most tolerance.
+        """
+        if len(self.replicate_metrics) < 2:
+            return False
+        standard_errors = replicate_standard_errors(self.replicate_metrics)
+        return bool(np.all(z * standard_errors[[0, 2, 3]] <= tolerance))
+
+    def result(self):
+        """Return sim_results / risk_metrics in the same shape as summarize_paths"""
+        if self.count < 2:
+            raise ValueError("At least two simulated paths are needed for risk metrics")
+
+        index = pd.RangeIndex(len(self.path_sum))
+        sim_results = {
+            'mean_path': pd.Series(self.path_sum / self.count, index=index),
+            'upper_95': pd.Series(self.last_price * np.exp(self.log_quantile(95)), index=index),
+            'lower_95': pd.Series(self.last_price * np.exp(self.log_quantile(5)), index=index),
+            'max_path': pd.Series(self.path_max, index=index),
+            'min_path': pd.Series(self.path_min, index=index)
+        }
+
+        terminal_counts = self.counts[-1]
+        var_95 = np.expm1(self.log_quantile(5)[-1])
+        var_99 = np.expm1(self.log_quantile(1)[-1])
+
+        bin_idx, before, in_bin, fraction = self._locate(terminal_counts, 5)
+        tail_sum = self.tail_sums[:bin_idx].sum() + fraction * self.tail_sums[bin_idx]
+        tail_count = before + fraction * in_bin
+        expected_shortfall = tail_sum / tail_count if tail_count > 0 else var_95
+        standard_errors = replicate_standard_errors(self.replicate_metrics)
+
+        risk_metrics = {
+            'VaR_95': var_95,
+            'VaR_99': var_99,
+            'Expected_Shortfall': expected_shortfall,
+            'Expected_Return': self.return_mean,
+            'Return_Volatility': np.sqrt(self.return_m2 / (self.count - 1)),
+            'VaR_95_SE': standard_errors[0],
+            'VaR_99_SE': standard_errors[1],
+            'Expected_Shortfall_SE': standard_errors[2],
+            'Num_Simulations': self.count
+        }
+        return sim_results, risk_metrics
+
+
+def get_process_pool():
+    """Return the shared process pool of PROCESS_POOL_WORKERS workers, creating it on first use"""
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            context = multiprocessing.get_context(POOL_START_METHOD)
+            if POOL_START_METHOD == 'forkserver':
+                # Import the worker modules once in the fork server rather than in every worker.
+                # Workers still re-import the launching script as __mp_main__, so app.py keeps
+                # its service setup in init_services() under the __main__ guard
+                context.set_forkserver_preload(['monte_carlo', 'backtesting'])
+            _process_pool = ProcessPoolExecutor(max_workers=PROCESS_POOL_WORKERS, mp_context=context)
+        return _process_pool
+
+
+def _simulate_blocks(last_price, kernel, forecast_days, dtype, estimator, block_sizes, seed_sequences):
+    """
+    Simulate a run of blocks, each from its own SeedSequence child.
+
+    Returns the summed histogram counts (integers, so order does not matter) and the
+    per-block floating-point partials, which the caller folds in block order.
+    """
+    summary = StreamingPathSummary(last_price, kernel.mu, kernel.sigma, forecast_days)
+    partials = []
+    for block_size, seed_sequence in zip(block_sizes, seed_sequences):
+        log_paths = simulate_log_paths(
+            kernel, block_size, forecast_days, dtype=dtype,
+            rng=np.random.default_rng(seed_sequence), estimator=estimator
+        )
+        counts, block = summary.block_partials(log_paths)
+        summary.counts += counts
+        partials.append(block)
+    return summary.counts, partials
+
+
+def run_streaming_monte_carlo(last_price, kernel, num_simulations, forecast_days=TRADING_DAYS,
+                              dtype=np.float64, seed=None, chunk_size=DEFAULT_CHUNK_SIZE, workers=None,
+                              estimator='plain'):
+    """
+    Simulate paths in fixed-size blocks and fold them into a StreamingPathSummary.
+
+    Every block draws from its own np.random.SeedSequence child of seed, and blocks
+    are always folded in block order, so a given seed produces bit-identical results
+    for any worker count. With workers > 1, contiguous runs of blocks are spread over
+    the shared process pool (at most PROCESS_POOL_WORKERS of them at once).
+    """
+    block_sizes = [min(chunk_size, num_simulations - start) for start in range(0, num_simulations, chunk_size)]
+    seed_sequences = np.random.SeedSequence(seed).spawn(len(block_sizes))
+    summary = StreamingPathSummary(last_price, kernel.mu, kernel.sigma, forecast_days)
+
+    if not workers or workers <= 1 or len(block_sizes) == 1:
+        for block_size, seed_sequence in zip(block_sizes, seed_sequences):
+            summary.update(simulate_log_paths(
+                kernel, block_size, forecast_days, dtype=dtype,
+                rng=np.random.default_rng(seed_sequence), estimator=estimator
+            ))
+        return summary.result()
+
+    groups = np.array_split(np.arange(len(block_sizes)), min(workers, PROCESS_POOL_WORKERS, len(block_sizes)))
+    pool = get_process_pool()
+    futures = [
+        pool.submit(
+            _simulate_blocks, last_price, kernel, forecast_days, dtype, estimator,
+            [block_sizes[i] for i in group], [seed_sequences[i] for i in group]
+        )
+        for group in groups
+    ]
+    for future in futures:
+        counts, partials = future.result()
+        summary.counts += counts
+        for block in partials:
+            summary.fold(block)
+    return summary.result()
+
+
+def run_adaptive_monte_carlo(last_price, kernel, tolerance, max_simulations=ADAPTIVE_MAX_SIMULATIONS,
+                             forecast_days=TRADING_DAYS, dtype=np.float64, seed=None,
+                             batch_size=ADAPTIVE_BATCH_SIZE, estimator='plain'):
+    """
+    Simulate batches until the 95% confidence intervals of VaR_95, Expected Shortfall
+    and the terminal upper/lower bands are narrower than +/- tolerance, or until
+    max_simulations paths have been used.
+
+    Batches are seeded exactly like run_streaming_monte_carlo blocks, so a converged
+    run's estimates match a fixed-size streaming run of the same length and seed. The
+    standard errors are batch means over whole batches. The number of paths used is
+    returned as risk_metrics['Num_Simulations'].
+    """
+    seed_sequence = np.random.SeedSequence(seed)
+    summary = StreamingPathSummary(last_price, kernel.mu, kernel.sigma, forecast_days, replicates=1)
+
+    while summary.count < max_simulations:
+        block_size = min(batch_size, max_simulations - summary.count)
+        summary.update(simulate_log_paths(
+            kernel, block_size, forecast_days, dtype=dtype,
+            rng=np.random.default_rng(seed_sequence.spawn(1)[0]), estimator=estimator
+        ))
+        if summary.count >= ADAPTIVE_MIN_BATCHES * batch_size and summary.has_converged(tolerance):
+            break
+    return summary.result()
+
+
+def run_monte_carlo(close, num_simulations=1000, forecast_days=TRADING_DAYS, dtype=np.float64, seed=None,
+                    chunk_size=None, workers=None, estimator='plain', tolerance=None,
+                    max_simulations=ADAPTIVE_MAX_SIMULATIONS, kernel='gbm', kernel_options=None):
+    """
+    Run a Monte Carlo price forecast from a close price history.
+
+    Args:
+        close: Close prices (Series or array), oldest first
+        num_simulations: Number of simulated paths
+        forecast_days: Number of trading days to forecast
+        dtype: np.float64 (default) or np.float32 for half the memory traffic
+        seed: Optional seed for reproducible results
+        chunk_size: Simulate in blocks of this many paths and stream them through a
+            StreamingPathSummary, so peak memory depends on chunk_size rather than
+            num_simulations. Defaults to DEFAULT_CHUNK_SIZE above STREAMING_THRESHOLD paths.
+        workers: Spread blocks over this many processes. Setting it (even to 1) selects
+            the block-seeded streaming mode, whose results depend only on seed and
+            chunk_size, never on the worker count.
+        estimator: 'plain', 'antithetic', 'sobol' (scrambled Sobol QMC with a Brownian
+            bridge) or 'control_variate' (corrects risk metrics with the terminal shock
+            sum, whose distribution is known). control_variate needs the in-memory mode.
+        tolerance: Enable adaptive stopping. Paths are simulated in batches of chunk_size
+            (default ADAPTIVE_BATCH_SIZE) until the 95% confidence half-widths of VaR_95,
+            Expected_Shortfall and the terminal bands, in return units, are below
+            tolerance. num_simulations and workers are ignored in this mode.
+        max_simulations: Hard cap on paths in adaptive mode
+        kernel: Return generator, one of KERNELS: 'gbm' (normal log returns),
+            'bootstrap' (stationary block bootstrap of the history) or 'student_t'
+        kernel_options: Extra kernel arguments, e.g. {'mean_block_length': 10} or {'df': 4}
+
+    Returns:
+        (sim_results, risk_metrics) dicts
+    """
+    if estimator not in ESTIMATORS:
+        raise ValueError(f"Unknown estimator '{estimator}', expected one of {', '.join(ESTIMATORS)}")
+
+    close = np.asarray(close, dtype=np.float64)
+    generator = make_kernel(kernel, close, **(kernel_options or {}))
+    if estimator not in generator.estimators:
+        raise ValueError(f"The {kernel} kernel only supports these estimators: {', '.join(generator.estimators)}")
+    last_price = close[-1]
+
+    if tolerance is not None:
+        if estimator == 'control_variate':
+            raise ValueError("The control_variate estimator is not available in adaptive mode")
+        return run_adaptive_monte_carlo(
+            last_price, generator, tolerance, max_simulations, forecast_days,
+            dtype=dtype, seed=seed, batch_size=chunk_size or ADAPTIVE_BATCH_SIZE, estimator=estimator
+        )
+
+    if chunk_size is None and (workers or num_simulations > STREAMING_THRESHOLD):
+        chunk_size = DEFAULT_CHUNK_SIZE
+
+    if chunk_size is None:
+        log_paths = simulate_log_paths(
+            generator, num_simulations, forecast_days, dtype=dtype,
+            rng=np.random.default_rng(seed), estimator=estimator
+        )
+        control = None
+        if estimator == 'control_variate':
+            control = generator.control(log_paths[-1].astype(np.float64), forecast_days)
+        np.exp(log_paths, out=log_paths)
+        log_paths *= log_paths.dtype.type(last_price)
+        return summarize_paths(log_paths, last_price, control)
+
+    if estimator == 'control_variate':
+        raise ValueError("The control_variate estimator is not available in chunked or parallel mode")
+
+    return run_streaming_monte_carlo(
+        last_price, generator, num_simulations, forecast_days,
+        dtype=dtype, seed=seed, chunk_size=chunk_size, workers=workers, estimator=estimator
+    )
+
+
+def cholesky_factor(cov):
+    """Lower-triangular factor of a covariance matrix, falling back to a clipped
+    eigendecomposition when sample covariance is not positive definite"""
+    try:
+        return np.linalg.cholesky(cov)
+    except np.linalg.LinAlgError:
+        eigenvalues, eigenvectors = np.linalg.eigh(cov)
+        return eigenvectors * np.sqrt(np.clip(eigenvalues, 0, None))
+
+
+def simulate_correlated_log_paths(mu, cov, num_simulations=1000, forecast_days=TRADING_DAYS, step_days=1,
+                                  dtype=np.float64, rng=None):
+    """
+    Simulate cumulative log returns for correlated assets.
+
+    All shocks are drawn as one (steps, num_simulations, assets) tensor and correlated
+    with a single matmul against the Cholesky factor. GBM is exact on any time grid, so
+    step_days > 1 only coarsens the reported path bands, not the terminal distribution.
+
+    Returns:
+        (horizon, log_paths): horizon is the trading day of each row, starting at 0;
+        log_paths has shape (len(horizon), num_simulations, assets).
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    dtype = np.dtype(dtype)
+    mu = np.asarray(mu, dtype=np.float64)
+
+    horizon = np.append(np.arange(0, forecast_days, step_days), forecast_days)
+    step_lengths = np.diff(horizon).astype(np.float64)
+
+    log_paths = np.empty((len(horizon), num_simulations, len(mu)), dtype=dtype)
+    log_paths[0] = 0
+    steps = log_paths[1:]
+    rng.standard_normal(out=steps, dtype=dtype)
+    np.matmul(steps, cholesky_factor(cov).T.astype(dtype), out=steps)
+    steps *= np.sqrt(step_lengths).astype(dtype)[:, None, None]
+    steps += (step_lengths[:, None] * mu).astype(dtype)[:, None, :]
+    np.cumsum(steps, axis=0, out=steps)
+    return horizon, log_paths
+
+
+def run_portfolio_monte_carlo(close_matrix, weights, num_simulations=1000, forecast_days=TRADING_DAYS,
+                              step_days=1, dtype=np.float64, seed=None):
+    """
+    Monte Carlo for a buy-and-hold portfolio of correlated assets.
+
+    Args:
+        close_matrix: Aligned (days, assets) close prices, oldest first
+        weights: Portfolio weights per asset; normalized to sum to 1
+        step_days: Time step of the simulated grid in trading days
+
+    Returns:
+        (sim_results, risk_metrics, contributions): sim_results/risk_metrics match the
+        single-asset shapes, with portfolio value starting at 1.0 and indexed by
+        trading day. contributions has per-asset 'weight', 'volatility_contribution'
+        (Euler share of portfolio variance) and 'es_contribution' (w_i * E[R_i | tail],
+        which sums to Expected_Shortfall) arrays.
+    """
+    close_matrix = np.asarray(close_matrix, dtype=np.float64)
+    weights = np.asarray(weights, dtype=np.float64)
+    if close_matrix.ndim != 2 or close_matrix.shape[1] != len(weights):
+        raise ValueError("close_matrix must be (days, assets) with one weight per asset")
+    if close_matrix.shape[0] < 3:
+        raise ValueError("At least three aligned closing prices are needed to estimate returns")
+    if weights.sum() <= 0:
+        raise ValueError("Portfolio weights must sum to a positive value")
+    weights = weights / weights.sum()
+
+    log_returns = np.diff(np.log(close_matrix), axis=0)
+    mu = log_returns.mean(axis=0)
+    cov = np.atleast_2d(np.cov(log_returns, rowvar=False))
+
+    horizon, log_paths = simulate_correlated_log_paths(
+        mu, cov, num_simulations, forecast_days, step_days, dtype=dtype, rng=np.random.default_rng(seed)
+    )
+    np.exp(log_paths, out=log_paths)
+    portfolio_paths = log_paths @ weights.astype(log_paths.dtype)
+
+    index = pd.Index(horizon, name='day')
+    lower_95, upper_95 = np.percentile(portfolio_paths, [5, 95], axis=1)
+    sim_results = {
+        'mean_path': pd.Series(portfolio_paths.mean(axis=1, dtype=np.float64), index=index),
+        'upper_95': pd.Series(upper_95.astype(np.float64), index=index),
+        'lower_95': pd.Series(lower_95.astype(np.float64), index=index),
+        'max_path': pd.Series(portfolio_paths.max(axis=1).astype(np.float64), index=index),
+        'min_path': pd.Series(portfolio_paths.min(axis=1).astype(np.float64), index=index)
+    }
+
+    asset_returns = log_paths[-1].astype(np.float64) - 1
+    portfolio_returns = asset_returns @ weights
+    risk_metrics = calculate_risk_metrics(portfolio_returns)
+
+    tail = portfolio_returns <= risk_metrics['VaR_95']
+    marginal_variance = cov @ weights
+    contributions = {
+        'weight': weights,
+        'volatility_contribution': weights * marginal_variance / (weights @ marginal_variance),
+        'es_contribution': weights * asset_returns[tail].mean(axis=0)
+    }
+    return sim_results, risk_metrics, contributions
+
+
+def _legacy_monte_carlo(close, num_simulations=1000, forecast_days=TRADING_DAYS):
+    """Day-by-day loop with DataFrame percentiles, kept only as the benchmark baseline"""
+    close = pd.Series(close)
+    returns = np.log(close / close.shift(1))
+    mu, sigma = returns.mean(), returns.std()
+    last_price = close.iloc[-1]
+
+    all_simulations = np.zeros((forecast_days + 1, num_simulations))
+    all_simulations[0] = last_price
+    for day in range(1, forecast_days + 1):
+        random_returns = np.random.normal(mu, sigma, num_simulations)
+        all_simulations[day] = all_simulations[day - 1] * np.exp(random_returns)
+
+    simulation_df = pd.DataFrame(all_simulations)
+    simulation_df.mean(axis=1)
+    simulation_df.apply(lambda x: np.percentile(x, 95), axis=1)
+    simulation_df.apply(lambda x: np.percentile(x, 5), axis=1)
+    simulation_df.max(axis=1)
+    simulation_df.min(axis=1)
+
+
+def _nested_loop_monte_carlo(close, num_simulations=1000, forecast_days=TRADING_DAYS):
+    """Per-path, per-day loop from the WhatsApp bot, kept only as the benchmark baseline"""
+    close = pd.Series(close)
+    returns = np.log(close / close.shift(1))
+    mu, sigma = returns.mean(), returns.std()
+    last_price = close.iloc[-1]
+
+    simulation_df = pd.DataFrame()
+    for i in range(num_simulations):
+        prices = [last_price]
+        for day in range(forecast_days):
+            prices.append(prices[-1] * np.exp(np.random.normal(mu, sigma)))
+        simulation_df[f'Sim_{i}'] = prices
+    simulation_df.apply(lambda x: np.percentile(x, 95), axis=1)
+
+
+def benchmark(path_counts=(1_000, 10_000, 100_000), forecast_days=TRADING_DAYS, repeats=3, max_nested_paths=1_000):
+    """
+    Time the old implementations against the vectorized engine (float64 and float32).
+
+    The WhatsApp nested loop is only timed up to max_nested_paths because it
+    takes minutes beyond that.
+    """
+    rng = np.random.default_rng(0)
+    close = 100 * np.exp(np.cumsum(rng.normal(0.0005, 0.015, TRADING_DAYS)))
+
+    def best_of(fn):
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    print(f"{'paths':>8} {'nested (s)':>12} {'day loop (s)':>13} {'float64 (s)':>12} {'float32 (s)':>12} {'speedup':>9}")
+    for num_simulations in path_counts:
+        nested = (best_of(lambda: _nested_loop_monte_carlo(close, num_simulations, forecast_days))
+                  if num_simulations <= max_nested_paths else None)
+        legacy = best_of(lambda: _legacy_monte_carlo(close, num_simulations, forecast_days))
+        vec64 = best_of(lambda: run_monte_carlo(close, num_simulations, forecast_days, dtype=np.float64))
+        vec32 = best_of(lambda: run_monte_carlo(close, num_simulations, forecast_days, dtype=np.float32))
+        nested_col = f"{nested:>12.4f}" if nested is not None else f"{'-':>12}"
+        print(f"{num_simulations:>8} {nested_col} {legacy:>13.4f} {vec64:>12.4f} {vec32:>12.4f} "
+              f"{legacy / min(vec64, vec32):>8.1f}x")
+
+
+def analytic_gbm_risk_metrics(mu, sigma, forecast_days=TRADING_DAYS):
+    """Closed-form VaR_95, VaR_99 and Expected Shortfall of terminal GBM returns"""
+    drift, spread = mu * forecast_days, sigma * np.sqrt(forecast_days)
+    var_95, var_99 = np.expm1(drift + spread * norm.ppf([0.05, 0.01]))
+    expected_shortfall = np.exp(drift + spread ** 2 / 2) * norm.cdf(norm.ppf(0.05) - spread) / 0.05 - 1
+    return np.array([var_95, var_99, expected_shortfall])
+
+
+def benchmark_estimators(path_counts=(250, 1_000, 4_000), trials=40, forecast_days=TRADING_DAYS):
+    """
+    Compare error against time for each estimator.
+
+    RMSE is measured against the closed-form GBM values over independent trials;
+    efficiency is 1 / (RMSE^2 * time) relative to plain at the same path count.
+    """
+    rng = np.random.default_rng(0)
+    close = 100 * np.exp(np.cumsum(rng.normal(0.0005, 0.015, TRADING_DAYS)))
+    truth = analytic_gbm_risk_metrics(*estimate_log_return_params(close), forecast_days)
+
+    print(f"{'estimator':>16} {'paths':>7} {'time (ms)':>10} {'RMSE VaR95':>11} {'RMSE VaR99':>11} "
+          f"{'RMSE ES':>9} {'mean SE95':>10} {'efficiency':>11}")
+    for num_simulations in path_counts:
+        baseline = None
+        for estimator in ESTIMATORS:
+            errors, standard_errors, timings = [], [], []
+            for trial in range(trials):
+                start = time.perf_counter()
+                _, risk_metrics = run_monte_carlo(
+                    close, num_simulations, forecast_days, seed=trial, estimator=estimator
+                )
+                timings.append(time.perf_counter() - start)
+                estimate = [risk_metrics['VaR_95'], risk_metrics['VaR_99'], risk_metrics['Expected_Shortfall']]
+                errors.append(np.array(estimate) - truth)
+                standard_errors.append(risk_metrics['VaR_95_SE'])
+
+            rmse = np.sqrt(np.mean(np.square(errors), axis=0))
+            elapsed = np.median(timings)
+            work = rmse[0] ** 2 * elapsed
+            baseline = work if baseline is None else baseline
+            print(f"{estimator:>16} {num_simulations:>7} {elapsed * 1000:>10.2f} {rmse[0]:>11.5f} {rmse[1]:>11.5f} "
+                  f"{rmse[2]:>9.5f} {np.mean(standard_errors):>10.5f} {baseline / work:>10.1f}x")
+
+
+def check_adaptive_coverage(runs=400, batches=ADAPTIVE_MIN_BATCHES, forecast_days=21, bounds=(0.9, 1.1)):
+    """
+    The Expected Shortfall SE reported by adaptive runs must match the empirical spread
+    of the pooled estimate over many seeds. Returns (problems, mean SE / spread ratio).
+    """
+    rng = np.random.default_rng(0)
+    close = 100 * np.exp(np.cumsum(rng.normal(0.0005, 0.015, TRADING_DAYS)))
+    kernel = make_kernel('gbm', close)
+    estimates, standard_errors = [], []
+    for seed in range(runs):
+        # A zero tolerance never converges, so every run uses exactly `batches` batches
+        _, risk_metrics = run_adaptive_monte_carlo(
+            close[-1], kernel, 0.0, batches * ADAPTIVE_BATCH_SIZE, forecast_days, seed=seed
+        )
+        estimates.append(risk_metrics['Expected_Shortfall'])
+        standard_errors.append(risk_metrics['Expected_Shortfall_SE'])
+    ratio = float(np.mean(standard_errors) / np.std(estimates, ddof=1))
+    problems = [] if bounds[0] <= ratio <= bounds[1] else [f"reported ES SE is {ratio:.2f}x the empirical spread"]
+    return problems, ratio
+
+
+def benchmark_kernels(num_simulations=10_000, forecast_days=TRADING_DAYS, repeats=3):
+    """Time each return-generator kernel through the shared reduction stage"""
+    rng = np.random.default_rng(0)
+    close = 100 * np.exp(np.cumsum(rng.standard_t(4, TRADING_DAYS) * 0.01))
+
+    print(f"{'kernel':>10} {'time (s)':>10} {'VaR_95':>9} {'VaR_99':>9} {'ES':>9}")
+    for name in KERNELS:
+        timings = []
+        for trial in range(repeats):
+            start = time.perf_counter()
+            _, risk_metrics = run_monte_carlo(close, num_simulations, forecast_days, seed=trial, kernel=name)
+            timings.append(time.perf_counter() - start)
+        print(f"{name:>10} {min(timings):>10.4f} {risk_metrics['VaR_95']:>9.4f} {risk_metrics['VaR_99']:>9.4f} "
+              f"{risk_metrics['Expected_Shortfall']:>9.4f}")
+
+
+if __name__ == "__main__":
+    benchmark()
+    print()
+    benchmark_estimators()
+    print()
+    benchmark_kernels()
+    print()
+    problems, ratio = check_adaptive_coverage()
+    print(f"Adaptive ES standard error / empirical spread: {ratio:.2f} ({'ok' if not problems else 'FAIL'})")
@@ -0,0 +1,225 @@
+# prefetch.py
+
+import os
+import time
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from price_store import PriceStore, get_price_store
+from market_data import ReplayProvider
+
+# Background threads warming the price store; searches narrowing to at most
+# PREFETCH_MAX_RESULTS symbols prefetch them, and at most PREFETCH_QUEUE wait at once
+PREFETCH_WORKERS = int(os.environ.get('PREFETCH_WORKERS', 2))
+PREFETCH_QUEUE = 16
+PREFETCH_MAX_RESULTS = 3
+# /api/analyze reads this much history
+PREFETCH_PERIOD = '1y'
+# Prefetch threads wait this long between checks while foreground loads are running
+YIELD_SECONDS = 0.05
+# Symbols remembered as prefetched, for attributing cache hits
+WARMED_SYMBOLS = 1024
+
+_default_prefetcher = None
+_default_prefetcher_lock = threading.Lock()
+
+
+def _lower_priority():
+    """Give the calling thread the lowest CPU scheduling priority (Linux only)"""
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+    except (AttributeError, OSError):
+        pass
+
+
+class Prefetcher:
+    """
+    Speculatively loads the history a user is about to analyze into the price store.
+
+    Jobs run on a small pool of lowest-priority threads and hold back while any
+    foreground load is in flight in the store. A new prefetch() call from an owner
+    (e.g. a client address) withdraws that owner's earlier requests for symbols it
+    no longer lists, so only its latest search is warmed; a queued job is cancelled
+    once no owner wants it, and other owners' jobs are left alone.
+    record() counts /api/analyze requests served from the store, and how many of
+    those the prefetcher warmed.
+    """
+
+    def __init__(self, store=None, workers=PREFETCH_WORKERS, max_queued=PREFETCH_QUEUE, period=PREFETCH_PERIOD):
+        self.store = store or get_price_store()
+        self.max_queued = max_queued
+        self.period = period
+        self.stats = {'scheduled': 0, 'warmed': 0, 'cancelled': 0, 'dropped': 0, 'failed': 0,
+                      'requests': 0, 'hits': 0, 'prefetch_hits': 0}
+        self._pool = ThreadPoolExecutor(workers, thread_name_prefix='prefetch', initializer=_lower_priority)
+        self._lock = threading.Lock()
+        self._queued = {}
+        self._active = set()
+        self._warmed = OrderedDict()
+
+    def prefetch(self, symbols, owner=None):
+        """
+        Queue symbols for warming on behalf of owner, withdrawing the owner's queued
+        requests for symbols not listed; returns the symbols newly queued
+        """
+        symbols = list(dict.fromkeys(symbols))
+        with self._lock:
+            for symbol, (_, _, owners) in list(self._queued.items()):
+                if owner in owners and symbol not in symbols:
+                    owners.discard(owner)
+                    if not owners:
+                        self._cancel(symbol)
+        queued = []
+        for symbol in symbols:
+            if self.store.is_cached(symbol, self.period):
+                continue
+            with self._lock:
+                if symbol in self._queued:
+                    self._queued[symbol][2].add(owner)
+                    continue
+                if symbol in self._active:
+                    continue
+                if len(self._queued) >= self.max_queued:
+                    self.stats['dropped'] += 1
+                    continue
+                cancelled = threading.Event()
+                self._queued[symbol] = (self._pool.submit(self._warm, symbol, cancelled), cancelled, {owner})
+                self.stats['scheduled'] += 1
+            queued.append(symbol)
+        return queued
+
+    def cancel(self, symbols=None):
+        """Cancel queued jobs for every owner (all of them by default); downloads already running complete"""
+        with self._lock:
+            for symbol in list(self._queued) if symbols is None else symbols:
+                self._cancel(symbol)
+
+    def _cancel(self, symbol):
+        job = self._queued.pop(symbol, None)
+        if job is not None:
+            job[0].cancel()
+            job[1].set()
+            self.stats['cancelled'] += 1
+
+    def _foreground_busy(self):
+        with self._lock:
+            return self.store.flights.in_flight() > len(self._active)
+
+    def _warm(self, symbol, cancelled):
+        while self._foreground_busy() and not cancelled.is_set():
+            time.sleep(YIELD_SECONDS)
+        with self._lock:
+            if cancelled.is_set():
+                return
+            del self._queued[symbol]
+            self._active.add(symbol)
+        try:
+            self.store.history(symbol, self.period)
+        except Exception:
+            with self._lock:
+                self.stats['failed'] += 1
+        else:
+            with self._lock:
+                self.stats['warmed'] += 1
+                self._warmed[symbol] = True
+                self._warmed.move_to_end(symbol)
+                while len(self._warmed) > WARMED_SYMBOLS:
+                    self._warmed.popitem(last=False)
+        finally:
+            with self._lock:
+                self._active.discard(symbol)
+
+    def record(self, symbol):
+        """Count a foreground request for symbol's history; call before loading it"""
+        cached = self.store.is_cached(symbol, self.period)
+        with self._lock:
+            self.stats['requests'] += 1
+            self.stats['hits'] += cached
+            self.stats['prefetch_hits'] += cached and self._warmed.pop(symbol, False)
+
+    def report(self):
+        """Counters plus the foreground hit rate and the share of hits owed to prefetching"""
+        with self._lock:
+            stats = dict(self.stats, queued=len(self._queued))
+        stats['hit_rate'] = stats['hits'] / stats['requests'] if stats['requests'] else None
+        stats['prefetch_hit_rate'] = stats['prefetch_hits'] / stats['requests'] if stats['requests'] else None
+        return stats
+
+
+def get_prefetcher():
+    """Return the shared prefetcher, creating it on first use"""
+    global _default_prefetcher
+    with _default_prefetcher_lock:
+        if _default_prefetcher is None:
+            _default_prefetcher = Prefetcher()
+        return _default_prefetcher
+
+
+def check_cancel(latency=0.2):
+    """
+    Replacing a search must cancel its queued jobs but not other owners', and
+    prefetching must wait for foreground loads
+    """
+    problems = []
+    with tempfile.TemporaryDirectory() as data_dir:
+        provider = ReplayProvider(latency=latency)
+        store = PriceStore(data_dir, refresh_seconds=3600, provider=provider)
+        prefetcher = Prefetcher(store, workers=1)
+        prefetcher.prefetch([f'OLD{i}.NS' for i in range(5)], owner='first')
+        prefetcher.prefetch(['OTHER.NS', 'OLD4.NS'], owner='second')
+        time.sleep(latency / 4)
+        prefetcher.prefetch(['NEW.NS'], owner='first')
+        prefetcher._pool.shutdown(wait=True)
+        # OLD0 is already downloading and OLD4 is still wanted by the second owner
+        if prefetcher.stats['cancelled'] != 3 or not store.is_cached('NEW.NS', PREFETCH_PERIOD):
+            problems.append(f"cancelled {prefetcher.stats['cancelled']} of 3 stale jobs")
+        if not store.is_cached('OTHER.NS', PREFETCH_PERIOD) or not store.is_cached('OLD4.NS', PREFETCH_PERIOD):
+            problems.append("a new search cancelled another owner's jobs")
+
+        store = PriceStore(data_dir, refresh_seconds=3600, provider=provider)
+        prefetcher = Prefetcher(store, workers=1)
+        foreground = threading.Thread(target=store.history, args=('BUSY.NS', '5y'))
+        foreground.start()
+        time.sleep(latency / 4)
+        prefetcher.prefetch(['IDLE.NS'])
+        time.sleep(latency / 2)
+        if prefetcher._active:
+            problems.append('prefetch started while a foreground load was in flight')
+        foreground.join()
+        prefetcher._pool.shutdown(wait=True)
+        if not store.is_cached('IDLE.NS', PREFETCH_PERIOD):
+            problems.append('prefetch did not run once the foreground load finished')
+    return problems
+
+
+def benchmark(sessions=10, latency=0.3, think_time=0.4):
+    """
+    Simulate users who search, pause, then analyze the top result, with and without
+    prefetching, and compare how long the analyze step waits for history.
+    """
+    timings = {}
+    for label, enabled in (('without prefetch', False), ('with prefetch', True)):
+        with tempfile.TemporaryDirectory() as data_dir:
+            store = PriceStore(data_dir, refresh_seconds=3600, provider=ReplayProvider(latency=latency))
+            prefetcher = Prefetcher(store)
+            waited = 0.0
+            for session in range(sessions):
+                symbol = f'SYM{session}.NS'
+                if enabled:
+                    prefetcher.prefetch([symbol])
+                time.sleep(think_time)
+                prefetcher.record(symbol)
+                start = time.perf_counter()
+                store.history(symbol, PREFETCH_PERIOD)
+                waited += time.perf_counter() - start
+            timings[label] = (waited / sessions, prefetcher.report())
+
+    print(f"{sessions} search -> analyze sessions ({latency * 1000:.0f} ms upstream latency, {think_time:.1f} s think time):")
+    for label, (seconds, report) in timings.items():
+        print(f"  {label + ':':18s} {seconds * 1000:7.1f} ms history wait, hit rate {report['hit_rate']:.0%}")
+    print(f"  cancellation check: {'ok' if not check_cancel() else 'FAIL'}")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,686 @@
+# price_store.py
+
+import os
+import re
+import time
+import tempfile
+import threading
+import warnings
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from market_data import ReplayProvider, get_provider
+
+# One Parquet file of daily bars per symbol lives here
+PRICE_DATA_DIR = os.environ.get(
+    'PRICE_DATA_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'prices')
+)
+# Stored history younger than this is served without asking upstream for new bars
+REFRESH_SECONDS = int(os.environ.get('PRICE_REFRESH_SECONDS', 15 * 60))
+
+PERIOD_OFFSETS = {
+    '1d': pd.DateOffset(days=1), '5d': pd.DateOffset(days=5),
+    '1mo': pd.DateOffset(months=1), '3mo': pd.DateOffset(months=3), '6mo': pd.DateOffset(months=6),
+    '1y': pd.DateOffset(years=1), '2y': pd.DateOffset(years=2), '5y': pd.DateOffset(years=5),
+    '10y': pd.DateOffset(years=10)
+}
+PERIODS = tuple(PERIOD_OFFSETS) + ('ytd', 'max')
+
+# A refresh re-downloads this many stored bars. If their adjusted closes changed,
+# a split or dividend has rewritten the past and the symbol is re-pulled in full.
+# Closes within OVERLAP_RTOL of each other count as unchanged (float noise upstream).
+OVERLAP_BARS = 5
+OVERLAP_RTOL = 1e-6
+
+# Bulk downloads ask upstream for this many symbols per call, running at most
+# BULK_WORKERS calls at a time
+BULK_BATCH_SIZE = 50
+BULK_WORKERS = 4
+
+# Single-flight wait times are kept for this many most recently requested keys
+FLIGHT_METRIC_KEYS = 1024
+
+# Binary mirror of each Parquet file, memory-mapped read-only by every worker:
+# a fixed header, the bar timestamps (int64 UTC nanoseconds), then one
+# contiguous float64 array per MAPPED_COLUMNS entry.
+MAPPED_MAGIC = b'FSOHLCV1'
+MAPPED_COLUMNS = ('Open', 'High', 'Low', 'Close', 'Volume')
+MAPPED_HEADER = np.dtype([
+    ('magic', 'S8'), ('rows', '<i8'), ('covered_from', '<i8'), ('timezone', 'S40')
+])
+MAPPED_HEADER_BYTES = 64
+# covered_from values meaning the whole history ('max') is stored, or coverage is unknown
+_COVERS_ALL = np.iinfo(np.int64).min
+_COVERS_NONE = np.iinfo(np.int64).max
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def period_start(period, now):
+    """First timestamp covered by a yfinance period string ending at now (None for 'max')"""
+    if period == 'max':
+        return None
+    if period == 'ytd':
+        return now.normalize().replace(month=1, day=1)
+    if period not in PERIOD_OFFSETS:
+        raise ValueError(f"Unsupported period '{period}'. Use one of: {', '.join(PERIODS)}")
+    return (now - PERIOD_OFFSETS[period]).normalize()
+
+
+def closes_unchanged(stored, downloaded):
+    """Whether re-downloaded closes match the stored ones up to float noise"""
+    stored, downloaded = np.asarray(stored, dtype=np.float64), np.asarray(downloaded, dtype=np.float64)
+    return stored.shape == downloaded.shape and np.allclose(stored, downloaded, rtol=OVERLAP_RTOL, equal_nan=True)
+
+
+def _conform(bars, tz):
+    """Bars re-indexed into a stored history's time zone (None for tz-naive calendar dates)"""
+    if bars.index.tz is None:
+        return bars if tz is None else bars.tz_localize(tz)
+    return bars.tz_localize(None) if tz is None else bars.tz_convert(tz)
+
+
+def _batches(symbols, size):
+    return [symbols[i:i + size] for i in range(0, len(symbols), size)]
+
+
+class _Flight:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key: the first caller runs the
+    fetch, callers arriving while it is in flight wait for it and share its
+    result (or its exception). Wait times are recorded per key, for the
+    FLIGHT_METRIC_KEYS most recently requested keys.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+        self._metrics = OrderedDict()
+
+    def do(self, key, fn):
+        """Return (fn's result, whether it came from another caller's in-flight call)"""
+        started = time.perf_counter()
+        with self._lock:
+            flight = self._flights.get(key)
+            shared = flight is not None
+            if not shared:
+                flight = self._flights[key] = _Flight()
+        if shared:
+            flight.done.wait()
+        else:
+            try:
+                flight.result = fn()
+            except BaseException as e:
+                flight.error = e
+            finally:
+                with self._lock:
+                    del self._flights[key]
+                flight.done.set()
+        waited = time.perf_counter() - started
+        with self._lock:
+            metrics = self._metrics.get(key)
+            if metrics is None:
+                metrics = self._metrics[key] = {'calls': 0, 'shared': 0, 'total_wait': 0.0, 'max_wait': 0.0}
+            self._metrics.move_to_end(key)
+            while len(self._metrics) > FLIGHT_METRIC_KEYS:
+                self._metrics.popitem(last=False)
+            metrics['calls'] += 1
+            metrics['shared'] += shared
+            metrics['total_wait'] += waited
+            metrics['max_wait'] = max(metrics['max_wait'], waited)
+        if flight.error is not None:
+            raise flight.error
+        return flight.result, shared
+
+    def in_flight(self):
+        """Number of keys with a call running right now"""
+        with self._lock:
+            return len(self._flights)
+
+    def metrics(self):
+        """Per-key call counts, coalesced calls and wait times in milliseconds"""
+        with self._lock:
+            return [
+                {
+                    'key': list(key),
+                    'calls': metrics['calls'],
+                    'shared': metrics['shared'],
+                    'avg_wait_ms': metrics['total_wait'] / metrics['calls'] * 1000,
+                    'max_wait_ms': metrics['max_wait'] * 1000
+                }
+                for key, metrics in self._metrics.items()
+            ]
+
+
+class MappedOHLCV:
+    """
+    Read-only OHLCV arrays of one symbol, viewed straight from a memory-mapped
+    file. Columns are looked up like a DataFrame's (mapped['Close']), so
+    compute_indicators, align_ohlcv and run_monte_carlo accept it as is.
+    """
+
+    def __init__(self, timestamps, columns, covered_from, timezone):
+        self.timestamps = timestamps
+        self.columns = columns
+        self.covered_from = covered_from
+        self.timezone = timezone
+
+    @classmethod
+    def open(cls, path):
+        buffer = np.memmap(path, dtype=np.uint8, mode='r')
+        header = buffer[:MAPPED_HEADER.itemsize].view(MAPPED_HEADER)[0]
+        if header['magic'] != MAPPED_MAGIC:
+            raise ValueError(f"{path} is not a mapped OHLCV file")
+        rows = int(header['rows'])
+        start = MAPPED_HEADER_BYTES
+        timestamps = buffer[start:start + 8 * rows].view('<i8')
+        values = buffer[start + 8 * rows:start + 8 * rows * (1 + len(MAPPED_COLUMNS))].view('<f8')
+        columns = dict(zip(MAPPED_COLUMNS, values.reshape(len(MAPPED_COLUMNS), rows)))
+        return cls(timestamps, columns, int(header['covered_from']), header['timezone'].decode() or None)
+
+    @staticmethod
+    def write(path, df, covered_from):
+        """Write df's OHLCV columns in the mapped layout"""
+        index = df.index.as_unit('ns')
+        timestamps = (index.tz_convert('UTC') if index.tz is not None else index).asi8
+        header = np.zeros(1, dtype=MAPPED_HEADER)
+        header['magic'] = MAPPED_MAGIC
+        header['rows'] = len(df)
+        header['covered_from'] = _COVERS_ALL if covered_from == 'max' else (
+            _COVERS_NONE if covered_from is None else pd.Timestamp(covered_from).value)
+        header['timezone'] = str(index.tz or '').encode()
+        with open(path, 'wb') as file:
+            file.write(header.tobytes().ljust(MAPPED_HEADER_BYTES, b'\0'))
+            file.write(np.ascontiguousarray(timestamps, dtype='<i8').tobytes())
+            for column in MAPPED_COLUMNS:
+                file.write(df[column].to_numpy(dtype='<f8').tobytes())
+
+    def __getitem__(self, column):
+        return self.columns[column]
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    @property
+    def index(self):
+        index = pd.DatetimeIndex(self.timestamps.astype('datetime64[ns]'), name='Date')
+        return index.tz_localize('UTC').tz_convert(self.timezone) if self.timezone else index
+
+    def covers(self, start):
+        if self.covered_from == _COVERS_ALL:
+            return True
+        return start is not None and self.covered_from <= start.tz_localize(None).value
+
+    def since(self, start):
+        """Views of the bars from start (a wall-clock Timestamp in the symbol's time zone) on"""
+        if start is None:
+            return self
+        if self.timezone:
+            start = start.tz_localize(None).tz_localize(self.timezone)
+        first = np.searchsorted(self.timestamps, start.value)
+        columns = {column: values[first:] for column, values in self.columns.items()}
+        return MappedOHLCV(self.timestamps[first:], columns, self.covered_from, self.timezone)
+
+    def frame(self):
+        """A DataFrame copy of the bars"""
+        return pd.DataFrame({column: np.array(values) for column, values in self.columns.items()}, index=self.index)
+
+
+class PriceStore:
+    """
+    Per-symbol daily OHLCV history kept as Parquet files under data_dir.
+
+    The first request for a symbol downloads the requested period. Later requests
+    are served from disk, and once the file is older than refresh_seconds only the
+    bars since the last stored date are downloaded and merged in. A longer period
+    than the one stored triggers one full download of that period.
+
+    Each refresh also re-downloads the last OVERLAP_BARS stored bars. When their
+    adjusted closes no longer match (a split or dividend was applied upstream),
+    only that symbol is re-pulled in full and the callbacks registered with
+    subscribe() are told to drop anything derived from its old history.
+
+    Concurrent requests for the same (symbol, period, interval) share one load
+    through a SingleFlight, as do concurrent company-info lookups. Requests for
+    several symbols at once go through bulk(), which downloads them in batches.
+    Bars and company info come from provider (by default the one chosen by
+    MARKET_DATA_PROVIDER, see market_data.py).
+    """
+
+    def __init__(self, data_dir=None, refresh_seconds=REFRESH_SECONDS, provider=None):
+        self.data_dir = data_dir or PRICE_DATA_DIR
+        self.refresh_seconds = refresh_seconds
+        self.provider = provider or get_provider()
+        self.flights = SingleFlight()
+        self.stats = {'full': 0, 'delta': 0, 'local': 0, 'rebased': 0}
+        self._locks = defaultdict(threading.Lock)
+        self._mapped = {}
+        self._listeners = []
+        os.makedirs(self.data_dir, exist_ok=True)
+
+    def path(self, symbol):
+        """File holding a symbol's bars; symbols like '^NSEI' are made filename-safe"""
+        return os.path.join(self.data_dir, re.sub(r'[^A-Za-z0-9._-]', '_', symbol) + '.parquet')
+
+    def mapped_path(self, symbol):
+        return self.path(symbol)[:-len('.parquet')] + '.ohlcv'
+
+    def mapped(self, symbol):
+        """The symbol's memory-mapped mirror, or None; re-mapped only after the file is replaced"""
+        path = self.mapped_path(symbol)
+        try:
+            status = os.stat(path)
+        except FileNotFoundError:
+            return None
+        key = (status.st_ino, status.st_mtime_ns, status.st_size)
+        cached = self._mapped.get(symbol)
+        if cached is None or cached[0] != key:
+            cached = self._mapped[symbol] = (key, MappedOHLCV.open(path))
+        return cached[1]
+
+    def read(self, symbol):
+        """Stored bars of a symbol, or None"""
+        path = self.path(symbol)
+        return pd.read_parquet(path) if os.path.exists(path) else None
+
+    def write(self, symbol, df, covered_from):
+        """Replace a symbol's file atomically; covered_from is the earliest date requested ('max' for all)"""
+        df = df[~df.index.duplicated(keep='last')].sort_index()
+        df.attrs = {'covered_from': covered_from}
+        for path, save in ((self.mapped_path(symbol), lambda path: MappedOHLCV.write(path, df, covered_from)),
+                           (self.path(symbol), df.to_parquet)):
+            handle, temporary = tempfile.mkstemp(dir=self.data_dir, suffix='.tmp')
+            os.close(handle)
+            try:
+                save(temporary)
+                os.replace(temporary, path)
+            except BaseException:
+                os.remove(temporary)
+                raise
+        return df
+
+    def _covers(self, stored, start):
+        covered_from = stored.attrs.get('covered_from')
+        if covered_from == 'max':
+            return True
+        if start is None or covered_from is None:
+            return False
+        return pd.Timestamp(covered_from).tz_localize(None) <= start.tz_localize(None)
+
+    def _is_fresh(self, symbol):
+        return time.time() - os.path.getmtime(self.path(symbol)) < self.refresh_seconds
+
+    def merge(self, symbol, stored, new_bars):
+        """Merge newer bars into stored history (new bars win on overlapping dates) and save it"""
+        if new_bars.empty:
+            os.utime(self.path(symbol))
+            return stored
+        new_bars = _conform(new_bars, stored.index.tz)
+        merged = pd.concat([stored, new_bars[stored.columns.intersection(new_bars.columns)]])
+        return self.write(symbol, merged, stored.attrs.get('covered_from'))
+
+    def subscribe(self, callback):
+        """Call callback(symbol) whenever a symbol's past history is rewritten"""
+        self._listeners.append(callback)
+
+    def refresh(self, symbol, stored, new_bars=None):
+        """
+        Merge bars since the overlap window into stored history, or re-pull it if the
+        overlap changed. new_bars are downloaded unless given (e.g. by a bulk download).
+        """
+        overlap = stored.index[-OVERLAP_BARS:]
+        if new_bars is None:
+            new_bars = self.provider.history(symbol, start=overlap[0].date())
+        if new_bars.empty:
+            return self.merge(symbol, stored, new_bars)
+        new_bars = _conform(new_bars, stored.index.tz)
+        new_bars = new_bars[new_bars.index >= overlap[0]]
+        # The last stored bar may have been an intraday partial bar, so leave it out
+        common = overlap[:-1].intersection(new_bars.index)
+        if closes_unchanged(stored.loc[common, 'Close'], new_bars.loc[common, 'Close']):
+            self.stats['delta'] += 1
+            return self.merge(symbol, stored, new_bars)
+        return self.rebase(symbol, stored.attrs.get('covered_from'))
+
+    def rebase(self, symbol, covered_from):
+        """Re-download a symbol's whole stored span and notify subscribers"""
+        if covered_from == 'max':
+            df = self.provider.history(symbol, period='max')
+        else:
+            df = self.provider.history(symbol, start=pd.Timestamp(covered_from or '1900-01-01').date())
+        if df.empty:
+            raise ValueError(f"No data found for symbol {symbol}")
+        stored = self.write(symbol, df, covered_from)
+        self.stats['rebased'] += 1
+        for callback in self._listeners:
+            callback(symbol)
+        return stored
+
+    def history(self, symbol, period="1y"):
+        """
+        Daily bars of one symbol over period, served from disk when possible.
+
+        Raises:
+            ValueError: when upstream has no data for the symbol
+        """
+        if period not in PERIODS:
+            raise ValueError(f"Unsupported period '{period}'. Use one of: {', '.join(PERIODS)}")
+        (stored, start), _ = self.flights.do((symbol, period, '1d'), lambda: self._load(symbol, period))
+        # Slicing copies, so callers sharing one load never see each other's edits
+        if start is None:
+            return stored.copy()
+        if stored.index.tz is not None:
+            start = start.tz_localize(None).tz_localize(stored.index.tz)
+        return stored[stored.index >= start]
+
+    def _load(self, symbol, period):
+        """Stored bars covering period, downloaded or refreshed first when needed, and the period start"""
+        with self._locks[symbol]:
+            stored = self.read(symbol)
+            now = pd.Timestamp.now(tz=None if stored is None else stored.index.tz)
+            start = period_start(period, now)
+
+            if stored is None or not self._covers(stored, start):
+                df = self.provider.history(symbol, period=period)
+                if df.empty:
+                    raise ValueError(f"No data found for symbol {symbol}")
+                stored = self.write(symbol, df, 'max' if start is None else str(start.date()))
+                self.stats['full'] += 1
+            elif not self._is_fresh(symbol):
+                try:
+                    stored = self.refresh(symbol, stored)
+                except Exception as e:
+                    warnings.warn(f"Serving stored history for {symbol}; refresh failed: {e}")
+            else:
+                self.stats['local'] += 1
+        return stored, start
+
+    def company_info(self, symbol):
+        """Company metadata of a symbol; concurrent lookups share one upstream call"""
+        info, _ = self.flights.do((symbol, 'info', None), lambda: self.provider.info(symbol))
+        return dict(info)
+
+    def _download(self, symbols, **request):
+        """{symbol: bars} for a batch; one symbol keeps the per-symbol path"""
+        if len(symbols) == 1:
+            df = self.provider.history(symbols[0], **request)
+            return {} if df.empty else {symbols[0]: df}
+        return self.provider.histories(symbols, **request)
+
+    def _bulk_full(self, symbols, period, covered_from):
+        failed = {}
+        try:
+            frames = self._download(symbols, period=period)
+        except Exception as e:
+            return {symbol: str(e) for symbol in symbols}
+        for symbol in symbols:
+            if symbol not in frames:
+                failed[symbol] = f"No data found for symbol {symbol}"
+                continue
+            with self._locks[symbol]:
+                self.write(symbol, frames[symbol], covered_from)
+            self.stats['full'] += 1
+        return failed
+
+    def _bulk_refresh(self, symbols):
+        stored = {symbol: self.read(symbol) for symbol in symbols}
+        start = min(history.index[-OVERLAP_BARS:][0].date() for history in stored.values())
+        try:
+            frames = self._download(symbols, start=start)
+        except Exception as e:
+            warnings.warn(f"Serving stored history for {len(symbols)} symbols; refresh failed: {e}")
+            return {}
+        for symbol in symbols:
+            with self._locks[symbol]:
+                try:
+                    self.refresh(symbol, stored[symbol], frames.get(symbol, stored[symbol].iloc[:0]))
+                except Exception as e:
+                    warnings.warn(f"Serving stored history for {symbol}; refresh failed: {e}")
+        return {}
+
+    def bulk(self, symbols, period="1y", batch_size=BULK_BATCH_SIZE, workers=BULK_WORKERS):
+        """
+        Bring many symbols' stored history up to date for period.
+
+        Symbols without enough stored history are downloaded, and stale ones are
+        refreshed, batch_size symbols per upstream call with at most `workers`
+        calls in flight. Each symbol's file is written once. A symbol upstream has
+        no data for is reported instead of failing its batch.
+
+        Returns:
+            {symbol: error message} for the symbols that could not be loaded
+        """
+        if period not in PERIODS:
+            raise ValueError(f"Unsupported period '{period}'. Use one of: {', '.join(PERIODS)}")
+        missing, stale = [], []
+        for symbol in dict.fromkeys(symbols):
+            mapped = self.mapped(symbol)
+            start = period_start(period, pd.Timestamp.now(tz=None if mapped is None else mapped.timezone))
+            if mapped is None or not mapped.covers(start):
+                missing.append(symbol)
+            elif not self._is_fresh(symbol):
+                stale.append(symbol)
+            else:
+                self.stats['local'] += 1
+
+        start = period_start(period, pd.Timestamp.now())
+        covered_from = 'max' if start is None else str(start.date())
+        failed = {}
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            jobs = [pool.submit(self._bulk_full, batch, period, covered_from) for batch in _batches(missing, batch_size)]
+            jobs += [pool.submit(self._bulk_refresh, batch) for batch in _batches(stale, batch_size)]
+            for job in jobs:
+                failed.update(job.result())
+        return failed
+
+    def bulk_arrays(self, symbols, period="1y", **options):
+        """Zero-copy OHLCV views of many symbols as ({symbol: MappedOHLCV}, {symbol: error})"""
+        failed = self.bulk(symbols, period, **options)
+        arrays = {}
+        for symbol in dict.fromkeys(symbols):
+            if symbol not in failed:
+                mapped = self.mapped(symbol)
+                arrays[symbol] = mapped.since(period_start(period, pd.Timestamp.now(tz=mapped.timezone)))
+        return arrays, failed
+
+    def is_cached(self, symbol, period="1y"):
+        """Whether history(symbol, period) would be served from disk without asking upstream"""
+        mapped = self.mapped(symbol)
+        if mapped is None:
+            return False
+        return mapped.covers(period_start(period, pd.Timestamp.now(tz=mapped.timezone))) and self._is_fresh(symbol)
+
+    def arrays(self, symbol, period="1y"):
+        """
+        Zero-copy OHLCV views of one symbol over period from its memory-mapped mirror.
+        Falls back to history() to download or refresh first when needed.
+        """
+        if period not in PERIODS:
+            raise ValueError(f"Unsupported period '{period}'. Use one of: {', '.join(PERIODS)}")
+        mapped = self.mapped(symbol)
+        now = pd.Timestamp.now(tz=None if mapped is None else mapped.timezone)
+        start = period_start(period, now)
+        if mapped is None or not mapped.covers(start) or not self._is_fresh(symbol):
+            self.history(symbol, period)
+            mapped = self.mapped(symbol)
+        else:
+            self.stats['local'] += 1
+        return mapped.since(start)
+
+
+def get_price_store():
+    """Return the shared price store, creating it on first use"""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = PriceStore()
+        return _default_store
+
+
+def check_store(days=600):
+    """Delta refreshes must rebuild exactly the history a full download returns"""
+    provider = ReplayProvider(days=days)
+    with tempfile.TemporaryDirectory() as data_dir:
+        store = PriceStore(data_dir, refresh_seconds=0, provider=provider)
+        full = provider.history('TEST.NS', period='2y')
+        # Store all but the last week, as if it had been saved a week ago, then refresh
+        store.write('TEST.NS', full.iloc[:-5], '2000-01-01')
+        provider.stats['bars'] = 0
+        refreshed = store.history('TEST.NS', '2y')
+        problems = []
+        if not refreshed.equals(full):
+            problems.append('delta merge differs from a full download')
+        if provider.stats['bars'] > OVERLAP_BARS + 5:
+            problems.append(f"delta refresh downloaded {provider.stats['bars']} bars")
+        if not store.history('TEST.NS', '6mo').equals(full[full.index >= period_start('6mo', pd.Timestamp.now(tz=full.index.tz))]):
+            problems.append('period slice differs')
+        mapped = store.arrays('TEST.NS', '6mo')
+        if not mapped.frame().equals(store.history('TEST.NS', '6mo')[list(MAPPED_COLUMNS)].astype(np.float64)):
+            problems.append('mapped arrays differ from the Parquet history')
+        return problems
+
+
+def check_corporate_action(days=600):
+    """
+    A split must re-pull only the split symbol and notify subscribers; plain refreshes,
+    and refreshes whose closes differ only by float noise, must not
+    """
+    provider = ReplayProvider(days=days)
+    with tempfile.TemporaryDirectory() as data_dir:
+        store = PriceStore(data_dir, refresh_seconds=0, provider=provider)
+        provider.history('NOISY.NS')
+        noisy = provider.frames['NOISY.NS']
+        noisy['Close'] = np.round(noisy['Close'], 4) + 0.00005
+        for symbol in ('SPLIT.NS', 'PLAIN.NS', 'NOISY.NS'):
+            full = provider.history(symbol, period='2y')
+            store.write(symbol, full.iloc[:-3], '2000-01-01')
+        # Float noise upstream, straddling the 4-decimal rounding boundaries
+        noisy['Close'] *= 1 + 1e-12
+        # A 2:1 split two days ago halves every earlier adjusted price upstream
+        split = provider.frames['SPLIT.NS']
+        split.iloc[:-2, split.columns.get_indexer(['Open', 'High', 'Low', 'Close'])] /= 2
+        notified = []
+        store.subscribe(notified.append)
+        from streaming_indicators import IndicatorStateStore
+        states = IndicatorStateStore()
+        store.subscribe(states.invalidate)
+        for symbol in ('SPLIT.NS', 'PLAIN.NS'):
+            states.warm_up(symbol, store.read(symbol))
+        problems = []
+        if not store.history('SPLIT.NS', '2y').equals(provider.history('SPLIT.NS', period='2y')):
+            problems.append('split symbol not re-pulled')
+        if not store.history('PLAIN.NS', '2y').equals(provider.history('PLAIN.NS', period='2y')):
+            problems.append('plain refresh differs')
+        store.history('NOISY.NS', '2y')
+        if notified != ['SPLIT.NS'] or store.stats['rebased'] != 1:
+            problems.append(f"rebased {store.stats['rebased']} symbols, notified {notified}")
+        if list(states.states) != ['PLAIN.NS']:
+            problems.append(f"indicator states left after the split: {list(states.states)}")
+        return problems
+
+
+def check_single_flight(callers=20, latency=0.2):
+    """Concurrent requests for one symbol must share a single upstream download and info lookup"""
+    provider = ReplayProvider(latency=latency)
+    with tempfile.TemporaryDirectory() as data_dir:
+        store = PriceStore(data_dir, refresh_seconds=3600, provider=provider)
+        with ThreadPoolExecutor(callers) as pool:
+            frames = list(pool.map(lambda _: store.history('HOT.NS', '1y'), range(callers)))
+            infos = list(pool.map(lambda _: store.company_info('HOT.NS'), range(callers)))
+        problems = []
+        if provider.stats['calls'] != 2:
+            problems.append(f"{provider.stats['calls']} upstream calls for one symbol's history and info")
+        if not all(frame.equals(frames[0]) for frame in frames) or len({id(frame) for frame in frames}) != callers:
+            problems.append('callers did not get equal, separate frames')
+        if any(info != infos[0] for info in infos):
+            problems.append('callers got different company info')
+        # Wait times are only kept for the most recently requested keys
+        flights = SingleFlight()
+        for i in range(FLIGHT_METRIC_KEYS + 10):
+            flights.do(('SYM', i), lambda: None)
+        flights.do(('SYM', 0), lambda: None)
+        keys = [tuple(entry['key']) for entry in flights.metrics()]
+        if len(keys) != FLIGHT_METRIC_KEYS or keys[-1] != ('SYM', 0) or ('SYM', 1) in keys:
+            problems.append(f"{len(keys)} keys kept in single-flight metrics")
+        return problems, store.flights.metrics()
+
+
+def check_bulk(symbols=120, days=600):
+    """Bulk loads must match per-symbol downloads, report bad symbols and refresh in batches"""
+    provider = ReplayProvider(days=days)
+    names = [f'SYM{i}.NS' for i in range(symbols)] + ['BAD1.NS']
+    # A delisted ticker: upstream has no bars for it
+    provider.frames['BAD1.NS'] = provider.history(names[0], period='1y').iloc[:0]
+    problems = []
+    with tempfile.TemporaryDirectory() as data_dir:
+        store = PriceStore(data_dir, refresh_seconds=3600, provider=provider)
+        # Half the symbols were stored a week ago by the per-symbol path and are now stale
+        for symbol in names[:symbols // 2]:
+            store.write(symbol, provider.history(symbol, period='2y').iloc[:-5], '2000-01-01')
+            os.utime(store.path(symbol), (0, 0))
+        provider.stats['calls'] = 0
+        arrays, failed = store.bulk_arrays(names, '2y', batch_size=25)
+        if list(failed) != ['BAD1.NS'] or len(arrays) != symbols:
+            problems.append(f"{len(arrays)} loaded, failed: {list(failed)}")
+        expected_calls = len(_batches(names[:symbols // 2], 25)) + len(_batches(names[symbols // 2:], 25))
+        if provider.stats['calls'] != expected_calls:
+            problems.append(f"{provider.stats['calls']} upstream calls, expected {expected_calls}")
+        for symbol, mapped in arrays.items():
+            full = provider.history(symbol, period='2y')
+            if not np.array_equal(mapped['Close'], full['Close'].to_numpy()):
+                problems.append(f'{symbol} differs from a per-symbol download')
+                break
+        # A later per-symbol refresh of a bulk-written (tz-naive) file keeps it consistent
+        store.refresh_seconds = 0
+        if not store.history(names[-2], '2y').equals(provider.history(names[-2], period='2y').tz_localize(None)):
+            problems.append('per-symbol refresh of a bulk-written file differs')
+    return problems
+
+
+def benchmark(symbols=20, latency=0.3):
+    """Time upstream downloads (with simulated network latency) against local reads"""
+    provider = ReplayProvider(latency=latency)
+    with tempfile.TemporaryDirectory() as data_dir:
+        store = PriceStore(data_dir, refresh_seconds=3600, provider=provider)
+        names = [f'SYM{i}.NS' for i in range(symbols)]
+        timings = {}
+        for label, read in (('download', store.history), ('local', store.history), ('mapped', store.arrays)):
+            start = time.perf_counter()
+            for symbol in names:
+                read(symbol, '1y')
+            timings[label] = (time.perf_counter() - start) / symbols
+
+    print(f"1y history for {symbols} symbols ({latency * 1000:.0f} ms simulated upstream latency):")
+    print(f"  first request (download + write): {timings['download'] * 1000:8.1f} ms per symbol")
+    print(f"  later requests (local Parquet):    {timings['local'] * 1000:8.1f} ms per symbol")
+    print(f"  memory-mapped arrays:              {timings['mapped'] * 1000:8.3f} ms per symbol")
+    provider = ReplayProvider(latency=latency)
+    with tempfile.TemporaryDirectory() as data_dir:
+        store = PriceStore(data_dir, refresh_seconds=3600, provider=provider)
+        start = time.perf_counter()
+        store.bulk_arrays([f'BULK{i}.NS' for i in range(symbols * 10)], '1y')
+        bulk = (time.perf_counter() - start) / (symbols * 10)
+    print(f"  bulk download of {symbols * 10} symbols:    {bulk * 1000:8.1f} ms per symbol")
+    print(f"  delta refresh check: {'ok' if not check_store() else 'FAIL'}")
+    print(f"  corporate action check: {'ok' if not check_corporate_action() else 'FAIL'}")
+    print(f"  bulk download check: {'ok' if not check_bulk() else 'FAIL'}")
+    problems, metrics = check_single_flight()
+    print(f"  single-flight check ({metrics[0]['calls']} concurrent callers): {'ok' if not problems else 'FAIL'}")
+    for row in metrics:
+        print(f"    {' '.join(str(part) for part in row['key'] if part is not None):14s} "
+              f"{row['shared']:3d} coalesced, wait avg {row['avg_wait_ms']:6.1f} ms, max {row['max_wait_ms']:6.1f} ms")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,230 @@
+# screener.py
+
+import os
+import re
+import time
+import numpy as np
+import pandas as pd
+from scipy import stats
+from scipy.stats import norm
+from indicators import TRADING_DAYS, compute_indicator_matrix, align_ohlcv, _first_valid, _fill_forward_backward
+from backtesting import RISK_FREE_RATE
+from financial_narrative_generator import ConfidenceScorer
+from price_store import get_price_store
+
+MAX_SCREENER_SYMBOLS = 1000
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# Watchlists are <name>.csv files here, with a 'Symbol' column or one symbol per line
+WATCHLIST_DIR = os.environ.get('WATCHLIST_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'watchlists'))
+
+SCORE_COLUMNS = (
+    ('overall_confidence', 'technical_confidence', 'statistical_confidence', 'market_confidence')
+    + tuple(ConfidenceScorer.TECHNICAL_WEIGHTS)
+    + tuple(ConfidenceScorer.STATISTICAL_WEIGHTS)
+    + tuple(ConfidenceScorer.MARKET_WEIGHTS)
+)
+
+_FILLED_COLUMNS = ('50_MA', '200_MA', '20_EMA', 'RSI', 'MACD', 'MACD_Histogram', 'ADX',
+                   'Volatility', 'Daily_Return', 'Signal')
+
+
+def load_watchlist(name):
+    """Symbols of a watchlist (e.g. an index's constituents) saved in WATCHLIST_DIR"""
+    if not re.fullmatch(r'[A-Za-z0-9_-]+', name):
+        raise ValueError("Watchlist names may only contain letters, digits, '_' and '-'")
+    path = os.path.join(WATCHLIST_DIR, f"{name}.csv")
+    if not os.path.exists(path):
+        raise ValueError(f"Unknown watchlist '{name}'")
+    table = pd.read_csv(path)
+    if 'Symbol' not in table.columns:
+        table = pd.read_csv(path, header=None, names=['Symbol'], usecols=[0])
+    return list(dict.fromkeys(table['Symbol'].dropna().astype(str).str.strip()))
+
+
+def batch_confidence(high, low, close, volume, scorer=None, forecast_days=TRADING_DAYS,
+                     risk_free_rate=RISK_FREE_RATE):
+    """
+    ConfidenceScorer's scores for every symbol at once from aligned (symbols x days)
+    OHLCV arrays.
+
+    Technical and market scores follow calculate_technical_confidence and
+    calculate_market_confidence on each symbol's filled history, with the
+    backtest metrics computed for all symbols together. Statistical scores use
+    the closed-form terminal distribution of the GBM model that the Monte Carlo
+    simulation samples, and the skewness test is run on historical log returns.
+
+    Returns:
+        (symbols, len(SCORE_COLUMNS)) float64 array
+    """
+    scorer = scorer or ConfidenceScorer()
+    close = np.atleast_2d(np.asarray(close, dtype=np.float64))
+    volume = np.atleast_2d(np.asarray(volume, dtype=np.float64))
+    matrix = compute_indicator_matrix(high, low, close, volume)
+    starts = _first_valid(close)
+    bars = close.shape[1] - starts
+    ind = {column: _fill_forward_backward(matrix[column], starts) for column in _FILLED_COLUMNS}
+    last = {column: values[:, -1] for column, values in ind.items()}
+    scores = {}
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # Technical
+        scores['trend_agreement'] = ((last['50_MA'] > last['200_MA']) == (last['20_EMA'] > last['50_MA'])).astype(np.float64)
+        scores['rsi_confidence'] = 1 - np.abs(50 - last['RSI']) / 50
+        macd_signal_ratio = np.abs(last['MACD_Histogram'] / last['MACD'])
+        scores['macd_strength'] = np.where(np.isnan(macd_signal_ratio), 0.5, np.minimum(macd_signal_ratio, 1))
+        scores['trend_strength'] = np.minimum(last['ADX'] / 50, 1)
+        vol_avg = np.where(bars >= 20, volume[:, -20:].mean(axis=1), np.nan)
+        scores['volume_confidence'] = np.minimum(volume[:, -1] / vol_avg, 1.5) / 1.5
+
+        # Statistical: GBM over forecast_days from each symbol's daily log-return drift and volatility
+        log_returns = np.diff(np.log(close), axis=1)
+        mu = np.nanmean(log_returns, axis=1)
+        sigma = np.nanstd(log_returns, axis=1, ddof=1)
+        drift, spread = mu * forecast_days, sigma * np.sqrt(forecast_days)
+        # Rows are NaN only before their listing, so test symbols sharing a start together
+        p_value = np.full(len(close), np.nan)
+        for start in np.unique(starts):
+            rows = starts == start
+            if log_returns.shape[1] - start >= 8:
+                p_value[rows] = stats.skewtest(log_returns[rows, start:], axis=1).pvalue
+        scores['skewness'] = np.where(np.isnan(p_value), 0.5, np.minimum(p_value, 0.05) / 0.05)
+        return_volatility = np.sqrt(np.expm1(spread ** 2) * np.exp(2 * drift + spread ** 2))
+        scores['volatility'] = np.maximum(1 - np.minimum(return_volatility, 0.5) / 0.5, 0)
+        var_95 = np.expm1(drift + spread * norm.ppf(0.05))
+        var_99 = np.expm1(drift + spread * norm.ppf(0.01))
+        scores['var_confidence'] = np.minimum(np.abs(var_95 / var_99), 1)
+        band = spread * norm.ppf(0.95)
+        interval_width = (np.exp(drift + band) - np.exp(drift - band)) / np.exp(drift + spread ** 2 / 2)
+        scores['interval_confidence'] = np.maximum(1 - interval_width, 0)
+
+        # Market: backtest of each symbol's Signal over its listed days only
+        positions = np.nan_to_num(ind['Signal'])
+        strategy_returns = np.zeros_like(close)
+        strategy_returns[:, 1:] = positions[:, :-1] * ind['Daily_Return'][:, 1:]
+        strategy_returns[np.arange(close.shape[1]) < starts[:, None]] = np.nan
+        total_return = np.nanprod(1 + strategy_returns, axis=1) - 1
+        market_return = np.nanprod(1 + ind['Daily_Return'], axis=1) - 1
+        sharpe_ratio = (total_return - risk_free_rate) / (np.nanstd(strategy_returns, axis=1, ddof=1) * np.sqrt(TRADING_DAYS))
+        win_rate = (strategy_returns > 0).sum(axis=1) / ((strategy_returns != 0) & ~np.isnan(strategy_returns)).sum(axis=1)
+        scores['sharpe_ratio'] = np.maximum(np.minimum(sharpe_ratio / 3, 1), 0)
+        scores['win_rate'] = win_rate
+        max_volatility = np.where(bars >= TRADING_DAYS, ind['Volatility'][:, -TRADING_DAYS:].max(axis=1), np.nan)
+        scores['market_stability'] = 1 - last['Volatility'] / max_volatility
+        scores['excess_return'] = np.maximum(np.minimum((total_return - market_return) / 0.2, 1), 0)
+
+    result = np.empty((close.shape[0], len(SCORE_COLUMNS)))
+    components = (
+        ('technical_confidence', scorer.TECHNICAL_WEIGHTS, scorer.weight_technical),
+        ('statistical_confidence', scorer.STATISTICAL_WEIGHTS, scorer.weight_statistical),
+        ('market_confidence', scorer.MARKET_WEIGHTS, scorer.weight_market)
+    )
+    overall = 0
+    for component, weights, weight in components:
+        score = sum(scores[key] * w for key, w in weights.items())
+        result[:, SCORE_COLUMNS.index(component)] = score
+        overall = overall + score * weight
+    result[:, 0] = overall
+    for key, values in scores.items():
+        result[:, SCORE_COLUMNS.index(key)] = values
+    return result
+
+
+class ConfidenceScreener:
+    """Rank a universe of symbols by ConfidenceScorer's overall confidence"""
+
+    def __init__(self, symbols, scorer=None):
+        if not symbols:
+            raise ValueError("At least one symbol is required")
+        if len(symbols) > MAX_SCREENER_SYMBOLS:
+            raise ValueError(f"The screener takes at most {MAX_SCREENER_SYMBOLS} symbols")
+        self.symbols = list(dict.fromkeys(symbols))
+        self.scorer = scorer or ConfidenceScorer()
+
+    def fetch_ohlcv(self, period="1y"):
+        """Fetch every symbol's history in bulk; returns ({symbol: MappedOHLCV}, {symbol: error})"""
+        frames = {}
+        arrays, failed = get_price_store().bulk_arrays(self.symbols, period)
+        for symbol, history in arrays.items():
+            if len(history) < 3:
+                failed[symbol] = f"No data found for symbol {symbol}"
+            else:
+                frames[symbol] = history
+        return frames, failed
+
+    def score(self, frames, sort_by='overall_confidence'):
+        """One row of scores per symbol, best first"""
+        if sort_by not in SCORE_COLUMNS:
+            raise ValueError(f"sort_by must be one of: {', '.join(SCORE_COLUMNS)}")
+        symbols, _, high, low, close, volume = align_ohlcv(frames)
+        table = pd.DataFrame(batch_confidence(high, low, close, volume, self.scorer), columns=SCORE_COLUMNS)
+        table.insert(0, 'symbol', symbols)
+        table['interpretation'] = table['overall_confidence'].map(self.scorer.get_confidence_interpretation)
+        table = table.sort_values(sort_by, ascending=False, na_position='last', kind='stable').reset_index(drop=True)
+        table.insert(0, 'rank', np.arange(1, len(table) + 1))
+        return table
+
+
+def paginate(table, page=1, page_size=DEFAULT_PAGE_SIZE):
+    """Slice a ranked table into a page; returns (rows, page count)"""
+    pages = max(-(-len(table) // page_size), 1)
+    return table.iloc[(page - 1) * page_size:page * page_size], pages
+
+
+def _filled_history(df):
+    """A symbol's history with indicators, filled the way fetch_historical_data fills it"""
+    from indicators import indicator_frame
+    return pd.concat([df, indicator_frame(df)], axis=1).ffill().bfill().fillna(0)
+
+
+def check_parity(symbols=20, days=TRADING_DAYS + 60, atol=1e-9):
+    """Batch technical and market scores must match ConfidenceScorer run per symbol"""
+    from indicators import _synthetic_universe
+    from backtesting import backtest_metrics
+    frames = _synthetic_universe(symbols, days)
+    names, _, high, low, close, volume = align_ohlcv(frames)
+    batch = batch_confidence(high, low, close, volume)
+    scorer = ConfidenceScorer()
+    mismatched = []
+    for i, symbol in enumerate(names):
+        data = _filled_history(frames[symbol])
+        metrics = backtest_metrics(data['Signal'].to_numpy(), data['Daily_Return'].to_numpy())
+        technical, technical_breakdown = scorer.calculate_technical_confidence(data)
+        market, market_breakdown = scorer.calculate_market_confidence(data, metrics)
+        expected = {'technical_confidence': technical, 'market_confidence': market,
+                    **technical_breakdown, **market_breakdown}
+        for key, value in expected.items():
+            if not np.isclose(batch[i, SCORE_COLUMNS.index(key)], value, atol=atol, equal_nan=True):
+                mismatched.append((symbol, key))
+    return mismatched
+
+
+def benchmark(symbols=500, days=TRADING_DAYS):
+    """Time a batch screen against scoring symbols one by one (without their Monte Carlo runs)"""
+    from indicators import _synthetic_universe
+    from backtesting import backtest_metrics
+    frames = _synthetic_universe(symbols, days)
+    screener = ConfidenceScreener(list(frames))
+    start = time.perf_counter()
+    table = screener.score(frames)
+    batched = time.perf_counter() - start
+
+    sample = list(frames)[:25]
+    start = time.perf_counter()
+    for symbol in sample:
+        data = _filled_history(frames[symbol])
+        metrics = backtest_metrics(data['Signal'].to_numpy(), data['Daily_Return'].to_numpy())
+        screener.scorer.calculate_technical_confidence(data)
+        screener.scorer.calculate_market_confidence(data, metrics)
+    looped = (time.perf_counter() - start) * symbols / len(sample)
+
+    print(f"Confidence screen of {symbols} symbols x {days} days:")
+    print(f"  per symbol (technical + market only, extrapolated): {looped * 1000:9.1f} ms")
+    print(f"  batch (all components):                             {batched * 1000:9.1f} ms")
+    print(f"  top symbol: {table['symbol'].iloc[0]} ({table['overall_confidence'].iloc[0]:.3f})")
+    print(f"  parity: {'ok' if not check_parity() else 'FAIL'}")
+
+
+if __name__ == "__main__":
+    benchmark()
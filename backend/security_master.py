@@ -0,0 +1,299 @@
+# security_master.py
+
+import os
+import re
+import time
+import threading
+import numpy as np
+import pandas as pd
+
+# Company metadata table (CSV or Parquet) loaded once per process and re-read when the file changes
+SECURITY_MASTER_PATH = os.environ.get(
+    'SECURITY_MASTER_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'securities.csv')
+)
+
+MASTER_COLUMNS = ('Symbol', 'Name', 'Exchange', 'Sector', 'Industry', 'MarketCap', 'Currency')
+# yfinance .info key for each column
+INFO_KEYS = {
+    'Name': 'longName', 'Exchange': 'exchange', 'Sector': 'sector', 'Industry': 'industry',
+    'MarketCap': 'marketCap', 'Currency': 'currency'
+}
+
+DEFAULT_SEARCH_LIMIT = 10
+MAX_SEARCH_LIMIT = 50
+# Fuzzy matches must contain at least this share of the query's trigrams; shorter
+# queries than MIN_FUZZY_LENGTH only match by prefix
+MIN_SIMILARITY = 0.5
+MIN_FUZZY_LENGTH = 4
+
+_default_master = None
+_default_master_lock = threading.Lock()
+
+
+def _normalize(text):
+    return re.sub(r'[^a-z0-9]+', ' ', str(text).lower()).strip()
+
+
+def _trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class PrefixTrie:
+    """Maps every prefix of the inserted keys to the ids stored under them"""
+
+    def __init__(self):
+        self.root = {}
+
+    def insert(self, key, item):
+        """Add item under every prefix of key; items keep their insertion order"""
+        node = self.root
+        for char in key:
+            node = node.setdefault(char, {})
+            items = node.setdefault(None, [])
+            if not items or items[-1] != item:
+                items.append(item)
+
+    def find(self, prefix):
+        node = self.root
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                return []
+        return node.get(None, [])
+
+
+class SecurityMaster:
+    """
+    Company metadata for symbol lookups and search, held in memory.
+
+    Symbols and every word of a company name go into prefix tries, symbols without
+    their exchange suffix into an exact-match map, and symbol and name trigrams into
+    an inverted index for typo-tolerant matching. Neither lookup nor search touches
+    the network.
+    """
+
+    def __init__(self, table):
+        missing = set(MASTER_COLUMNS[:2]) - set(table.columns)
+        if missing:
+            raise ValueError(f"Security master is missing columns: {', '.join(sorted(missing))}")
+        table = table.reindex(columns=MASTER_COLUMNS).drop_duplicates('Symbol', keep='last')
+        self.table = table.reset_index(drop=True)
+        self.symbols = self.table['Symbol'].astype(str).str.upper().tolist()
+        self._rows = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self._records = [
+            {column: None if pd.isna(value) else getattr(value, 'item', lambda: value)()
+             for column, value in zip(MASTER_COLUMNS, row)}
+            for row in self.table.itertuples(index=False)
+        ]
+        self._names = self.table['Name'].fillna('').astype(str).tolist()
+        market_cap = pd.to_numeric(self.table['MarketCap'], errors='coerce').fillna(0).to_numpy()
+        # Within a match kind, larger companies come first, then symbols alphabetically.
+        # Indexing rows in that order keeps every trie node's list ranked.
+        ranking = np.lexsort((self.symbols, -market_cap))
+        self._order = np.empty(len(self.table), dtype=np.int64)
+        self._order[ranking] = np.arange(len(self.table))
+
+        self._exact, self._symbol_trie, self._name_trie = {}, PrefixTrie(), PrefixTrie()
+        self._trigrams = {}
+        for i in ranking.tolist():
+            symbol, name = self.symbols[i], _normalize(self._names[i])
+            base = _normalize(symbol.split('.')[0])
+            self._exact.setdefault(base.replace(' ', ''), []).append(i)
+            self._symbol_trie.insert(_normalize(symbol).replace(' ', ''), i)
+            for word in dict.fromkeys(name.split()):
+                self._name_trie.insert(word, i)
+            for gram in _trigrams(base) | _trigrams(name):
+                self._trigrams.setdefault(gram, []).append(i)
+        self._trigrams = {gram: np.array(rows, dtype=np.int64) for gram, rows in self._trigrams.items()}
+
+    @classmethod
+    def load(cls, path=None):
+        """Read the table from a .csv or .parquet file"""
+        path = path or SECURITY_MASTER_PATH
+        if path.endswith('.parquet'):
+            return cls(pd.read_parquet(path))
+        return cls(pd.read_csv(path, keep_default_na=False, na_values=['']))
+
+    def __len__(self):
+        return len(self.table)
+
+    def lookup(self, symbol):
+        """Metadata of a symbol as {column: value} (missing values as None), or None if unknown"""
+        row = self._rows.get(str(symbol).upper())
+        if row is None:
+            return None
+        return dict(self._records[row])
+
+    def search(self, query, limit=DEFAULT_SEARCH_LIMIT):
+        """
+        Securities matching query, best first: exact symbols, then symbol prefixes,
+        then company-name word prefixes, then fuzzy (trigram) matches. Each row is
+        as returned by lookup().
+        """
+        text = _normalize(query)
+        if not text:
+            return []
+        key, words = text.replace(' ', ''), text.split()
+        found = self._exact.get(key, []) + self._symbol_trie.find(key)[:limit]
+        if len(words) == 1:
+            found += self._name_trie.find(words[0])[:limit]
+        else:
+            # Every query word must start a word of the name
+            named = set(self._name_trie.find(words[0])).intersection(*(self._name_trie.find(word) for word in words[1:]))
+            found += sorted(named, key=self._order.__getitem__)[:limit]
+        found = list(dict.fromkeys(found))[:limit]
+
+        if len(found) < limit and len(key) >= MIN_FUZZY_LENGTH:
+            grams = _trigrams(text)
+            postings = [self._trigrams[gram] for gram in grams if gram in self._trigrams]
+            shared = np.bincount(np.concatenate(postings), minlength=len(self)) if postings else np.zeros(len(self))
+            shared[found] = 0
+            candidates = np.flatnonzero(shared >= MIN_SIMILARITY * len(grams))
+            best = candidates[np.lexsort((self._order[candidates], -shared[candidates]))]
+            found += best[:limit - len(found)].tolist()
+        return [dict(self._records[i]) for i in found]
+
+
+def get_security_master():
+    """
+    Return the shared security master, re-reading SECURITY_MASTER_PATH after it
+    changes. If the file is missing or unreadable, the last table loaded is kept,
+    or an empty one is used until the file appears.
+    """
+    global _default_master
+    with _default_master_lock:
+        modified = None
+        try:
+            modified = os.path.getmtime(SECURITY_MASTER_PATH)
+            if _default_master is None or _default_master[0] != modified:
+                _default_master = (modified, SecurityMaster.load(SECURITY_MASTER_PATH))
+        except (OSError, ValueError) as e:
+            # Remember the failed version so it is neither retried nor reported again until it changes
+            if _default_master is None or _default_master[0] != modified:
+                print(f"Error loading security master from {SECURITY_MASTER_PATH}: {str(e)}")
+                master = _default_master[1] if _default_master else SecurityMaster(pd.DataFrame(columns=MASTER_COLUMNS))
+                _default_master = (modified, master)
+        return _default_master[1]
+
+
+def company_metadata(symbol, fetch_info=None):
+    """
+    Security master row of a symbol, or for symbols not in the table the upstream
+    company info in the same columns (None where unknown, or everywhere if the
+    fetch fails)
+    """
+    row = get_security_master().lookup(symbol)
+    if row is not None:
+        return row
+    if fetch_info is None:
+        from price_store import get_price_store
+        fetch_info = get_price_store().company_info
+    try:
+        info = fetch_info(symbol)
+    except Exception:
+        info = {}
+    return {'Symbol': symbol, **{column: info.get(key) for column, key in INFO_KEYS.items()}}
+
+
+def build_security_master(symbols, path=None, fetch_info=None):
+    """
+    Refresh the table file from upstream company info for symbols, keeping rows
+    of symbols not listed. Run offline, e.g. nightly; requests only read the file.
+
+    Returns:
+        {symbol: error message} for symbols whose info could not be fetched
+    """
+    if fetch_info is None:
+        from price_store import get_price_store
+        fetch_info = get_price_store().company_info
+    path = path or SECURITY_MASTER_PATH
+    rows, failed = [], {}
+    for symbol in dict.fromkeys(symbols):
+        try:
+            info = fetch_info(symbol)
+        except Exception as e:
+            failed[symbol] = str(e)
+            continue
+        rows.append({'Symbol': symbol, **{column: info.get(key) for column, key in INFO_KEYS.items()}})
+
+    table = pd.DataFrame(rows, columns=MASTER_COLUMNS)
+    if os.path.exists(path):
+        table = pd.concat([SecurityMaster.load(path).table, table])
+    table = SecurityMaster(table).table.sort_values('Symbol')
+    temporary = f"{path}.tmp"
+    if path.endswith('.parquet'):
+        table.to_parquet(temporary, index=False)
+    else:
+        table.to_csv(temporary, index=False)
+    os.replace(temporary, path)
+    return failed
+
+
+def _synthetic_master(securities):
+    """A table of random made-up companies, for benchmarks"""
+    rng = np.random.default_rng(0)
+    letters = np.array(list('ABCDEFGHIJKLMNOPQRSTUVWXYZ'))
+    words = ['Alpha', 'Bharat', 'Capital', 'Digital', 'Energy', 'Finance', 'Global', 'Holdings',
+             'Industries', 'Infra', 'Motors', 'Pharma', 'Power', 'Steel', 'Systems', 'Textiles']
+    symbols = {''.join(rng.choice(letters, rng.integers(3, 10))) + '.NS' for _ in range(securities)}
+    return pd.DataFrame({
+        'Symbol': sorted(symbols),
+        'Name': [' '.join(rng.choice(words, 3)) + ' Limited' for _ in symbols],
+        'Exchange': 'NSI',
+        'MarketCap': rng.lognormal(25, 2, len(symbols)),
+        'Currency': 'INR'
+    })
+
+
+def check_search(master=None):
+    """The bundled table must answer symbol, name and misspelled queries sensibly"""
+    master = master or SecurityMaster.load()
+    expectations = {
+        'RELIANCE': 'RELIANCE.NS', 'reli': 'RELIANCE.NS', 'tcs': 'TCS.NS', 'hdfc bank': 'HDFCBANK.NS',
+        'consultancy': 'TCS.NS', 'relaince': 'RELIANCE.NS', 'infosis': 'INFY.NS', 'M&M': 'M&M.NS',
+        'aapl': 'AAPL', 'irctc': 'IRCTC.NS', 'railway': 'IRCTC.NS',
+        # Symbol prefix matches rank by market cap, not alphabetically
+        'tata': 'TATAMOTORS.NS'
+    }
+    problems = []
+    for query, expected in expectations.items():
+        results = master.search(query)
+        if not results or results[0]['Symbol'] != expected:
+            problems.append(f"'{query}' -> {[row['Symbol'] for row in results[:3]]}, expected {expected}")
+    if master.lookup('infy.ns')['Name'] != 'Infosys Limited' or master.lookup('NOPE.NS') is not None:
+        problems.append('lookup by symbol failed')
+    return problems
+
+
+def benchmark(securities=20000, queries=2000):
+    """Time index build and search over a large made-up table"""
+    table = _synthetic_master(securities)
+    start = time.perf_counter()
+    master = SecurityMaster(table)
+    built = time.perf_counter() - start
+
+    rng = np.random.default_rng(1)
+    rows = lambda: (master._names[i] for i in rng.integers(0, len(master), queries))
+    samples = {
+        'symbol prefix': [master.symbols[i][:rng.integers(2, 5)] for i in rng.integers(0, len(master), queries)],
+        'name prefix': [name.split()[rng.integers(0, 3)][:5].lower() for name in rows()],
+        # One letter dropped
+        'misspelled name': [name[:3] + name[4:12] for name in rows()]
+    }
+    timings = {}
+    for kind, queries_of_kind in samples.items():
+        start = time.perf_counter()
+        for query in queries_of_kind:
+            master.search(query)
+        timings[kind] = (time.perf_counter() - start) / len(queries_of_kind)
+
+    print(f"Security master of {len(master)} securities:")
+    print(f"  build: {built * 1000:10.1f} ms")
+    for kind, seconds in timings.items():
+        print(f"  search, {kind + ':':17s}{seconds * 1e6:8.1f} us per query")
+    print(f"  bundled table check: {'ok' if not check_search() else 'FAIL'}")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,428 @@
+# streaming_indicators.py
+
+import math
+import operator
+import time
+import threading
+from collections import deque
+import numpy as np
+from indicators import INDICATOR_COLUMNS, TRADING_DAYS, compute_indicators, synthetic_ohlcv
+
+NAN = float('nan')
+
+_default_states = None
+_default_states_lock = threading.Lock()
+
+
+def _divide(a, b):
+    """Float division with NumPy's zero-division results (inf or NaN) instead of an exception"""
+    if b == 0:
+        return NAN if a == 0 or a != a else math.copysign(math.inf, a)
+    return a / b
+
+
+class EMA:
+    """Recursive EMA (pandas ewm(adjust=False)); leading NaNs are skipped"""
+
+    def __init__(self, span=None, alpha=None, min_periods=0):
+        self.alpha = 2 / (span + 1) if alpha is None else alpha
+        self.min_periods = min_periods
+        self.value = NAN
+        self.count = 0
+
+    def update(self, x):
+        if x != x:
+            return self.current
+        self.value = x if self.count == 0 else self.value + self.alpha * (x - self.value)
+        self.count += 1
+        return self.current
+
+    @property
+    def current(self):
+        return self.value if self.count >= max(self.min_periods, 1) else NAN
+
+    def snapshot(self):
+        return {'alpha': self.alpha, 'min_periods': self.min_periods, 'value': self.value, 'count': self.count}
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        ema = cls(alpha=snapshot['alpha'], min_periods=snapshot['min_periods'])
+        ema.value, ema.count = snapshot['value'], snapshot['count']
+        return ema
+
+
+class RollingWindow:
+    """
+    Fixed-size ring buffer with running sums for O(1) mean/std. NaN slots count
+    towards the window but not towards min_periods, as with pandas rolling().
+    Sums are resynchronised from the buffer once per lap to stop rounding drift,
+    and a window of identical values reports exactly zero deviation. With
+    extrema=True, monotonic deques of (push number, value) give amortised O(1)
+    max/min; otherwise those scan the buffer.
+    """
+
+    def __init__(self, window, min_periods=None, extrema=False):
+        self.window = window
+        self.min_periods = window if min_periods is None else min_periods
+        self.extrema = extrema
+        self.buffer = [NAN] * window
+        self.position = 0
+        self.count = 0
+        self.offset = NAN
+        self.sum = 0.0
+        self.sumsq = 0.0
+        self.run = 0
+        self.pushes = 0
+        self.maxima = deque()
+        self.minima = deque()
+
+    def push(self, x):
+        old = self.buffer[self.position]
+        if old == old:
+            self._accumulate(old, -1)
+        if x == x:
+            if self.offset != self.offset:
+                self.offset = x
+            self._accumulate(x, 1)
+            self.run = self.run + 1 if x == self.buffer[self.position - 1] else 1
+        else:
+            self.run = 0
+        self.buffer[self.position] = x
+        self.position = (self.position + 1) % self.window
+        if self.extrema:
+            self._track(x)
+        if self.position == 0:
+            self._resync()
+
+    def _track(self, x):
+        self.pushes += 1
+        expired = self.pushes - self.window
+        for extremes, beaten in ((self.maxima, operator.le), (self.minima, operator.ge)):
+            if x == x:
+                while extremes and beaten(extremes[-1][1], x):
+                    extremes.pop()
+                extremes.append((self.pushes, x))
+            if extremes and extremes[0][0] <= expired:
+                extremes.popleft()
+
+    def _accumulate(self, x, sign):
+        centered = x - self.offset
+        self.sum += sign * centered
+        self.sumsq += sign * centered * centered
+        self.count += sign
+
+    def _resync(self):
+        values = [value for value in self.buffer if value == value]
+        self.count = len(values)
+        self.offset = values[-1] if values else NAN
+        self.sum = math.fsum(value - self.offset for value in values)
+        self.sumsq = math.fsum((value - self.offset) ** 2 for value in values)
+
+    @property
+    def ready(self):
+        return self.count >= max(self.min_periods, 1)
+
+    def mean(self):
+        return self.offset + self.sum / self.count if self.ready else NAN
+
+    def std(self, ddof=1):
+        if not self.ready or self.count <= ddof:
+            return NAN
+        if self.run >= self.count:
+            return 0.0
+        variance = (self.sumsq - self.sum * self.sum / self.count) / (self.count - ddof)
+        return max(variance, 0.0) ** 0.5
+
+    def max(self):
+        if not self.ready:
+            return NAN
+        return self.maxima[0][1] if self.extrema else max(value for value in self.buffer if value == value)
+
+    def min(self):
+        if not self.ready:
+            return NAN
+        return self.minima[0][1] if self.extrema else min(value for value in self.buffer if value == value)
+
+    def snapshot(self):
+        return {
+            'window': self.window, 'min_periods': self.min_periods, 'extrema': self.extrema,
+            'buffer': list(self.buffer), 'position': self.position, 'run': self.run
+        }
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        rolling = cls(snapshot['window'], snapshot['min_periods'], snapshot.get('extrema', False))
+        rolling.buffer = [float(value) for value in snapshot['buffer']]
+        rolling.position = snapshot['position']
+        rolling.run = snapshot['run']
+        rolling._resync()
+        if rolling.extrema:
+            # Replay the buffer oldest first; one push per slot expires nothing still held
+            for value in rolling.buffer[rolling.position:] + rolling.buffer[:rolling.position]:
+                rolling._track(value)
+        return rolling
+
+
+class IndicatorState:
+    """
+    Per-symbol streaming counterpart of indicators.compute_indicators. Each update
+    advances every indicator by one bar in O(1) and returns the latest row; once
+    warmed up on history the values match the batch engine.
+    """
+
+    EMAS = {
+        'ema_20': {'span': 20, 'min_periods': 20},
+        'ema_12': {'span': 12, 'min_periods': 12},
+        'ema_26': {'span': 26, 'min_periods': 26},
+        'macd_signal': {'span': 9, 'min_periods': 9},
+        'gain': {'alpha': 1 / 14, 'min_periods': 14},
+        'loss': {'alpha': 1 / 14, 'min_periods': 14}
+    }
+    WINDOWS = {
+        'ma_50': (50, 1), 'ma_200': (200, 1),
+        'low_14': (14, 14, True), 'high_14': (14, 14, True), 'stoch_k': (3, 3),
+        'bollinger': (20, 20), 'channel_high': (20, 1, True), 'channel_low': (20, 1, True),
+        'returns': (20, 1), 'tr': (14, 1), 'plus_dm': (14, 1), 'minus_dm': (14, 1), 'dx': (14, 1)
+    }
+    SCALARS = ('prev_high', 'prev_low', 'prev_close', 'obv', 'adi', 'last_dx', 'pending_dx', 'bars')
+
+    def __init__(self):
+        self.emas = {name: EMA(**params) for name, params in self.EMAS.items()}
+        self.windows = {name: RollingWindow(*params) for name, params in self.WINDOWS.items()}
+        self.prev_high = self.prev_low = self.prev_close = NAN
+        self.obv = self.adi = 0.0
+        self.last_dx = NAN
+        self.pending_dx = 0
+        self.bars = 0
+        self.latest = {}
+
+    @classmethod
+    def from_history(cls, df):
+        """Warm up a state on an OHLCV history"""
+        state = cls()
+        for high, low, close, volume in zip(*(df[column].to_numpy(dtype=np.float64)
+                                              for column in ('High', 'Low', 'Close', 'Volume'))):
+            state.update(high, low, close, volume)
+        return state
+
+    def update(self, high, low, close, volume):
+        """Advance every indicator by one bar and return the new indicator row"""
+        high, low, close, volume = float(high), float(low), float(close), float(volume)
+        emas, windows = self.emas, self.windows
+        first = self.bars == 0
+        row = {}
+
+        windows['ma_50'].push(close)
+        windows['ma_200'].push(close)
+        row['50_MA'] = windows['ma_50'].mean()
+        row['200_MA'] = windows['ma_200'].mean()
+        row['20_EMA'] = emas['ema_20'].update(close)
+
+        macd = emas['ema_12'].update(close) - emas['ema_26'].update(close)
+        row['MACD'] = macd
+        row['MACD_Signal'] = emas['macd_signal'].update(macd)
+        row['MACD_Histogram'] = macd - row['MACD_Signal']
+
+        change = 0.0 if first else close - self.prev_close
+        gain = emas['gain'].update(max(change, 0.0))
+        loss = emas['loss'].update(max(-change, 0.0))
+        row['RSI'] = NAN if loss != loss else (100.0 if loss == 0 else 100 - 100 / (1 + gain / loss))
+
+        windows['low_14'].push(low)
+        windows['high_14'].push(high)
+        low_14, high_14 = windows['low_14'].min(), windows['high_14'].max()
+        row['Stoch_K'] = _divide(100 * (close - low_14), high_14 - low_14)
+        windows['stoch_k'].push(row['Stoch_K'])
+        row['Stoch_D'] = windows['stoch_k'].mean()
+
+        windows['bollinger'].push(close)
+        mid = windows['bollinger'].mean()
+        band = 2 * windows['bollinger'].std(ddof=0)
+        row['Bollinger_Upper'] = mid + band
+        row['Bollinger_Lower'] = mid - band
+        row['Bollinger_Mid'] = mid
+        row['BB_Width'] = _divide(2 * band, mid)
+
+        self.obv += -volume if close < self.prev_close else volume
+        money_flow = _divide((close - low) - (high - close), high - low)
+        self.adi += (0.0 if money_flow != money_flow else money_flow) * volume
+        row['OBV'] = self.obv
+        row['ADI'] = self.adi
+
+        windows['channel_high'].push(high)
+        windows['channel_low'].push(low)
+        row['Upper_Channel'] = row['Resistance'] = windows['channel_high'].max()
+        row['Lower_Channel'] = row['Support'] = windows['channel_low'].min()
+
+        row['Daily_Return'] = _divide(close, self.prev_close) - 1
+        windows['returns'].push(row['Daily_Return'])
+        row['Volatility'] = windows['returns'].std() * math.sqrt(TRADING_DAYS)
+
+        row['Plus_DI'], row['Minus_DI'], row['ADX'] = self._update_adx(high, low, close, first)
+        row['Trend_Strength'] = _divide(abs(row['50_MA'] - row['200_MA']), row['200_MA'])
+        row['Signal'] = self._signal(close, row)
+
+        self.prev_high, self.prev_low, self.prev_close = high, low, close
+        self.bars += 1
+        self.latest = {column: row[column] for column in INDICATOR_COLUMNS}
+        return self.latest
+
+    def _update_adx(self, high, low, close, first):
+        """Advance the rolling-mean ADX; returns (+DI, -DI, ADX)"""
+        windows = self.windows
+        if first:
+            true_range, plus_dm, minus_dm = NAN, 0.0, 0.0
+        else:
+            true_range = max(high - low, abs(high - self.prev_close), abs(low - self.prev_close))
+            up_move, down_move = high - self.prev_high, self.prev_low - low
+            plus_dm = max(up_move, 0.0) if up_move > down_move else 0.0
+            minus_dm = max(down_move, 0.0) if down_move > up_move else 0.0
+        windows['tr'].push(true_range)
+        windows['plus_dm'].push(plus_dm)
+        windows['minus_dm'].push(minus_dm)
+
+        tr_mean = windows['tr'].mean()
+        tr_mean = NAN if tr_mean == 0 else tr_mean
+        plus_di = _divide(100 * windows['plus_dm'].mean(), tr_mean)
+        minus_di = _divide(100 * windows['minus_dm'].mean(), tr_mean)
+        denominator = plus_di + minus_di
+        dx = _divide(100 * abs(plus_di - minus_di), NAN if denominator == 0 else denominator)
+
+        if dx == dx:
+            # The batch engine back-fills leading undefined DX with the first valid value
+            for _ in range(min(self.pending_dx, windows['dx'].window)):
+                windows['dx'].push(dx)
+            self.pending_dx = 0
+            self.last_dx = dx
+        elif self.last_dx == self.last_dx:
+            dx = self.last_dx
+        else:
+            # As in the batch engine, a series with no defined DX yet (e.g. flat prices) has zero ADX
+            self.pending_dx += 1
+            return plus_di, minus_di, 0.0
+        windows['dx'].push(dx)
+        return plus_di, minus_di, windows['dx'].mean()
+
+    @staticmethod
+    def _signal(close, row):
+        rules = (
+            (row['RSI'] < 30, row['RSI'] > 70),
+            (row['MACD'] > row['MACD_Signal'], row['MACD'] < row['MACD_Signal']),
+            (row['50_MA'] > row['200_MA'], row['50_MA'] < row['200_MA']),
+            (close < row['Bollinger_Lower'], close > row['Bollinger_Upper'])
+        )
+        score = sum(int(buy) - int(sell) for buy, sell in rules)
+        return (score > 0) - (score < 0)
+
+    def snapshot(self):
+        """JSON-serialisable copy of the full state"""
+        snapshot = {name: getattr(self, name) for name in self.SCALARS}
+        snapshot['emas'] = {name: ema.snapshot() for name, ema in self.emas.items()}
+        snapshot['windows'] = {name: window.snapshot() for name, window in self.windows.items()}
+        snapshot['latest'] = dict(self.latest)
+        return snapshot
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        state = cls()
+        for name in cls.SCALARS:
+            setattr(state, name, snapshot[name])
+        state.emas = {name: EMA.from_snapshot(ema) for name, ema in snapshot['emas'].items()}
+        state.windows = {name: RollingWindow.from_snapshot(window) for name, window in snapshot['windows'].items()}
+        state.latest = dict(snapshot['latest'])
+        return state
+
+
+class IndicatorStateStore:
+    """Streaming indicator states keyed by symbol"""
+
+    def __init__(self):
+        self.states = {}
+
+    def warm_up(self, symbol, df):
+        self.states[symbol] = IndicatorState.from_history(df)
+        return self.states[symbol].latest
+
+    def update(self, symbol, high, low, close, volume):
+        if symbol not in self.states:
+            raise KeyError(f"No indicator state for symbol {symbol}; warm it up on history first")
+        return self.states[symbol].update(high, low, close, volume)
+
+    def latest(self, symbol):
+        return self.states[symbol].latest
+
+    def invalidate(self, symbol):
+        """Drop a symbol's state, e.g. when a split rewrote its history; warm it up again before updating"""
+        self.states.pop(symbol, None)
+
+    def snapshot(self):
+        return {symbol: state.snapshot() for symbol, state in self.states.items()}
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        store = cls()
+        store.states = {symbol: IndicatorState.from_snapshot(state) for symbol, state in snapshot.items()}
+        return store
+
+
+def get_indicator_state_store():
+    """
+    Return the shared indicator state store, creating it on first use. It is
+    subscribed to the shared price store, so a symbol whose past history is
+    rewritten (e.g. by a split) loses its state and must be warmed up again.
+    """
+    global _default_states
+    with _default_states_lock:
+        if _default_states is None:
+            from price_store import get_price_store
+            _default_states = IndicatorStateStore()
+            get_price_store().subscribe(_default_states.invalidate)
+        return _default_states
+
+
+def check_parity(df=None, warmup=60, rtol=1e-7, atol=1e-7):
+    """
+    Stream a history bar by bar (through a snapshot/restore round trip) and compare
+    every row after the warm-up against compute_indicators. Returns mismatched columns.
+    By default a synthetic history and a flat (constant price) one are checked.
+    """
+    if df is None:
+        df = synthetic_ohlcv(2 * TRADING_DAYS)
+        flat = df.assign(Open=100.0, High=100.0, Low=100.0, Close=100.0)
+        return check_parity(df, warmup, rtol, atol) + [
+            f"{column} (flat)" for column in check_parity(flat, warmup, rtol, atol)
+        ]
+    expected = compute_indicators(df)
+    state = IndicatorState.from_history(df.iloc[:warmup])
+    state = IndicatorState.from_snapshot(state.snapshot())
+    rows = [state.update(*bar) for bar in df[['High', 'Low', 'Close', 'Volume']].to_numpy()[warmup:]]
+    return [
+        column for column in INDICATOR_COLUMNS
+        if not np.allclose([row[column] for row in rows], expected[column][warmup:], rtol=rtol, atol=atol, equal_nan=True)
+    ]
+
+
+def benchmark(symbols=500, days=TRADING_DAYS):
+    """Time a one-bar refresh of many symbols: full recompute vs streaming update"""
+    histories = [synthetic_ohlcv(days + 1, seed=seed) for seed in range(symbols)]
+    states = [IndicatorState.from_history(df.iloc[:-1]) for df in histories]
+    new_bars = [df[['High', 'Low', 'Close', 'Volume']].to_numpy()[-1].tolist() for df in histories]
+
+    start = time.perf_counter()
+    for df in histories:
+        compute_indicators(df)
+    recompute = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for state, bar in zip(states, new_bars):
+        state.update(*bar)
+    streaming = time.perf_counter() - start
+
+    print(f"Refreshing {symbols} symbols ({days} bars of history each):")
+    print(f"  full recompute:   {recompute * 1000:8.1f} ms")
+    print(f"  streaming update: {streaming * 1000:8.1f} ms ({recompute / streaming:.0f}x)")
+    print(f"  parity: {'ok' if not check_parity() else 'FAIL'}")
+
+
+if __name__ == "__main__":
+    benchmark()
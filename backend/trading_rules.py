@@ -0,0 +1,356 @@
+# trading_rules.py
+
+import re
+import time
+import numpy as np
+from functools import lru_cache
+from indicators import INDICATOR_COLUMNS, OHLCV_COLUMNS, compute_indicator_matrix, _synthetic_universe, align_ohlcv
+
+RULE_COLUMNS = tuple(OHLCV_COLUMNS) + ('Open',) + tuple(INDICATOR_COLUMNS)
+
+# A strategy holds buy and sell rules; each bar's signal is the sign of
+# (buy rules that hold) - (sell rules that hold), as in generate_trading_signals.
+STRATEGIES = {
+    'default': {
+        'buy': ['RSI < 30', 'MACD > MACD_Signal', '50_MA > 200_MA', 'Close < Bollinger_Lower'],
+        'sell': ['RSI > 70', 'MACD < MACD_Signal', '50_MA < 200_MA', 'Close > Bollinger_Upper']
+    },
+    'mean_reversion': {
+        'buy': 'RSI < 30 AND Close < Bollinger_Lower',
+        'sell': 'RSI > 70 AND Close > Bollinger_Upper'
+    },
+    'trend_following': {
+        'buy': '50_MA > 200_MA AND MACD > MACD_Signal',
+        'sell': '50_MA < 200_MA AND MACD < MACD_Signal'
+    },
+    'directional': {
+        'buy': 'ADX > 25 AND Plus_DI > Minus_DI',
+        'sell': 'ADX > 25 AND Minus_DI > Plus_DI'
+    }
+}
+
+_TOKEN = re.compile(r'\s*(?:(?P<number>\d+\.\d*|\.\d+|\d+(?![A-Za-z0-9_]))|(?P<name>\d*[A-Za-z_][A-Za-z0-9_]*)'
+                    r'|(?P<op><=|>=|==|!=|<|>|\(|\)|\+|-|\*|/))')
+_KEYWORDS = {'AND': 'and', 'OR': 'or', 'NOT': 'not'}
+_COMPARISONS = {'<': 'lt', '<=': 'le', '>': 'gt', '>=': 'ge', '==': 'eq', '!=': 'ne'}
+# a > b is stored as b < a so that both spellings share one node
+_MIRRORED = {'gt': 'lt', 'ge': 'le'}
+_COMMUTATIVE = {'and', 'or', 'add', 'mul', 'eq', 'ne'}
+_CONDITIONS = ('and', 'or', 'not') + tuple(_COMPARISONS.values())
+_UFUNCS = {
+    'lt': np.less, 'le': np.less_equal, 'eq': np.equal, 'ne': np.not_equal,
+    'add': np.add, 'sub': np.subtract, 'mul': np.multiply, 'div': np.divide,
+    'and': np.logical_and, 'or': np.logical_or, 'not': np.logical_not, 'neg': np.negative
+}
+
+
+class RuleSyntaxError(ValueError):
+    pass
+
+
+def _tokenize(text):
+    tokens, position = [], 0
+    text = text.rstrip()
+    while position < len(text):
+        match = _TOKEN.match(text, position)
+        if not match or match.end() == position:
+            raise RuleSyntaxError(f"Unexpected character at position {position} in rule '{text}'")
+        kind = match.lastgroup
+        value, start = match.group(kind), match.start(kind)
+        if kind == 'name' and value.upper() in _KEYWORDS:
+            kind, value = 'keyword', _KEYWORDS[value.upper()]
+        tokens.append((kind, value, start))
+        position = match.end()
+    return tokens
+
+
+class _Parser:
+    """
+    Recursive-descent parser; precedence from loosest to tightest:
+    OR, AND, NOT, comparison, + -, * /, unary minus.
+    """
+
+    def __init__(self, text, columns):
+        self.text = text
+        self.columns = columns
+        self.tokens = _tokenize(text)
+        self.index = 0
+
+    def parse(self):
+        if not self.tokens:
+            raise RuleSyntaxError("Empty rule")
+        node = self._or()
+        if self.index < len(self.tokens):
+            self._fail("Unexpected token")
+        self._condition(node, 'A rule')
+        if not self._references_column(node):
+            raise RuleSyntaxError(f"Rule '{self.text}' must compare at least one column")
+        return node
+
+    def _condition(self, node, what):
+        """Reject operands that are arithmetic rather than true/false per bar"""
+        if node[0] not in _CONDITIONS:
+            raise RuleSyntaxError(f"{what} must be a comparison, e.g. 'RSI < 30', in rule '{self.text}'")
+        return node
+
+    def _references_column(self, node):
+        return node[0] == 'load' or (node[0] != 'const' and any(self._references_column(child) for child in node[1:]))
+
+    def _peek(self, *values):
+        if self.index < len(self.tokens) and self.tokens[self.index][1] in values:
+            return self.tokens[self.index][1]
+        return None
+
+    def _take(self):
+        token = self.tokens[self.index]
+        self.index += 1
+        return token
+
+    def _fail(self, message):
+        position = self.tokens[self.index][2] if self.index < len(self.tokens) else len(self.text)
+        raise RuleSyntaxError(f"{message} at position {position} in rule '{self.text}'")
+
+    def _binary(self, operand, operators, logical=False):
+        node = operand()
+        while self._peek(*operators):
+            op = operators[self._take()[1]]
+            node = (op, node, operand())
+            if logical:
+                for child in node[1:]:
+                    self._condition(child, f"Each side of {op.upper()}")
+        return node
+
+    def _or(self):
+        return self._binary(self._and, {'or': 'or'}, logical=True)
+
+    def _and(self):
+        return self._binary(self._not, {'and': 'and'}, logical=True)
+
+    def _not(self):
+        if self._peek('not'):
+            self._take()
+            return ('not', self._condition(self._not(), "The operand of NOT"))
+        return self._comparison()
+
+    def _comparison(self):
+        node = self._sum()
+        if self._peek(*_COMPARISONS):
+            op = _COMPARISONS[self._take()[1]]
+            node = (op, node, self._sum())
+        return node
+
+    def _sum(self):
+        return self._binary(self._product, {'+': 'add', '-': 'sub'})
+
+    def _product(self):
+        return self._binary(self._unary, {'*': 'mul', '/': 'div'})
+
+    def _unary(self):
+        if self._peek('-'):
+            self._take()
+            return ('neg', self._unary())
+        return self._atom()
+
+    def _atom(self):
+        if self.index >= len(self.tokens):
+            self._fail("Unexpected end of rule")
+        kind, value, _ = self.tokens[self.index]
+        if value == '(':
+            self._take()
+            node = self._or()
+            if not self._peek(')'):
+                self._fail("Expected ')'")
+            self._take()
+            return node
+        if kind == 'number':
+            self._take()
+            return ('const', float(value))
+        if kind == 'name':
+            if value not in self.columns:
+                self._fail(f"Unknown column '{value}'")
+            self._take()
+            return ('load', value)
+        self._fail("Expected a column, number or '('")
+
+
+class RulePlan:
+    """
+    A set of strategies compiled into one flat list of NumPy operations. Identical
+    subexpressions (across rules and across strategies) are evaluated once.
+    """
+
+    def __init__(self):
+        self.instructions = []
+        self._nodes = {}
+        self.strategies = {}
+
+    def _emit(self, node):
+        op = node[0]
+        if op in ('load', 'const'):
+            key = node
+        else:
+            children = [self._emit(child) for child in node[1:]]
+            if op in _MIRRORED:
+                op, children = _MIRRORED[op], children[::-1]
+            elif op in _COMMUTATIVE:
+                children = sorted(children)
+            key = (op,) + tuple(children)
+        if key not in self._nodes:
+            self._nodes[key] = len(self.instructions)
+            self.instructions.append(key)
+        return self._nodes[key]
+
+    def add(self, name, strategy, columns=RULE_COLUMNS):
+        """Compile one strategy ({'buy': rules, 'sell': rules}) into the plan"""
+        if not isinstance(strategy, dict) or not (strategy.keys() & {'buy', 'sell'}):
+            raise RuleSyntaxError("A strategy needs 'buy' and/or 'sell' rules")
+        unknown = set(strategy) - {'buy', 'sell'}
+        if unknown:
+            raise RuleSyntaxError(f"Unknown strategy keys: {', '.join(sorted(unknown))}")
+        sides = {}
+        for side in ('buy', 'sell'):
+            rules = strategy.get(side, [])
+            rules = [rules] if isinstance(rules, str) else list(rules)
+            if not all(isinstance(rule, str) for rule in rules):
+                raise RuleSyntaxError(f"'{side}' rules must be strings")
+            sides[side] = [self._emit(_Parser(rule, columns).parse()) for rule in rules]
+        if not sides['buy'] and not sides['sell']:
+            raise RuleSyntaxError("A strategy needs at least one rule")
+        self.strategies[name] = sides
+        return self
+
+    @property
+    def columns(self):
+        return sorted({key[1] for key in self.instructions if key[0] == 'load'})
+
+    def evaluate(self, data):
+        """
+        Run the plan over `data` (a DataFrame or mapping of column -> array; 1D per
+        symbol or 2D symbols x days) and return {strategy name: -1/0/1 signal array}.
+        """
+        slots = []
+        with np.errstate(invalid='ignore', divide='ignore'):
+            for key in self.instructions:
+                op = key[0]
+                if op == 'load':
+                    slots.append(np.asarray(data[key[1]], dtype=np.float64))
+                elif op == 'const':
+                    slots.append(key[1])
+                else:
+                    slots.append(_UFUNCS[op](*(slots[child] for child in key[1:])))
+
+        signals = {}
+        for name, sides in self.strategies.items():
+            votes = 0
+            for child in sides['buy']:
+                votes = votes + slots[child].astype(np.int8)
+            for child in sides['sell']:
+                votes = votes - slots[child].astype(np.int8)
+            signals[name] = np.sign(votes).astype(np.int8)
+        return signals
+
+
+def resolve_strategy(strategy):
+    """Turn a strategy name or an inline rule set into (name, rule set)"""
+    if strategy is None:
+        return 'default', STRATEGIES['default']
+    if isinstance(strategy, str):
+        if strategy not in STRATEGIES:
+            raise RuleSyntaxError(f"Unknown strategy '{strategy}'. Choose from: {', '.join(STRATEGIES)} or pass rules inline")
+        return strategy, STRATEGIES[strategy]
+    if isinstance(strategy, dict):
+        return 'custom', strategy
+    raise RuleSyntaxError("strategy must be a strategy name or a {'buy': ..., 'sell': ...} rule set")
+
+
+def compile_strategies(strategies):
+    """Compile {name: strategy name or rule set} into a single shared RulePlan"""
+    plan = RulePlan()
+    for name, strategy in strategies.items():
+        plan.add(name, resolve_strategy(strategy)[1])
+    return plan
+
+
+def compile_strategy(strategy):
+    """Compile (and cache) a single strategy by name or inline rule set"""
+    _, rules = resolve_strategy(strategy)
+    try:
+        key = tuple(
+            (side, (rules[side],) if isinstance(rules[side], str) else tuple(rules[side]))
+            for side in sorted(rules)
+        )
+        hash(key)
+    except TypeError:
+        return RulePlan().add('signal', rules)
+    return _compile_cached(key)
+
+
+@lru_cache(maxsize=256)
+def _compile_cached(key):
+    return RulePlan().add('signal', {side: list(rules) for side, rules in key})
+
+
+def strategy_signals(strategy, data):
+    """-1/0/1 signal array for one strategy over a DataFrame or column mapping"""
+    return compile_strategy(strategy).evaluate(data)['signal']
+
+
+def check_parity(symbols=20, days=2 * 252):
+    """The 'default' rule set must reproduce the engine's hard-coded trading signal"""
+    _, _, high, low, close, volume = align_ohlcv(_synthetic_universe(symbols, days))
+    matrix = compute_indicator_matrix(high, low, close, volume)
+    data = {column: matrix[column] for column in INDICATOR_COLUMNS}
+    data['Close'] = close
+    return bool(np.array_equal(strategy_signals('default', data), matrix['Signal']))
+
+
+def check_syntax():
+    """Rules must be true/false per bar all the way down; returns the misjudged rules"""
+    accepted = ['RSI < 30', 'NOT RSI > 70', 'RSI < 30 AND (MACD > 0 OR NOT Close > Open)', '50_MA - 200_MA > 0']
+    rejected = ['RSI', 'NOT RSI', 'NOT 1', 'RSI < 30 AND RSI', 'RSI < 30 AND 0.5', '0.5 OR RSI < 30',
+                'NOT (RSI + 1)', '1 < 2', 'RSI < 30 AND 1 < 2 OR 1']
+    problems = []
+    for rule in accepted + rejected:
+        try:
+            RulePlan().add('signal', {'buy': rule})
+            valid = True
+        except RuleSyntaxError:
+            valid = False
+        if valid != (rule in accepted):
+            problems.append(rule)
+    return problems
+
+
+def benchmark(strategies=50, symbols=500, days=252):
+    """Compile and evaluate many strategies over a whole universe in one plan"""
+    _, _, high, low, close, volume = align_ohlcv(_synthetic_universe(symbols, days))
+    matrix = compute_indicator_matrix(high, low, close, volume)
+    data = {column: matrix[column] for column in INDICATOR_COLUMNS}
+    data.update({'High': high, 'Low': low, 'Close': close, 'Volume': volume})
+
+    rng = np.random.default_rng(0)
+    grid = {}
+    for i in range(strategies):
+        low_rsi, high_rsi = rng.integers(20, 40), rng.integers(60, 80)
+        grid[f'strategy_{i}'] = {
+            'buy': [f'RSI < {low_rsi} AND Close < Bollinger_Lower', 'MACD > MACD_Signal AND 50_MA > 200_MA'],
+            'sell': [f'RSI > {high_rsi} AND Close > Bollinger_Upper', 'MACD < MACD_Signal AND 50_MA < 200_MA']
+        }
+
+    start = time.perf_counter()
+    plan = compile_strategies(grid)
+    compiled = time.perf_counter() - start
+    start = time.perf_counter()
+    plan.evaluate(data)
+    evaluated = time.perf_counter() - start
+
+    rules = sum(len(rules) for rules in (side for s in grid.values() for side in s.values()))
+    print(f"{strategies} strategies ({rules} rules) on {symbols} symbols x {days} days:")
+    print(f"  compile:  {compiled * 1000:7.2f} ms ({len(plan.instructions)} shared operations)")
+    print(f"  evaluate: {evaluated * 1000:7.2f} ms")
+    print(f"  default rule set matches generate_trading_signals: {check_parity()}")
+    print(f"  rule syntax check: {'ok' if not check_syntax() else 'FAIL'}")
+
+
+if __name__ == "__main__":
+    benchmark()